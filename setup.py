@@ -16,6 +16,6 @@ setup(name="devtools",
       url="http://craigwwright.wordpress.com/devtools",
       packages=["devtools"],
       package_dir={'devtools': "src/modules/devtools"},
-      package_data={"devtools" : ['common/*.py', 'managededit/*.py', 'codegen/*.py']},
+      package_data={"devtools" : ['common/*.py', 'managededit/*.py', 'managededit/benchmark/*.py', 'codegen/*.py']},
       scripts=scriptsToInstall,
      )
@@ -0,0 +1,87 @@
+#
+# Programmable completion for me and for e and g, which use it. The
+# expressions they take complete to the names of the files in the location
+# table, which "me --complete" looks up in the basename index, and those of
+# g to the preset locations in DT_GO_FILE as well. An expression anchored
+# with '^' keeps its anchor.
+#
+
+if [ -z "${DT_COMPLETION_LIMIT}" ]; then
+    export DT_COMPLETION_LIMIT=50
+fi
+
+DT_ME_OPTIONS="-r -u -l -m -d -f -z -t -j -h --rebuild-locationtable
+--update-locationtable --clone-from --jobs --watch --dump-locationtable
+--matches --complete --format --filter --limit --find-directory --find-file
+--fuzzy --table --ask --daemon --stop-daemon --profile --profile-output
+--cprofile --help --version"
+
+function _dt_complete_files {
+    local cur="$1"
+    local anchor=""
+    if [ "${cur:0:1}" = "^" ]; then
+        anchor="^"
+        cur="${cur:1}"
+    fi
+
+    local IFS=$'\n'
+    local name
+    for name in $(me --complete "${cur}" --limit ${DT_COMPLETION_LIMIT} 2>/dev/null); do
+        COMPREPLY+=("${anchor}${name}")
+    done
+}
+
+function _dt_complete_me {
+    local cur="${COMP_WORDS[COMP_CWORD]}"
+    local prev="${COMP_WORDS[COMP_CWORD-1]}"
+    COMPREPLY=()
+
+    case "${prev}" in
+        -t|--table|--clone-from)
+            COMPREPLY=( $(cd "${DT_SANDBOX_ROOT}" 2>/dev/null && compgen -d -- "${cur}") )
+            return
+            ;;
+        --format)
+            COMPREPLY=( $(compgen -W "repr path nul tsv jsonl" -- "${cur}") )
+            return
+            ;;
+        --profile-output|--cprofile)
+            COMPREPLY=( $(compgen -f -- "${cur}") )
+            return
+            ;;
+        -j|--jobs|--limit|--complete)
+            return
+            ;;
+    esac
+
+    if [ "${cur:0:1}" = "-" ]; then
+        COMPREPLY=( $(compgen -W "${DT_ME_OPTIONS}" -- "${cur}") )
+        return
+    fi
+    _dt_complete_files "${cur}"
+}
+
+function _dt_complete_edit {
+    COMPREPLY=()
+    _dt_complete_files "${COMP_WORDS[COMP_CWORD]}"
+}
+
+function _dt_complete_go {
+    local cur="${COMP_WORDS[COMP_CWORD]}"
+    COMPREPLY=()
+
+    if [ -e "${DT_GO_FILE}" ]; then
+        local IFS=$'\n'
+        local entry
+        for entry in $(cat ${DT_GO_FILE}); do
+            if [ "${entry%%:*}" != "${entry}" -a "${entry#${cur}}" != "${entry}" ]; then
+                COMPREPLY+=("${entry%%:*}")
+            fi
+        done
+    fi
+    _dt_complete_files "${cur}"
+}
+
+complete -F _dt_complete_me me
+complete -F _dt_complete_edit e dt_edit
+complete -F _dt_complete_go g dt_go
@@ -13,3 +13,4 @@ source ${DT_DIR}/shellutil/go.sh
 source ${DT_DIR}/shellutil/edit.sh
 source ${DT_DIR}/shellutil/sandbox.sh
 source ${DT_DIR}/shellutil/aliases.sh
+source ${DT_DIR}/shellutil/completion.sh
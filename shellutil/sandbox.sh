@@ -28,15 +28,23 @@ function dt_set_sandbox {
     fi
 
     suggested="$1"
+    previous="${DT_SANDBOX_CURRENT}"
 
     if [ ! -e "${DT_SANDBOX_ROOT}/${suggested}" ]; then
        echo "ERROR: no such sandbox found in ${DT_SANDBOX_ROOT}"
     else
         echo $suggested > $DT_SANDBOX_FILE
         dt_read_sandbox
-        # rebuild location table and go to work dir
+        # bring the location table up to date and go to work dir; a new
+        # sandbox starts from a copy of the table of the one just left
         # TODO: make options out of these
         cd ${DT_WORK_DIR}
-        me -r
+        if [ -e "${DT_CONFIG_DIR}/location_table/${DT_SANDBOX_CURRENT}" ]; then
+            me -u
+        elif [ -n "${previous}" -a "${previous}" != "${DT_SANDBOX_CURRENT}" ]; then
+            me --clone-from "${previous}"
+        else
+            me -r
+        fi
     fi
 }
@@ -18,7 +18,7 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 import sys
-from optparse import OptionParser, OptionValueError
+from devtools.common import profiler
 from devtools.codegen.configuration import Configuration
 
 
@@ -27,6 +27,7 @@ def cg_main():
       This is the main line of the script cg and cg.cmd.
       It is put here so that Linux and Windows versions can share.
    """
+   from optparse import OptionParser
 
 
    def variableMapCallback(option, opt_str, value, parser):
@@ -68,8 +69,6 @@ def cg_main():
 
    VERSION="0.1"
 
-   conf = Configuration()
-
    usage = "usage: %prog [<generator>|-h|--version|-m]"
    version = "%prog " + VERSION
    description="With no options the given generator name will be referenced to a generator (template) of the same name in your codegen configuration file. That generator will then be executed. Output is written to stdout."
@@ -84,13 +83,22 @@ def cg_main():
                      callback=variableMapCallback,
                      help="A list of key value pairs which will define current use variables for the generator. For example '-m foo=bar classname=NewClass filename=Foo.h'.")
 
+   profiler.addOptions(parser)
+
    (options, args) = parser.parse_args(sys.argv[1:])
+   profiler.enable("cg", options)
+
+   # Created once profiling is enabled since it reads the configuration
+   # file.
+   conf = Configuration()
 
    try:
       if len(args) == 1:
          ch = conf.getGenerator(args[0])
-         vs = conf.getVariables(options.varmap)
-         ch.generate(vs)
+         with profiler.phase("variables"):
+            vs = conf.getVariables(options.varmap)
+         with profiler.phase("generate"):
+            ch.generate(vs)
       else:
          sys.stderr.write(parser.format_help())
          sys.exit(1)
@@ -98,5 +106,7 @@ def cg_main():
       pass
    except:
       raise
+   finally:
+      profiler.disable()
  
 
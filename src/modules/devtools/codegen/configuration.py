@@ -18,12 +18,6 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import os
-import xml.parsers.expat
-import re
-import sys
-import string
-import copy
-from datetime import datetime
 
 import devtools.common.configuration
 from devtools.common.option import *
@@ -105,8 +99,22 @@ class Configuration(devtools.common.configuration.Configuration):
       self.conditionallyCreateConfigurationFile()
 
       if os.path.exists(self.getConfigurationFileFullPath()):
-         p = ConfigurationFileParser(self)
-         p.parse(self.getConfigurationFileFullPath())
+         self.parseConfigurationFile()
+
+   def createConfigurationFileParser(self):
+      return ConfigurationFileParser(self)
+
+   def getSnapshotState(self):
+      return {"options": self.getOptionValues(),
+              "generators": [g.getState() for g in self.generators_.values()],
+              "variables": dict(self.variables_)}
+
+   def restoreSnapshotState(self, state):
+      for (key, value) in state["options"].items():
+         self.setOption(key, value)
+      for g in state["generators"]:
+         self.addGenerator(restoreTemplate(g))
+      self.variables_ = dict(state["variables"])
 
    def addGenerator(self, generator):
       if generator.getName() in self.generators_:
@@ -138,6 +146,8 @@ class Configuration(devtools.common.configuration.Configuration):
          This is a map of keys to values and will be included in the returned
          variable map. These take ultimate precendence.
       """
+      import datetime
+
       variables = {}
 
       # Default are lowest precedence.
@@ -186,6 +196,9 @@ class ConfigurationFileParser:
       self.state_ = None
 
    def parse(self, filename):
+      # Imported here since a current snapshot spares parsing the file.
+      import xml.parsers.expat
+
       p = xml.parsers.expat.ParserCreate()
       p.StartElementHandler = self.startElement
       p.EndElementHandler = self.endElement
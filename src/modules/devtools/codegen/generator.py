@@ -17,7 +17,6 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 import sys
-import datetime
 import string
 
 import devtools.common.utility
@@ -49,6 +48,12 @@ class Template(Generator):
       Generator.__init__(self, name)
       self.file_= devtools.common.utility.substituteEnvironment(templateFile)
 
+   def getState(self):
+      """
+         The template as plain data. @see restoreTemplate
+      """
+      return (self.name_, self.file_)
+
    def generate(self, variables):
       f = open(self.file_)
       s = ""
@@ -61,3 +66,13 @@ class Template(Generator):
       s = string.Template(s)
       s = s.safe_substitute(variables)
       sys.stdout.write(s)
+
+
+def restoreTemplate(state):
+   """
+      Recreate a Template from what Template.getState returned, without
+      looking at the environment again.
+   """
+   ret = Template.__new__(Template)
+   (ret.name_, ret.file_) = state
+   return ret
@@ -18,9 +18,11 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 import os
-import platform
+import sys
 
+from devtools.common import profiler
 from devtools.common.option import Option
+from devtools.common.snapshot import ConfigurationSnapshot
 
 class Configuration:
    """
@@ -30,7 +32,7 @@ class Configuration:
 
    def __init__(self, configurationDirectory, configurationFile, createConfigurationFile, configurationFileTemplate):
 
-      if platform.system() == "Windows":
+      if sys.platform == "win32":
          self.configurationDirectory_ = os.path.join(os.environ["APPDATA"], "devtools")
       else:
          self.configurationDirectory_ = os.path.join(os.environ["HOME"], ".devtools")
@@ -97,6 +99,53 @@ class Configuration:
       finally:
          sc.close()
 
+   def parseConfigurationFile(self):
+      """
+         Read the configuration file. If it and the environment variables it
+         refers to are unchanged since the last time it was read, the
+         snapshot taken then is restored instead. @see ConfigurationSnapshot
+      """
+      with profiler.phase("configuration"):
+         snapshot = ConfigurationSnapshot(self.getConfigurationFileFullPath())
+         state = snapshot.load()
+         if state is not None:
+            self.restoreSnapshotState(state)
+            return
+         with profiler.phase("parse"):
+            self.createConfigurationFileParser().parse(self.getConfigurationFileFullPath())
+         state = self.getSnapshotState()
+         if state is not None:
+            snapshot.save(state)
+
+   def createConfigurationFileParser(self):
+      """
+         Derived classes return a parser for their configuration file.
+      """
+      raise RuntimeError("Unable to parse a configuration file without a parser.")
+
+   def getSnapshotState(self):
+      """
+         Derived classes return what reading the configuration file set up,
+         as plain data that marshal can hold, or None to take no snapshot.
+      """
+      return None
+
+   def restoreSnapshotState(self, state):
+      """
+         Derived classes set themselves up from what getSnapshotState
+         returned.
+      """
+      pass
+
+   def getOptionValues(self):
+      """
+         Return a dictionary from the key of each option to its value.
+      """
+      ret = {}
+      for (key, option) in self.options_.items():
+         ret[key] = option.getValue()
+      return ret
+
    def clearOptions(self):
       """
          Remove all options.
@@ -0,0 +1,116 @@
+"""
+This files defines the class FileLock.
+
+Copyright (C) 2009 Craig W. Wright
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import time
+import sys
+
+if sys.platform == "win32":
+   import msvcrt
+else:
+   import fcntl
+
+
+class FileLock:
+   """
+      An exclusive, advisory lock on a file shared by all processes that use
+      the same path. The file is created if needed and left in place. The
+      operating system drops the lock if the holder dies, so a crashed
+      process cannot leave it held.
+
+      A FileLock may be used as a context manager, which blocks until the
+      lock is acquired.
+   """
+
+   def __init__(self, path):
+      self.path_ = str(path)
+      self.fd_ = None
+
+   def getPath(self):
+      return self.path_
+
+   def isHeld(self):
+      return self.fd_ is not None
+
+   def acquire(self, blocking=True):
+      """
+         @param blocking
+         Wait for the lock if another process holds it.
+
+         @returns True if the lock was acquired, False if it is held
+         elsewhere and blocking is False.
+      """
+      if self.fd_ is not None:
+         raise RuntimeError("The lock '" + self.path_ + "' is already held.")
+
+      fd = os.open(self.path_, os.O_RDWR | os.O_CREAT, 0o644)
+      try:
+         if sys.platform == "win32":
+            acquired = self._lockWindows(fd, blocking)
+         else:
+            acquired = self._lockPosix(fd, blocking)
+      except:
+         os.close(fd)
+         raise
+
+      if acquired:
+         self.fd_ = fd
+      else:
+         os.close(fd)
+      return acquired
+
+   def _lockPosix(self, fd, blocking):
+      flags = fcntl.LOCK_EX
+      if not blocking:
+         flags |= fcntl.LOCK_NB
+      try:
+         fcntl.flock(fd, flags)
+      except BlockingIOError:
+         return False
+      return True
+
+   def _lockWindows(self, fd, blocking):
+      while True:
+         try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+         except OSError:
+            if not blocking:
+               return False
+            time.sleep(0.05)
+
+   def release(self):
+      if self.fd_ is None:
+         return
+      try:
+         if sys.platform == "win32":
+            os.lseek(self.fd_, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd_, msvcrt.LK_UNLCK, 1)
+         else:
+            fcntl.flock(self.fd_, fcntl.LOCK_UN)
+      finally:
+         os.close(self.fd_)
+         self.fd_ = None
+
+   def __enter__(self):
+      self.acquire()
+      return self
+
+   def __exit__(self, excType, excValue, traceback):
+      self.release()
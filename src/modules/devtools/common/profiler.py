@@ -0,0 +1,282 @@
+"""
+This files defines the class Profiler and the functions the devtools
+commands use to mark their phases.
+
+Code marks a phase with
+
+   with profiler.phase("search") as p:
+      ...
+      p.count(rows)
+
+and nothing else. Unless profiling was enabled, with --profile or the
+DT_PROFILE environment variable, phase returns a shared object whose
+methods do nothing, so the marks cost a function call each. Once enabled
+the wall time of every phase, the rows it counted and how deeply it is
+nested are recorded and, when the command finishes, printed as a summary
+or appended to a file as JSON lines. Phases may run in several threads at
+once, as the searches of federated tables do; each thread counts how
+deeply its own phases are nested, from 0. The whole run can also be captured
+with cProfile.
+
+DT_PROFILE=1 asks for the summary, any other value names the file the
+JSON lines are appended to.
+
+Copyright (C) 2009 Craig W. Wright
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+
+
+class NullPhase:
+   """
+      What phase returns while profiling is disabled.
+   """
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self, *args):
+      return False
+
+   def count(self, rows):
+      pass
+
+
+_nullPhase = NullPhase()
+
+# The Profiler of the running command, or None.
+_current = None
+
+
+def phase(name):
+   """
+      @returns A context manager that times the phase called name.
+   """
+   if _current is None:
+      return _nullPhase
+   return _current.phase(name)
+
+
+def isEnabled():
+   return _current is not None
+
+
+def getProcessAge():
+   """
+      @returns How long ago the process started in seconds, to the clock
+      tick, or None where that is not known.
+   """
+   try:
+      with open("/proc/self/stat") as f:
+         fields = f.read().rsplit(")", 1)[1].split()
+      with open("/proc/uptime") as f:
+         uptime = float(f.read().split()[0])
+      return max(0.0, uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"))
+   except (OSError, ValueError, IndexError, AttributeError):
+      return None
+
+
+class Phase:
+
+   def __init__(self, profiler, name):
+      self.profiler_ = profiler
+      self.name_ = name
+      self.rows_ = None
+
+   def __enter__(self):
+      self.depth_ = self.profiler_.enter()
+      self.start_ = time.perf_counter()
+      return self
+
+   def __exit__(self, *args):
+      end = time.perf_counter()
+      self.profiler_.leave()
+      self.profiler_.record(self.name_, self.depth_, self.start_, end - self.start_, self.rows_)
+      return False
+
+   def count(self, rows):
+      """
+         Add rows to the rows the phase produced.
+      """
+      self.rows_ = (self.rows_ or 0) + rows
+
+
+class Profiler:
+   """
+      Records the phases of one run of a command.
+   """
+
+   def __init__(self, command, summary=True, output=None, cprofile=None):
+      """
+         @param summary
+         Write a table of the phases to stderr when finished.
+
+         @param output
+         The file to append a JSON line per phase to, or None.
+
+         @param cprofile
+         The file to write the statistics of cProfile to, or None not to
+         run it.
+      """
+      self.command_ = command
+      self.summary_ = summary
+      self.output_ = output
+      self.cprofileFile_ = cprofile
+      # Imported here since it is only needed when profiling.
+      import threading
+
+      self.cprofile_ = None
+      self.thread_ = threading.local()
+      self.records_ = []
+      self.start_ = time.perf_counter()
+      self.startup_ = getProcessAge()
+
+   def phase(self, name):
+      return Phase(self, name)
+
+   def enter(self):
+      """
+         Note that the calling thread entered a phase.
+
+         @returns How many phases the thread was in already.
+      """
+      depth = getattr(self.thread_, "depth", 0)
+      self.thread_.depth = depth + 1
+      return depth
+
+   def leave(self):
+      self.thread_.depth -= 1
+
+   def record(self, name, depth, start, seconds, rows):
+      self.records_.append({"phase": name, "depth": depth,
+                            "start": start - self.start_,
+                            "seconds": seconds, "rows": rows})
+
+   def getRecords(self):
+      """
+         The phases in the order they started, each a dictionary with the
+         keys phase, depth, start, seconds and rows. Startup, the time
+         from the start of the process until profiling was enabled, comes
+         first where it is known.
+      """
+      ret = sorted(self.records_, key=lambda r: r["start"])
+      if self.startup_ is not None:
+         ret.insert(0, {"phase": "startup", "depth": 0, "start": -self.startup_,
+                        "seconds": self.startup_, "rows": None})
+      return ret
+
+   def startCProfile(self):
+      # Imported here since it is only needed when asked for.
+      import cProfile
+
+      self.cprofile_ = cProfile.Profile()
+      self.cprofile_.enable()
+
+   def writeSummary(self, out):
+      total = time.perf_counter() - self.start_ + (self.startup_ or 0.0)
+      out.write("%-32s %10s %10s\n" % (self.command_ + " phase", "ms", "rows"))
+      for r in self.getRecords():
+         rows = "" if r["rows"] is None else str(r["rows"])
+         out.write("%-32s %10.2f %10s\n" % ("  " * r["depth"] + r["phase"], r["seconds"] * 1000, rows))
+      out.write("%-32s %10.2f\n" % ("total", total * 1000))
+
+   def writeLines(self, out):
+      # Imported here since it is only needed when profiling.
+      import json
+
+      run = {"command": self.command_, "pid": os.getpid(), "time": time.time()}
+      for r in self.getRecords():
+         line = dict(run)
+         line.update(r)
+         out.write(json.dumps(line, sort_keys=True) + "\n")
+
+   def finish(self):
+      """
+         Stop profiling and write out what was recorded.
+      """
+      if self.cprofile_ is not None:
+         self.cprofile_.disable()
+         self.cprofile_.dump_stats(self.cprofileFile_)
+      if self.summary_:
+         self.writeSummary(sys.stderr)
+      if self.output_:
+         with open(self.output_, "a") as f:
+            self.writeLines(f)
+
+
+def addOptions(parser):
+   """
+      Add the options that enable profiling to an OptionParser.
+      @see enable
+   """
+   parser.add_option("--profile",
+                     action="store_true",
+                     dest="profile",
+                     help="Print the time taken by each phase, and the rows it produced, to stderr. The environment variable DT_PROFILE=1 does the same.")
+   parser.add_option("--profile-output",
+                     action="store",
+                     dest="profileOutput",
+                     metavar="FILE",
+                     help="Append a JSON line for each phase to FILE instead. Setting DT_PROFILE to the file does the same.")
+   parser.add_option("--cprofile",
+                     action="store",
+                     dest="cprofile",
+                     metavar="FILE",
+                     help="Also run under cProfile and write its statistics to FILE, for pstats.")
+
+
+def enable(command, options=None, environ=None):
+   """
+      Start profiling if options, as added by addOptions, or the DT_PROFILE
+      environment variable ask for it.
+
+      @returns The Profiler, or None if profiling is not enabled. Call its
+      finish method when the command is done.
+   """
+   global _current
+
+   environ = os.environ if environ is None else environ
+   summary = bool(options and options.profile)
+   output = options.profileOutput if options else None
+   cprofile = options.cprofile if options else None
+
+   setting = environ.get("DT_PROFILE", "")
+   if setting in ("1", "true"):
+      summary = True
+   elif setting and setting not in ("0", "false") and not output:
+      output = setting
+
+   if not (summary or output or cprofile):
+      return None
+   _current = Profiler(command, summary or not output, output, cprofile)
+   if cprofile:
+      _current.startCProfile()
+   return _current
+
+
+def disable():
+   """
+      Finish the current Profiler, if any, and stop profiling.
+   """
+   global _current
+
+   if _current is not None:
+      try:
+         _current.finish()
+      finally:
+         _current = None
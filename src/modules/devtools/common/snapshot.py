@@ -0,0 +1,134 @@
+"""
+This files defines the class ConfigurationSnapshot.
+
+A snapshot holds what reading a configuration file produced, so that the
+next run can pick it up instead of parsing the XML, substituting the
+environment into every path and so on. It is stored next to the file with
+marshal, which costs nothing to import, and is only used while the file
+and the environment variables the file refers to are unchanged.
+
+Copyright (C) 2009 Craig W. Wright
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import re
+import sys
+import time
+import marshal
+
+# Bump whenever what the configurations put in a snapshot changes.
+SNAPSHOT_VERSION=4
+
+# A file changed within this many seconds of being snapshotted could change
+# again without its mtime moving, so no snapshot is taken of it yet.
+MINIMUM_AGE=2
+
+_reference = re.compile(r"\$(?:\{(\w+)\}|(\w+))")
+
+
+def getReferencedVariables(text):
+   """
+      @returns The sorted names of the environment variables text refers
+      to as $NAME or ${NAME}.
+   """
+   names = set()
+   for m in _reference.finditer(text):
+      names.add(m.group(1) or m.group(2))
+   return sorted(names)
+
+
+class ConfigurationSnapshot:
+
+   def __init__(self, configurationFile):
+      """
+         @param configurationFile
+         The full path of the configuration file.
+      """
+      self.configurationFile_ = str(configurationFile)
+      self.status_ = None
+
+   def getFileFullPath(self):
+      return self.configurationFile_ + ".snapshot"
+
+   def load(self):
+      """
+         @returns The state saved with save, or None if there is no
+         snapshot or the configuration file or the environment changed
+         since it was taken.
+      """
+      try:
+         self.status_ = os.stat(self.configurationFile_)
+         f = open(self.getFileFullPath(), "rb")
+      except OSError:
+         return None
+      try:
+         (version, mtime, size, environment, state) = marshal.load(f)
+      except (EOFError, ValueError, TypeError):
+         return None
+      finally:
+         f.close()
+
+      if (version != (SNAPSHOT_VERSION, sys.version_info[:2]) or
+          mtime != self.status_.st_mtime_ns or size != self.status_.st_size):
+         return None
+      for (name, value) in environment.items():
+         if os.environ.get(name) != value:
+            return None
+      return state
+
+   def save(self, state):
+      """
+         Save state for the configuration file as it was when load was
+         called. Failing to write the snapshot is not an error.
+
+         @param state
+         Plain data that marshal can hold.
+      """
+      if self.status_ is None or time.time() - self.status_.st_mtime < MINIMUM_AGE:
+         return
+      try:
+         f = open(self.configurationFile_, "rb")
+         try:
+            text = f.read().decode("utf-8", "replace")
+         finally:
+            f.close()
+      except OSError:
+         return
+
+      environment = {}
+      for name in getReferencedVariables(text):
+         environment[name] = os.environ.get(name)
+      data = marshal.dumps(((SNAPSHOT_VERSION, sys.version_info[:2]),
+                            self.status_.st_mtime_ns, self.status_.st_size,
+                            environment, state))
+
+      # Only needed when the snapshot is out of date.
+      import tempfile
+
+      path = self.getFileFullPath()
+      try:
+         (fd, temp) = tempfile.mkstemp(prefix=os.path.basename(path) + ".",
+                                       suffix=".tmp",
+                                       dir=os.path.dirname(path))
+      except OSError:
+         return
+      try:
+         with os.fdopen(fd, "wb") as f:
+            f.write(data)
+         os.replace(temp, path)
+      except OSError:
+         if os.path.exists(temp):
+            os.remove(temp)
@@ -20,24 +20,104 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 from devtools.managededit.locationtable import *
 
 import sys
-import subprocess
-import platform
 
-from optparse import OptionParser
+from devtools.common import profiler
 from devtools.managededit.configuration import Configuration
+from devtools.managededit import fuzzy
+from devtools.managededit import narrowing
+from devtools.managededit.frecency import FrecencyStore
 
-if platform.system() != "Windows":
-   import readline
+# Modules only some commands need, such as the daemon, the watcher and
+# subprocess, are imported where they are used so that a lookup starts
+# quickly. test/startup_test.py keeps it that way.
 
 def me_main():
    """
       This is the main line of the scripts me and me.cmd.
       Put here for sharing.
    """
-   VERSION="0.1"
    conf = Configuration(None, True)
+   parsed = parseLookup(sys.argv[1:])
+   if parsed is None:
+      parser = createParser(conf)
+      parsed = parser.parse_args(sys.argv[1:])
+   (options, args) = parsed
+   profiler.enable("me", options)
+   if options.ask:
+      conf.setOption("autoResolve", False)
+   for table in options.tables or []:
+      conf.addFederatedTable(table)
+
+   #print options, args
 
-   usage = "usage: %prog [-r|-d <expression>|-f <expression>|<expression>|-h|--version]"
+   try:
+      if options.rebuild_locationtable:
+         sys.stdout.write("Rebuilding the location table...")
+         sys.stdout.flush()
+         n = rebuildLocationTable(conf, options.jobs)
+         sys.stdout.write(" " + str(n) + " files indexed.\n")
+      elif options.update_locationtable:
+         sys.stdout.write("Updating the location table...")
+         sys.stdout.flush()
+         (changes, n) = refreshLocationTable(conf, options.jobs)
+         if changes:
+            sys.stdout.write(" %d added, %d removed," % changes)
+         sys.stdout.write(" " + str(n) + " files indexed.\n")
+      elif options.cloneFrom:
+         sys.stdout.write("Cloning the location table of '%s'..." % (options.cloneFrom))
+         sys.stdout.flush()
+         (changes, n) = cloneLocationTable(conf, options.cloneFrom, options.jobs)
+         if changes:
+            sys.stdout.write(" %d added, %d removed," % changes)
+         sys.stdout.write(" " + str(n) + " files indexed.\n")
+      elif options.watch:
+         watchLocationTable(conf, options.jobs, sys.stdout)
+      elif options.daemon:
+         from devtools.managededit import daemon
+         daemon.Daemon().serve()
+      elif options.stop_daemon:
+         from devtools.managededit import daemon
+         client = daemon.DaemonClient(conf)
+         if client.connect():
+            client.stop()
+      elif options.dump_locationtable:
+         dumpLocationTable(conf, sys.stdout, options.format or "repr", options.filter, options.limit)
+      elif options.completePrefix is not None:
+         names = completeBasename(conf, options.completePrefix, options.limit or COMPLETION_LIMIT)
+         if names:
+            sys.stdout.write("\n".join(names) + "\n")
+      elif options.matchesExpression:
+         printMatches(conf, options.matchesExpression, sys.stdout, options.format or "path", options.limit)
+      elif options.directoryExpression:
+         location = findDirectory(conf, options.directoryExpression, options.fuzzy)
+         if location:
+            sys.stdout.write(location + "\n")
+      elif options.fileExpression:
+         location = findFile(conf, options.fileExpression, options.fuzzy)
+         if location:
+            sys.stdout.write(location + "\n")
+      elif len(args) == 1:
+         editFile(conf, args[0], options.fuzzy)
+      else:
+         sys.stderr.write(parser.format_help())
+         sys.exit(1)
+   except KeyboardInterrupt as k:
+      pass
+   except:
+      raise
+   finally:
+      profiler.disable()
+
+
+def createParser(conf):
+   """
+      @returns The OptionParser of me.
+   """
+   from optparse import OptionParser
+
+   VERSION="0.1"
+
+   usage = "usage: %prog [-r|-u|--clone-from <sandbox>|--watch [-j <jobs>]|[-t <table>] [-z] -d <expression>|[-t <table>] [-z] -f <expression>|[-t <table>] [-z] <expression>|-l [--filter <expression>] [--limit <n>] [--format <format>]|[-t <table>] --complete <prefix> [--limit <n>]|[-t <table>] -m <expression> [--limit <n>] [--format <format>]|--daemon|--stop-daemon|-h|--version]"
    version = "%prog " + VERSION
    description=("With no options the given expression will be used to search the location table located at '%s'. An interactive process of narrowing the expression to a single file will then begin and if a single file is indicated it will be launched in $EDITOR.") % (conf.getLocationTableFileFullPath())
 
@@ -48,17 +128,73 @@ def me_main():
                      dest="rebuild_locationtable",
                      help="Rebuild the location table and exit.")
 
+   parser.add_option("-u",
+                     "--update-locationtable",
+                     action="store_true",
+                     dest="update_locationtable",
+                     help="Bring the location table up to date by relisting only the directories that changed since it was built, and exit. Tables written by older versions are rebuilt.")
+
+   parser.add_option("--clone-from",
+                     action="store",
+                     dest="cloneFrom",
+                     metavar="SANDBOX",
+                     help="Create the location table of the current sandbox from the one of the sandbox SANDBOX, a sibling under DT_SANDBOX_ROOT, by moving its paths over and then relisting the directories to apply the differences, and exit. Much faster than a rebuild when the sandboxes are similar checkouts.")
+
+   parser.add_option("-j",
+                     "--jobs",
+                     action="store",
+                     type="int",
+                     dest="jobs",
+                     help="The number of directories to list in parallel while rebuilding or updating the location table. Defaults to a value based on the number of processors.")
+
+   parser.add_option("--watch",
+                     action="store_true",
+                     dest="watch",
+                     help="Bring the location table up to date and then keep it that way, applying files as they are created, deleted and renamed, until interrupted. Linux only.")
+
    parser.add_option("-l",
                      "--dump-locationtable",
                      action="store_true",
                      dest="dump_locationtable",
                      help="Dump the contents of the location table to stdout and exit.")
 
+   parser.add_option("-m",
+                     "--matches",
+                     action="store",
+                     dest="matchesExpression",
+                     metavar="EXPRESSION",
+                     help="Print every file whose name matches the expression to stdout, without narrowing, and exit. Searches the tables given with -t as well.")
+
+   parser.add_option("--complete",
+                     action="store",
+                     dest="completePrefix",
+                     metavar="PREFIX",
+                     help="Print the names of the files that start with PREFIX, a line each and each once, in order and at most 50 of them or as many as --limit says, and exit. For shell completion; see shellutil/completion.sh.")
+
+   parser.add_option("--format",
+                     action="store",
+                     type="choice",
+                     choices=OUTPUT_FORMATS,
+                     dest="format",
+                     help="The format -l and -m print files in: repr, the default of -l, path, a line each and the default of -m, nul, separated by NUL characters for xargs -0, tsv, the basename and the path separated by a tab, or jsonl, a JSON object a line.")
+
+   parser.add_option("--filter",
+                     action="store",
+                     dest="filter",
+                     metavar="EXPRESSION",
+                     help="Only dump the files whose name matches the expression with -l.")
+
+   parser.add_option("--limit",
+                     action="store",
+                     type="int",
+                     dest="limit",
+                     help="Print at most this many files with -l, -m and --complete.")
+
    parser.add_option("-d",
                      "--find-directory",
                      action="store",
                      dest="directoryExpression",
-                     help="Given an expression invoke the interactive narrowing process to allow the selection of a unique directory. Once a unique directory is found print the directory in which the file(s) reside to stdout.")
+                     help="Given an expression invoke the interactive narrowing process to allow the selection of a unique directory and print it to stdout. The expression is matched against the names of the directories, or if it matches none against the names of the files, in which case the directory the files reside in is printed.")
 
    parser.add_option("-f",
                      "--find-file",
@@ -68,106 +204,436 @@ def me_main():
 
 
 
-   (options, args) = parser.parse_args(sys.argv[1:])
+   parser.add_option("-z",
+                     "--fuzzy",
+                     action="store_true",
+                     dest="fuzzy",
+                     help="Treat the expression as an abbreviation rather than a regular expression: list the files whose name contains its characters in order, best match first. A plain word that matches nothing as a regular expression is always retried this way.")
 
-   #print options, args
+   parser.add_option("-t",
+                     "--table",
+                     action="append",
+                     dest="tables",
+                     metavar="NAME",
+                     help="Also search the location table NAME, such as one shared by every sandbox, and label the files found in it. Can be given more than once. See the federatedTables option.")
 
-   try:
-      if options.rebuild_locationtable:
-         sys.stdout.write("Rebuilding the location table...")
-         sys.stdout.flush()
-         n = rebuildLocationTable(conf)
-         sys.stdout.write(" " + str(n) + " files indexed.\n")
-      elif options.dump_locationtable:
-         dumpLocationTable(conf, sys.stdout)
-      elif options.directoryExpression:
-         location = findDirectory(conf, options.directoryExpression)
-         if location:
-            sys.stdout.write(location + "\n")
-      elif options.fileExpression:
-         location = findFile(conf, options.fileExpression)
-         if location:
-            sys.stdout.write(location + "\n")
-      elif len(args) == 1:
-         editFile(conf, args[0])
+   parser.add_option("--ask",
+                     action="store_true",
+                     dest="ask",
+                     help="Always narrow interactively, even when past choices single out a file.")
+
+   parser.add_option("--daemon",
+                     action="store_true",
+                     dest="daemon",
+                     help="Keep the configuration and the location table in memory and answer lookups from other invocations of me over a Unix domain socket until stopped. Runs in the foreground.")
+
+   parser.add_option("--stop-daemon",
+                     action="store_true",
+                     dest="stop_daemon",
+                     help="Stop the daemon serving the location table, if there is one, and exit.")
+
+   profiler.addOptions(parser)
+   return parser
+
+
+# The options of the lookups that the shell functions and the completion
+# run on every call, which parseLookup reads without optparse: the
+# attribute each sets and, for those that take a value, how it is read.
+LOOKUP_FLAGS={"-z": "fuzzy", "--fuzzy": "fuzzy", "--ask": "ask"}
+LOOKUP_OPTIONS={"-d": ("directoryExpression", str), "--find-directory": ("directoryExpression", str),
+                "-f": ("fileExpression", str), "--find-file": ("fileExpression", str),
+                "--complete": ("completePrefix", str), "--limit": ("limit", int),
+                "-t": ("tables", str), "--table": ("tables", str)}
+
+
+class LookupOptions:
+   """
+      The options parseLookup read. Those not given are None, as they are
+      in what OptionParser returns.
+   """
+
+   def __getattr__(self, name):
+      return None
+
+
+def parseLookup(argv):
+   """
+      Read the arguments of a single lookup, such as 'me <expression>',
+      'me -d <expression>' or 'me --complete <prefix> --limit <n>', without
+      importing optparse, which nothing else a lookup does needs.
+
+      @returns A tuple (options, args) like OptionParser.parse_args, or
+      None if argv asks for anything else, or anything createParser would
+      read differently, so that the full parser handles it.
+   """
+   options = LookupOptions()
+   args = []
+   i = 0
+   while i < len(argv):
+      arg = argv[i]
+      if not arg.startswith("-"):
+         args.append(arg)
+      elif arg in LOOKUP_FLAGS:
+         setattr(options, LOOKUP_FLAGS[arg], True)
+      elif arg in LOOKUP_OPTIONS and i + 1 < len(argv) and not argv[i + 1].startswith("-"):
+         (dest, kind) = LOOKUP_OPTIONS[arg]
+         value = argv[i + 1]
+         if kind is int:
+            if not value.isdigit():
+               return None
+            value = int(value)
+         if dest == "tables":
+            value = (options.tables or []) + [value]
+         setattr(options, dest, value)
+         i += 1
       else:
-         sys.stderr.write(parser.format_help())
-         sys.exit(1)
-   except KeyboardInterrupt as k:
-      pass
-   except:
-      raise
+         return None
+      i += 1
 
+   lookups = args + [e for e in (options.directoryExpression, options.fileExpression) if e is not None]
+   if options.completePrefix is not None:
+      lookups.append(options.completePrefix)
+   if len(lookups) != 1 or not (lookups[0] or options.completePrefix is not None):
+      return None
+   return (options, args)
 
-def rebuildLocationTable(configuration):
+
+def rebuildLocationTable(configuration, jobs=None):
    """Rebuild the location table
 
+      @param jobs
+      The number of directories to list in parallel, or None for the default.
+
       @returns The length of the location table.
    """
    lt = LocationTable(configuration)
-   lt.rebuild()
+   with profiler.phase("rebuild") as p:
+      lt.rebuild(jobs)
+      p.count(len(lt))
    return len(lt)
 
 
-def dumpLocationTable(configuration, fileobject):
+def refreshLocationTable(configuration, jobs=None):
+   """Bring the location table up to date. @see LocationTable.refresh
+
+      @returns A tuple (changes, length) where changes is what
+      LocationTable.refresh returned and length is the length of the
+      location table.
+   """
+   lt = LocationTable(configuration)
+   with profiler.phase("refresh"):
+      changes = lt.refresh(jobs)
+   return (changes, len(lt))
+
+
+def cloneLocationTable(configuration, sandbox, jobs=None):
+   """Create the location table from the one of another sandbox.
+      @see LocationTable.clone
+
+      @returns A tuple (changes, length) like refreshLocationTable.
+   """
+   lt = LocationTable(configuration)
+   with profiler.phase("clone"):
+      changes = lt.clone(LocationTable(configuration.getTableConfiguration(sandbox)), jobs)
+   return (changes, len(lt))
+
+
+def watchLocationTable(configuration, jobs=None, out=None):
+   """Keep the location table up to date until interrupted. @see Watcher
+
+      @param out
+      An object that supports the write method to report changes to.
+   """
+   from devtools.managededit import watcher
+   if not watcher.isSupported():
+      raise RuntimeError("Watching the location table needs Linux's inotify.")
+   w = watcher.Watcher(configuration, jobs, out)
+   try:
+      w.start()
+      w.run()
+   finally:
+      w.close()
+
+
+def dumpLocationTable(configuration, fileobject, format="repr", pattern=None, limit=None):
    """Dump the location table to stdout.
 
       @param fileobject
       An object that supports the write method.
+
+      @param format, pattern, limit
+      @see LocationTable.dump
    """
    lt = LocationTable(configuration)
-   lt.dump(fileobject)
+   with profiler.phase("dump") as p:
+      p.count(lt.dump(fileobject, format, pattern, limit))
 
 
-def findRecord(configuration, pattern):
+def printMatches(configuration, pattern, fileobject, format="path", limit=None):
+   """Write every file whose basename pattern matches to fileobject as
+      sqlite finds it, from the location table and then the federated
+      tables that exist. Unlike a search nothing is ranked or narrowed,
+      so that the files can be piped to other programs.
+
+      @param format
+      One of OUTPUT_FORMATS. @see getRecordFormatter
+
+      @param limit
+      The most files to write, or None for all of them.
+
+      @returns The number of files written.
+   """
+   configurations = [configuration]
+   for table in configuration.getFederatedTables():
+      tableConfiguration = configuration.getTableConfiguration(table)
+      if os.path.exists(tableConfiguration.getLocationTableFileFullPath()):
+         configurations.append(tableConfiguration)
+
+   def records():
+      remaining = limit
+      for c in configurations:
+         if remaining is not None and remaining <= 0:
+            return
+         for record in LocationTable(c).iterate(pattern, remaining):
+            if remaining is not None:
+               remaining -= 1
+            yield record
+
+   with profiler.phase("matches") as p:
+      n = writeRecords(records(), fileobject, format)
+      p.count(n)
+   return n
+
+
+def completeBasename(configuration, prefix, limit=COMPLETION_LIMIT):
+   """Return the first basenames in the location tables that start with
+      prefix, in order. @see LocationTable.complete
+
+      Nothing is found, rather than a table created, if the location table
+      does not exist yet.
+   """
+   if not os.path.exists(configuration.getLocationTableFileFullPath()):
+      return []
+   lt = openLocationTable(configuration)
+   with profiler.phase("complete") as p:
+      names = lt.complete(prefix, limit)
+      p.count(len(names))
+   return names
+
+
+def openLocationTable(configuration):
+   """Return something to search the location table with. If other tables
+      are to be searched as well it is a FederatedLocationTable over all of
+      them, otherwise what openSingleLocationTable returns. Tables that do
+      not exist yet are left out with a warning.
+   """
+   with profiler.phase("open"):
+      return _openLocationTables(configuration)
+
+
+def _openLocationTables(configuration):
+   """@see openLocationTable"""
+   lt = openSingleLocationTable(configuration)
+   tables = configuration.getFederatedTables()
+   if not tables:
+      return lt
+
+   from devtools.managededit.federation import FederatedLocationTable
+   federated = [(configuration.getLocationTableFile(), lt)]
+   for table in tables:
+      tableConfiguration = configuration.getTableConfiguration(table)
+      if not os.path.exists(tableConfiguration.getLocationTableFileFullPath()):
+         sys.stderr.write("The location table '%s' does not exist, build it with 'DT_SANDBOX_CURRENT=%s me -r'.\n" % (table, table))
+         continue
+      federated.append((table, openSingleLocationTable(tableConfiguration, False)))
+   return FederatedLocationTable(federated)
+
+
+def openSingleLocationTable(configuration, autoStart=None):
+   """Return something to search one location table with: a client of the
+      daemon if one is serving the table, otherwise the LocationTable itself,
+      reading the mapped copy if the locationTableFormat option asks for it.
+      If the autoStartDaemon option is set and no daemon is running one is
+      started for the next lookup.
+
+      @param autoStart
+      Overrides the autoStartDaemon option unless None.
+   """
+   if autoStart is None:
+      autoStart = configuration.getOptionValue("autoStartDaemon")
+   if autoStart or os.path.exists(configuration.getDaemonSocketFileFullPath()):
+      from devtools.managededit import daemon
+      client = daemon.DaemonClient(configuration)
+      if client.connect():
+         return client
+      if daemon.isSupported() and autoStart:
+         daemon.startDaemon()
+   if configuration.getLocationTableFormat() == "mapped":
+      from devtools.managededit.mappedtable import MappedLocationTable
+      return MappedLocationTable(configuration)
+   return LocationTable(configuration)
+
+
+def searchLocationTable(lt, pattern, fuzzyMatching=False):
+   """Search for the files matching pattern.
+
+      @param fuzzyMatching
+      Rank the files pattern matches as an abbreviation instead. A plain
+      word that matches nothing as a regular expression is ranked this way
+      as well. @see LocationTable.fuzzySearch
+   """
+   with profiler.phase("search") as p:
+      res = _search(lt, str(pattern), fuzzyMatching)
+      p.count(len(res))
+   return res
+
+
+def _search(lt, pattern, fuzzyMatching):
+   """@see searchLocationTable"""
+   if not fuzzyMatching:
+      res = lt.search(pattern)
+      if len(res) or not fuzzy.isPlain(pattern):
+         return res
+   return lt.fuzzySearch(pattern)
+
+
+def rankRecords(configuration, pattern, res):
+   """Order the results of a search by past choices. @see FrecencyStore
+
+      @returns The results, or only the record that past choices single
+      out if the autoResolve option is set.
+   """
+   if len(res) < 2 or not configuration.getOptionValue("frecency"):
+      return res
+   with profiler.phase("rank"):
+      chosen = FrecencyStore(configuration).rank(str(pattern), res)
+   if chosen is None or not configuration.getOptionValue("autoResolve"):
+      return res
+   ret = SearchResult()
+   ret.append(chosen)
+   return ret
+
+
+def recordChoice(configuration, pattern, record):
+   """Remember that record was picked from the results of pattern."""
+   if configuration.getOptionValue("frecency"):
+      FrecencyStore(configuration).record(str(pattern), record[1])
+
+
+def isIncremental(configuration):
+   """True if results are narrowed as the user types. @see NarrowingPrompt"""
+   return configuration.getOptionValue("incrementalNarrowing") and narrowing.isSupported()
+
+
+def narrowIncrementally(res):
+   """Let the user pick one of the results, narrowing them as they type.
+
+      @returns A SearchResult holding the record picked, empty if none was.
+   """
+   ret = SearchResult()
+   with profiler.phase("narrow") as p:
+      record = narrowing.narrow(res, labels=res.getLabel)
+      p.count(len(res))
+   if record is not None:
+      ret.append(record)
+   return ret
+
+
+def readCriteria():
+   """Prompt for and read a line of narrowing criteria, with line editing
+      where readline is available.
+   """
+   try:
+      import readline
+   except ImportError:
+      pass
+   sys.stderr.write("> ")
+   return input()
+
+
+def findRecord(configuration, pattern, fuzzyMatching=False):
    """Find the record tuple given a pattern."""
-   lt = LocationTable(configuration)
-   res = lt.search(str(pattern))
+   lt = openLocationTable(configuration)
+   return pickRecord(configuration, pattern, searchLocationTable(lt, pattern, fuzzyMatching))
 
-   while len(res) > 1:
-      res.list()
-      sys.stderr.write("> ")
-      criteria = input()
-      res.narrow(criteria)
+
+def pickRecord(configuration, pattern, res):
+   """Narrow the results of searching for pattern down to one record, by
+      past choices or by asking.
+
+      @returns The record picked, or None.
+   """
+   choices = len(res)
+   res = rankRecords(configuration, pattern, res)
+
+   if len(res) > 1 and isIncremental(configuration):
+      res = narrowIncrementally(res)
+
+   with profiler.phase("narrow"):
+      while len(res) > 1:
+         res.list()
+         res.narrow(readCriteria())
 
    if len(res) == 1:
+      if choices > 1:
+         recordChoice(configuration, pattern, res[0])
       return res[0]
    else:
       return None
 
 
-def findDirectory(configuration, pattern):
-   """Given a pattern call find record, but just return the
-      directory that the file associated with the record is in.
+def findDirectory(configuration, pattern, fuzzyMatching=False):
+   """Given a pattern return the directory it names. The directories whose
+      name pattern matches, or with fuzzyMatching set which it abbreviates,
+      are searched first and narrowed to one. If there are none the files
+      are searched instead and narrowed until they are all in one
+      directory, which is returned.
    """
-   lt = LocationTable(configuration)
-   res = lt.search(str(pattern))
-
-   while not res.getCommonDirectory() and len(res):
-      res.list()
-      sys.stderr.write("> ")
-      criteria = input()
-      res.narrow(criteria)
-
+   lt = openLocationTable(configuration)
+   with profiler.phase("search") as p:
+      if fuzzyMatching:
+         res = lt.fuzzySearchDirectories(str(pattern))
+      else:
+         res = lt.searchDirectories(str(pattern))
+      p.count(len(res))
+   if len(res):
+      r = pickRecord(configuration, pattern, res)
+      return r[1] if r else None
+
+   res = searchLocationTable(lt, pattern, fuzzyMatching)
+   ambiguous = len(res) and not res.getCommonDirectory()
+   res = rankRecords(configuration, pattern, res)
+
+   if not res.getCommonDirectory() and len(res) and isIncremental(configuration):
+      res = narrowIncrementally(res)
+
+   with profiler.phase("narrow"):
+      while not res.getCommonDirectory() and len(res):
+         res.list()
+         res.narrow(readCriteria())
+
+   if ambiguous and len(res):
+      recordChoice(configuration, pattern, res[0])
    return os.path.dirname(res[0][1]) if len(res) else None
 
 
-def findFile(configuration, pattern):
+def findFile(configuration, pattern, fuzzyMatching=False):
    """Given a pattern call find record. Then return the
       full path that the file associated with the record is in.
    """
-   r = findRecord(configuration, pattern)
+   r = findRecord(configuration, pattern, fuzzyMatching)
    if not r:
       return None
    else:
       return r[1]
 
 
-def editFile(configuration, pattern):
+def editFile(configuration, pattern, fuzzyMatching=False):
    """Given a pattern call find record. Then use the return directory
       and invoke the editor stored in the configuration.
    """
-   f = findFile(configuration, pattern)
+   f = findFile(configuration, pattern, fuzzyMatching)
    if f:
+      import subprocess
       command = configuration.getEditor() + ' "' + f + '"'
       subprocess.Popen(command, shell=True)
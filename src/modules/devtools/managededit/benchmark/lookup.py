@@ -0,0 +1,115 @@
+"""
+This files defines a benchmark for looking files up in the location table.
+
+It builds the table once in each format over the same tree and times
+lookups through LocationTable, which reads sqlite, and MappedLocationTable,
+which reads the mapped copy. Every lookup opens the table afresh, as an
+invocation of me does.
+
+   python -m devtools.managededit.benchmark.lookup [-d <directory>|-n <files>]
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from optparse import OptionParser
+
+from devtools.managededit.configuration import Configuration
+from devtools.managededit.locationtable import LocationTable
+from devtools.managededit.mappedtable import MappedLocationTable
+from devtools.managededit.searchpath import SearchPath
+from devtools.managededit.benchmark.tree import makeTree
+
+# Patterns that exercise each way a search is answered: an exact name, an
+# anchored prefix, a literal, a regular expression with a literal and one
+# without.
+PATTERNS=["file1202_2.c", "^file99", "_17.c", r"file12\d+_3\.c$", r"^\w+7_\d\.c$"]
+
+
+def timeLookups(table, pattern, repeat):
+   """
+      @returns A tuple (results, seconds) where seconds is the mean time of
+      a search on a new instance of table's class.
+   """
+   start = time.perf_counter()
+   for i in range(repeat):
+      results = len(table.__class__(table.config_).search(pattern, "/"))
+   return (results, (time.perf_counter() - start) / repeat)
+
+
+def run(directory, repeat, out):
+   """
+      Run the benchmark over directory and write a report to out.
+   """
+   confDir = tempfile.mkdtemp(prefix="mebenchmark")
+   try:
+      os.environ.pop("DT_SANDBOX_CURRENT", None)
+      conf = Configuration(confDir, False)
+      conf.addSearchPath(SearchPath(directory, True))
+      conf.setOption("locationTableFormat", "mapped")
+      # Every lookup is timed the way it runs the first time.
+      conf.setOption("cacheResults", "false")
+      conf.setOption("frecency", "false")
+
+      sqlite = LocationTable(conf)
+      mapped = MappedLocationTable(conf)
+      mapped.rebuild()
+      out.write("%d files, sqlite %d bytes, mapped %d bytes\n" % (
+         len(sqlite),
+         os.path.getsize(conf.getLocationTableFileFullPath()),
+         os.path.getsize(mapped.getMappedFileFullPath())))
+
+      out.write("%-20s %8s %12s %12s %8s\n" % ("pattern", "results", "sqlite ms", "mapped ms", "speedup"))
+      for pattern in PATTERNS:
+         (results, sqliteSeconds) = timeLookups(sqlite, pattern, repeat)
+         (mappedResults, mappedSeconds) = timeLookups(mapped, pattern, repeat)
+         if results != mappedResults:
+            raise RuntimeError("The formats disagree on '" + pattern + "'.")
+         out.write("%-20s %8d %12.3f %12.3f %7.1fx\n" % (
+            pattern, results, sqliteSeconds * 1000, mappedSeconds * 1000,
+            sqliteSeconds / mappedSeconds if mappedSeconds else 0))
+   finally:
+      shutil.rmtree(confDir)
+
+
+def main():
+   parser = OptionParser(usage="usage: %prog [-d <directory>|-n <files>] [-r <repeat>]")
+   parser.add_option("-d", "--directory", dest="directory",
+                     help="Benchmark against an existing directory tree.")
+   parser.add_option("-n", "--files", dest="files", type="int", default=100000,
+                     help="The number of files in the generated tree when no directory is given.")
+   parser.add_option("-r", "--repeat", dest="repeat", type="int", default=10,
+                     help="The number of times each lookup is timed.")
+   (options, args) = parser.parse_args(sys.argv[1:])
+
+   if options.directory:
+      run(options.directory, options.repeat, sys.stdout)
+   else:
+      root = tempfile.mkdtemp(prefix="metree")
+      try:
+         makeTree(root, options.files)
+         run(root, options.repeat, sys.stdout)
+      finally:
+         shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+   main()
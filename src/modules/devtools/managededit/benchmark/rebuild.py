@@ -0,0 +1,129 @@
+"""
+This files defines a benchmark for rebuilding the location table.
+
+It compares the bulk load path of LocationTable.load with the per row,
+string formatted inserts that LocationTable.rebuild used to perform.
+Both are fed the same crawl, so only ingestion is measured; the time
+for a complete rebuild is reported as well.
+
+   python -m devtools.managededit.benchmark.rebuild [-d <directory>|-n <files>]
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+
+from optparse import OptionParser
+
+from devtools.managededit.configuration import Configuration
+from devtools.managededit.crawler import Crawler
+from devtools.managededit.locationtable import LocationTable
+from devtools.managededit.searchpath import SearchPath
+from devtools.managededit.benchmark.tree import makeTree
+
+
+def legacyLoad(path, scans):
+   """
+      Load scans the way LocationTable.rebuild did before the bulk load
+      path existed: one string formatted INSERT per file.
+   """
+   if os.path.isfile(path):
+      os.remove(path)
+   conn = sqlite3.connect(path)
+   c = conn.cursor()
+   c.execute('''CREATE TABLE Location (basename, fullpath)''')
+   conn.commit()
+   n = 0
+   try:
+      for (directory, status, files) in scans:
+         for f in files:
+            base = os.path.basename(f)
+            command = "INSERT INTO Location VALUES ('%s','%s')" % (base, f)
+            c.execute(command)
+            n += 1
+   finally:
+      conn.commit()
+      conn.close()
+   return n
+
+
+def timed(function, *args):
+   start = time.perf_counter()
+   n = function(*args)
+   return (n, time.perf_counter() - start)
+
+
+def report(name, n, seconds, out):
+   out.write("%-10s %10d rows %9.3f s %12.0f rows/s\n" % (name, n, seconds, n / seconds if seconds else 0))
+
+
+def run(directory, jobs, out):
+   """
+      Run the benchmark over directory and write a report to out.
+   """
+   confDir = tempfile.mkdtemp(prefix="mebenchmark")
+   try:
+      os.environ.pop("DT_SANDBOX_CURRENT", None)
+      conf = Configuration(confDir, False)
+      sp = SearchPath(directory, True)
+      conf.addSearchPath(sp)
+      lt = LocationTable(conf)
+
+      scans = list(Crawler(jobs).scan(sp))
+
+      (legacy, legacySeconds) = timed(legacyLoad, os.path.join(confDir, "legacy"), scans)
+      report("legacy", legacy, legacySeconds, out)
+
+      (bulk, bulkSeconds) = timed(lt.load, scans)
+      report("bulk", bulk, bulkSeconds, out)
+
+      (ignored, rebuildSeconds) = timed(lt.rebuild, jobs)
+      report("rebuild", len(lt), rebuildSeconds, out)
+
+      if bulkSeconds:
+         out.write("bulk load speedup: %.1fx\n" % (legacySeconds / bulkSeconds))
+   finally:
+      shutil.rmtree(confDir)
+
+
+def main():
+   parser = OptionParser(usage="usage: %prog [-d <directory>|-n <files>] [-j <jobs>]")
+   parser.add_option("-d", "--directory", dest="directory",
+                     help="Benchmark against an existing directory tree.")
+   parser.add_option("-n", "--files", dest="files", type="int", default=100000,
+                     help="The number of files in the generated tree when no directory is given.")
+   parser.add_option("-j", "--jobs", dest="jobs", type="int",
+                     help="The number of directories to list in parallel.")
+   (options, args) = parser.parse_args(sys.argv[1:])
+
+   if options.directory:
+      run(options.directory, options.jobs, sys.stdout)
+   else:
+      root = tempfile.mkdtemp(prefix="metree")
+      try:
+         makeTree(root, options.files)
+         run(root, options.jobs, sys.stdout)
+      finally:
+         shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+   main()
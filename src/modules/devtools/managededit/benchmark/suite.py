@@ -0,0 +1,246 @@
+"""
+This files defines the benchmark suite of managed edit.
+
+It times the operations me performs, from rebuilding the location table to
+finding a directory, over a tree generated from a TreeShape or an existing
+one, and writes the timings as JSON. Given the JSON of an earlier run, of
+another version say, it also reports the operations that got slower and
+exits with a non-zero status if there are any, so that it can guard
+against regressions.
+
+   python -m devtools.managededit.benchmark.suite [-d <directory>|-n <files> ...] [-o <file>] [-c <baseline>]
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import tempfile
+import platform
+
+from optparse import OptionParser
+
+from devtools.managededit import api
+from devtools.managededit.configuration import Configuration
+from devtools.managededit.locationtable import LocationTable, SearchResult
+from devtools.managededit.searchpath import SearchPath
+from devtools.managededit.benchmark import tree
+
+# Bump whenever the operations or what is reported about them change, since
+# the timings of different formats are not comparable.
+FORMAT_VERSION=1
+
+# The searches that are timed, by name: an exact name, an anchored prefix,
+# a literal, regular expressions with and without a literal, and a name that
+# recurs across directories.
+SEARCHES=[("exact", "file1202_2.c"),
+          ("prefix", "^file99"),
+          ("literal", "_17.c"),
+          ("regex", r"file12\d+_3\.c$"),
+          ("scan", r"^\w+7_\d\.c$"),
+          ("common", "^Makefile$")]
+
+# What the results of the broad search are narrowed by.
+BROAD_SEARCH=r"\.c$"
+NARROW_CRITERIA="file1"
+
+# A file that is alone in its directory under that name in a generated
+# tree, which finds the directory through the files, and the name of
+# directories that are found by it.
+DIRECTORY_SEARCH="file0_0.c"
+DIRECTORY_NAME_SEARCH="^dir3$"
+
+# An operation is reported as slower if it takes this many times as long as
+# in the baseline, and at least MINIMUM_DIFFERENCE seconds longer, below
+# which timings are mostly noise.
+THRESHOLD=1.25
+MINIMUM_DIFFERENCE=0.001
+
+
+def measure(function, repeat):
+   """
+      Call function repeat times.
+
+      @returns A tuple (result, timings) with what the last call returned
+      and the time each call took in seconds.
+   """
+   timings = []
+   result = None
+   for i in range(repeat):
+      start = time.perf_counter()
+      result = function()
+      timings.append(time.perf_counter() - start)
+   return (result, timings)
+
+
+def summarize(timings, count):
+   """
+      @param count
+      The number of records the operation produced, so that runs over
+      different tables are not compared by mistake.
+   """
+   ordered = sorted(timings)
+   return {"seconds": ordered[0],
+           "median": ordered[len(ordered) // 2],
+           "repeat": len(ordered),
+           "count": count}
+
+
+def run(directory, repeat, jobs, rebuildRepeat=3):
+   """
+      Time the operations over directory.
+
+      @returns A dictionary from the name of each operation to its
+      summary. @see summarize
+   """
+   confDir = tempfile.mkdtemp(prefix="mebenchmark")
+   stderr = sys.stderr
+   try:
+      os.environ.pop("DT_SANDBOX_CURRENT", None)
+      conf = Configuration(confDir, False)
+      sp = SearchPath(directory, True)
+      for pattern in tree.DIRECTORY_IGNORES:
+         conf.addDirectoryIgnore(pattern)
+      for pattern in tree.FILE_IGNORES:
+         conf.addFileIgnore(pattern)
+      conf.addSearchPath(sp)
+      # Every lookup is timed the way it runs the first time.
+      conf.setOption("cacheResults", "false")
+      conf.setOption("frecency", "false")
+      conf.setOption("incrementalNarrowing", "false")
+
+      results = {}
+      lt = LocationTable(conf)
+      (ignored, timings) = measure(lambda: lt.rebuild(jobs), rebuildRepeat)
+      results["rebuild"] = summarize(timings, len(lt))
+      (ignored, timings) = measure(lambda: lt.refresh(jobs), rebuildRepeat)
+      results["refresh"] = summarize(timings, len(lt))
+
+      for (name, pattern) in SEARCHES:
+         (res, timings) = measure(lambda: LocationTable(conf).search(pattern, "/"), repeat)
+         results["search." + name] = summarize(timings, len(res))
+
+      broad = list(lt.search(BROAD_SEARCH, "/"))
+      def narrow():
+         res = SearchResult()
+         for r in broad:
+            res.append(r)
+         res.narrow(NARROW_CRITERIA)
+         return res
+      (res, timings) = measure(narrow, repeat)
+      results["narrow"] = summarize(timings, len(res))
+
+      listed = SearchResult()
+      for r in broad:
+         listed.append(r)
+      sys.stderr = io.StringIO()
+      (ignored, timings) = measure(listed.list, repeat)
+      sys.stderr = stderr
+      results["list"] = summarize(timings, len(listed))
+
+      (ignored, timings) = measure(lambda: lt.dump(io.StringIO()), repeat)
+      results["dump"] = summarize(timings, len(lt))
+
+      (found, timings) = measure(lambda: api.findDirectory(conf, DIRECTORY_SEARCH), repeat)
+      results["findDirectory"] = summarize(timings, 1 if found else 0)
+
+      (res, timings) = measure(lambda: LocationTable(conf).searchDirectories(DIRECTORY_NAME_SEARCH), repeat)
+      results["searchDirectories"] = summarize(timings, len(res))
+      return results
+   finally:
+      sys.stderr = stderr
+      shutil.rmtree(confDir)
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+   """
+      @returns A list of tuples (name, baseline, current) with the
+      fastest timings of the operations that got slower.
+   """
+   if baseline.get("version") != current.get("version"):
+      raise RuntimeError("The baseline was written by a different version of the suite.")
+   ret = []
+   for (name, now) in sorted(current["results"].items()):
+      then = baseline["results"].get(name)
+      if then is None or then["count"] != now["count"]:
+         continue
+      if (now["seconds"] > then["seconds"] * threshold and
+          now["seconds"] - then["seconds"] >= MINIMUM_DIFFERENCE):
+         ret.append((name, then["seconds"], now["seconds"]))
+   return ret
+
+
+def main():
+   parser = OptionParser(usage="usage: %prog [-d <directory>|-n <files> ...] [-r <repeat>] [-j <jobs>] [-o <file>] [-c <baseline> [-t <threshold>]]")
+   parser.add_option("-d", "--directory", dest="directory",
+                     help="Benchmark against an existing directory tree instead of a generated one.")
+   tree.addShapeOptions(parser)
+   parser.add_option("-r", "--repeat", dest="repeat", type="int", default=10,
+                     help="The number of times each lookup is timed.")
+   parser.add_option("-j", "--jobs", dest="jobs", type="int",
+                     help="The number of directories to list in parallel.")
+   parser.add_option("-l", "--label", dest="label", default="",
+                     help="A label for the run, such as the version benchmarked, stored with the results.")
+   parser.add_option("-o", "--output", dest="output",
+                     help="Write the results to this file instead of stdout.")
+   parser.add_option("-c", "--compare", dest="baseline",
+                     help="Compare the results with those of an earlier run and exit with status 1 if anything got slower.")
+   parser.add_option("-t", "--threshold", dest="threshold", type="float", default=THRESHOLD,
+                     help="How many times slower than the baseline an operation has to be to count as a regression.")
+   (options, args) = parser.parse_args(sys.argv[1:])
+
+   report = {"version": FORMAT_VERSION,
+             "label": options.label,
+             "python": platform.python_version(),
+             "sqlite": sqlite3.sqlite_version,
+             "platform": sys.platform}
+   if options.directory:
+      report["tree"] = {"directory": os.path.abspath(options.directory)}
+      report["results"] = run(options.directory, options.repeat, options.jobs)
+   else:
+      shape = tree.getShape(options)
+      root = tempfile.mkdtemp(prefix="metree")
+      try:
+         report["tree"] = shape.getState()
+         report["tree"].update(tree.makeTree(root, None, shape=shape))
+         report["results"] = run(root, options.repeat, options.jobs)
+      finally:
+         shutil.rmtree(root)
+
+   text = json.dumps(report, indent=1, sort_keys=True) + "\n"
+   if options.output:
+      with open(options.output, "w") as f:
+         f.write(text)
+   else:
+      sys.stdout.write(text)
+
+   if options.baseline:
+      with open(options.baseline) as f:
+         baseline = json.load(f)
+      regressions = compare(baseline, report, options.threshold)
+      for (name, then, now) in regressions:
+         sys.stderr.write("%-16s %10.3f ms -> %10.3f ms (%.2fx)\n" % (name, then * 1000, now * 1000, now / then))
+      if regressions:
+         sys.exit(1)
+
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,196 @@
+"""
+This files defines the generator of the synthetic trees the benchmarks run
+over.
+
+A tree is described by a TreeShape and depends on nothing else, the seed
+included, so that two runs, or two versions of devtools, are timed over
+exactly the same files. Besides its size and shape a tree can have
+basenames that recur across directories, as Makefile or __init__.py do in
+real trees, and files that DIRECTORY_IGNORES and FILE_IGNORES skip, as
+build output and version control metadata are.
+
+   python -m devtools.managededit.benchmark.tree <directory> [-n <files>] ...
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import random
+
+# The names of the ignored directories and the extensions of the ignored
+# files in a tree, and the rules that skip them.
+IGNORED_DIRECTORIES=["build", ".svn"]
+IGNORED_EXTENSIONS=[".o", ".pyc"]
+DIRECTORY_IGNORES=[r"/build$", r"/\.svn$"]
+FILE_IGNORES=[r"\.o$", r"\.pyc$"]
+
+# Where the recurring basenames come from.
+COMMON_NAMES=["Makefile", "__init__.py", "README", "index.js", "CMakeLists.txt",
+              "main.c", "util.h", "config.py", "test.cc", "BUILD"]
+
+
+class TreeShape:
+   """
+      The parameters of a generated tree.
+   """
+
+   def __init__(self, files=100000, depth=6, fanout=8, filesPerDirectory=40,
+                duplicates=0.0, ignored=0.0, seed=0):
+      """
+         @param files
+         The number of files that are not ignored.
+
+         @param depth
+         The most directories between the root and a file.
+
+         @param fanout
+         The number of subdirectories of a directory above the deepest
+         level.
+
+         @param duplicates
+         The fraction of the files named after one of COMMON_NAMES.
+
+         @param ignored
+         How many files the ignore rules skip, as a fraction of files.
+         Half are in ignored directories and half have ignored extensions.
+      """
+      self.files = files
+      self.depth = depth
+      self.fanout = fanout
+      self.filesPerDirectory = filesPerDirectory
+      self.duplicates = duplicates
+      self.ignored = ignored
+      self.seed = seed
+
+   def getState(self):
+      """
+         The shape as plain data, for reports.
+      """
+      return {"files": self.files, "depth": self.depth, "fanout": self.fanout,
+              "filesPerDirectory": self.filesPerDirectory, "duplicates": self.duplicates,
+              "ignored": self.ignored, "seed": self.seed}
+
+
+def _touch(path):
+   os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o644))
+
+
+def makeTree(root, files, fanout=8, filesPerDirectory=40, shape=None):
+   """
+      Create a tree of empty files beneath root, breadth first, filling
+      each directory before going deeper. Once the deepest level is full
+      the rest of the files are spread over the directories there are.
+
+      @param shape
+      A TreeShape, which overrides the other arguments.
+
+      @returns A dictionary with the number of files and directories
+      created, and of the files the ignore rules skip.
+   """
+   if shape is None:
+      shape = TreeShape(files, depth=sys.maxsize, fanout=fanout, filesPerDirectory=filesPerDirectory)
+   rand = random.Random(shape.seed)
+   stats = {"files": 0, "directories": 0, "ignoredFiles": 0}
+
+   def fill(directory, count):
+      for i in range(count):
+         n = stats["files"]
+         path = os.path.join(directory, "file%d_%d.c" % (n, i))
+         if shape.duplicates and rand.random() < shape.duplicates:
+            common = os.path.join(directory, rand.choice(COMMON_NAMES))
+            if not os.path.exists(common):
+               path = common
+         _touch(path)
+         stats["files"] += 1
+         if shape.ignored and rand.random() < shape.ignored / 2:
+            _touch(os.path.join(directory, "file%d%s" % (n, rand.choice(IGNORED_EXTENSIONS))))
+            stats["ignoredFiles"] += 1
+
+   def ignoredDirectory(directory):
+      # About as many files as the ignored extensions add.
+      path = os.path.join(directory, rand.choice(IGNORED_DIRECTORIES))
+      os.makedirs(path, exist_ok=True)
+      count = max(1, int(shape.filesPerDirectory * shape.ignored / 2))
+      for i in range(count):
+         _touch(os.path.join(path, "out%d.o" % (i)))
+      stats["ignoredFiles"] += count
+
+   directories = []
+   pending = [(root, 0)]
+   while pending and stats["files"] < shape.files:
+      (directory, level) = pending.pop(0)
+      os.makedirs(directory, exist_ok=True)
+      directories.append(directory)
+      stats["directories"] += 1
+      fill(directory, min(shape.filesPerDirectory, shape.files - stats["files"]))
+      if shape.ignored and rand.random() < shape.ignored:
+         ignoredDirectory(directory)
+      if level < shape.depth:
+         for i in range(shape.fanout):
+            pending.append((os.path.join(directory, "dir%d" % i), level + 1))
+
+   i = 0
+   while stats["files"] < shape.files:
+      fill(directories[i % len(directories)], 1)
+      i += 1
+   return stats
+
+
+def addShapeOptions(parser):
+   """
+      Add the options that describe a TreeShape to an OptionParser.
+      @see getShape
+   """
+   shape = TreeShape()
+   parser.add_option("-n", "--files", dest="files", type="int", default=shape.files,
+                     help="The number of files in the generated tree.")
+   parser.add_option("--depth", dest="depth", type="int", default=shape.depth,
+                     help="The depth of the generated tree.")
+   parser.add_option("--fanout", dest="fanout", type="int", default=shape.fanout,
+                     help="The number of subdirectories of each directory.")
+   parser.add_option("--per-directory", dest="filesPerDirectory", type="int", default=shape.filesPerDirectory,
+                     help="The number of files in each directory.")
+   parser.add_option("--duplicates", dest="duplicates", type="float", default=shape.duplicates,
+                     help="The fraction of files with a basename that recurs across directories.")
+   parser.add_option("--ignored", dest="ignored", type="float", default=shape.ignored,
+                     help="The number of files the ignore rules skip, as a fraction of the files.")
+   parser.add_option("--seed", dest="seed", type="int", default=shape.seed,
+                     help="The seed of the generated tree.")
+
+
+def getShape(options):
+   """
+      @returns The TreeShape the options added by addShapeOptions describe.
+   """
+   return TreeShape(options.files, options.depth, options.fanout, options.filesPerDirectory,
+                    options.duplicates, options.ignored, options.seed)
+
+
+def main():
+   from optparse import OptionParser
+
+   parser = OptionParser(usage="usage: %prog <directory> [-n <files>] [--depth <depth>] [--fanout <fanout>] [--per-directory <files>] [--duplicates <fraction>] [--ignored <fraction>] [--seed <seed>]")
+   addShapeOptions(parser)
+   (options, args) = parser.parse_args(sys.argv[1:])
+   if len(args) != 1:
+      parser.error("Expected the directory to create the tree in.")
+   stats = makeTree(args[0], None, shape=getShape(options))
+   sys.stdout.write("%(files)d files, %(directories)d directories, %(ignoredFiles)d ignored files\n" % stats)
+
+
+if __name__ == "__main__":
+   main()
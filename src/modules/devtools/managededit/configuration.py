@@ -18,15 +18,14 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import os
-import xml.parsers.expat
-import re
-import sys
+import copy
 
 import devtools.common.configuration
 import devtools.common.utility
 from devtools.common.option import *
 
-from devtools.managededit.searchpath import SearchPath
+from devtools.managededit.searchpath import SearchPath, SOURCES, restoreSearchPath
+from devtools.managededit.ignore import IgnoreRules
 
 class Configuration(devtools.common.configuration.Configuration):
    """
@@ -46,6 +45,59 @@ class Configuration(devtools.common.configuration.Configuration):
          values.
       -->
       <Option key="searchCurrentWorkingDirectory" value="false"/>
+
+      <!--
+         Keep a trigram index of the file names in the location table so
+         that searches containing a literal of three or more characters
+         do not have to scan the whole table. The index makes the table
+         larger. Takes effect on the next rebuild.
+      -->
+      <Option key="indexTrigrams" value="true"/>
+
+      <!--
+         Start the managed edit daemon in the background whenever me
+         finds that no daemon is serving the location table. Only on
+         systems with Unix domain sockets.
+      -->
+      <Option key="autoStartDaemon" value="false"/>
+
+      <!--
+         sqlite or mapped. With mapped, every write of the location table
+         also writes a compact, memory mapped copy of it that lookups read
+         instead, which is faster to open. Takes effect on the next
+         rebuild.
+      -->
+      <Option key="locationTableFormat" value="sqlite"/>
+
+      <!--
+         Remember which file is picked for which expression. Files picked
+         often and recently are listed first and, with autoResolve, a file
+         that clearly dominates is picked without asking.
+      -->
+      <Option key="frecency" value="true"/>
+      <Option key="autoResolve" value="true"/>
+
+      <!--
+         Keep the results of recent searches next to the location table
+         so that repeating a search does not scan the table again. The
+         results are dropped whenever the table changes.
+      -->
+      <Option key="cacheResults" value="true"/>
+
+      <!--
+         Narrow the files found as each key is typed rather than a line at
+         a time. Up and Down move the selection and Enter picks it. Only
+         when me runs in a terminal.
+      -->
+      <Option key="incrementalNarrowing" value="true"/>
+
+      <!--
+         The names of other location tables to search along with the
+         current one, separated by commas, such as a table of a large read
+         only tree shared by every sandbox. Files found in them are
+         labelled with the name of their table. me -t adds more.
+      -->
+      <Option key="federatedTables" value=""/>
    </Options>
 
    <GlobalIgnores>
@@ -63,8 +115,20 @@ class Configuration(devtools.common.configuration.Configuration):
       <!--
       <SearchPath path="${HOME}" recursive="true"/>
       <SearchPath path="" recursive="true|false"/>
+      <SearchPath path="${HOME}/src" recursive="true" source="walk|git">
+         <DirectoryIgnore pattern="/build$"/>
+         <FileIgnore pattern="\.o$"/>
+      </SearchPath>
       -->
    </SearchPaths>
+
+   <!--
+   The SearchPaths of a named table are only used to build that table:
+   DT_SANDBOX_CURRENT=third-party me -r
+   <SearchPaths table="third-party">
+      <SearchPath path="/opt/third-party" recursive="true"/>
+   </SearchPaths>
+   -->
 </ManagedEditConfiguration>
 """
 
@@ -84,8 +148,12 @@ class Configuration(devtools.common.configuration.Configuration):
             self.sampleConfigurationFile_)
 
       self.searchPaths_ = set()
-      self.fileIgnores_ = []
-      self.dirIgnores_ = []
+      self.tableSearchPaths_ = {}
+      self.federatedTables_ = []
+      self.fileIgnorePatterns_ = []
+      self.fileIgnores_ = None
+      self.dirIgnorePatterns_ = []
+      self.dirIgnores_ = None
 
       self.setDefaultOptions()
 
@@ -106,9 +174,39 @@ class Configuration(devtools.common.configuration.Configuration):
       # Create the location table dir.
       self.conditionallyCreateLocationTableDir()
 
+      self.parsed_ = False
+
+   def conditionallyParseConfigurationFile(self):
+      """
+         Read the configuration file the first time anything that comes
+         from it is asked for, so that clients which only need to know
+         where the location table lives never parse it.
+      """
+      if self.parsed_:
+         return
+      self.parsed_ = True
       if os.path.exists(self.getConfigurationFileFullPath()):
-         p = ConfigurationFileParser(self)
-         p.parse(self.getConfigurationFileFullPath())
+         self.parseConfigurationFile()
+
+   def createConfigurationFileParser(self):
+      return ConfigurationFileParser(self)
+
+   def getSnapshotState(self):
+      return {"options": self.getOptionValues(),
+              "searchPaths": [sp.getState() for sp in self.searchPaths_],
+              "tableSearchPaths": dict((table, [sp.getState() for sp in searchPaths])
+                                       for (table, searchPaths) in self.tableSearchPaths_.items()),
+              "fileIgnores": list(self.fileIgnorePatterns_),
+              "directoryIgnores": list(self.dirIgnorePatterns_)}
+
+   def restoreSnapshotState(self, state):
+      for (key, value) in state["options"].items():
+         self.setOption(key, value)
+      self.searchPaths_ = set(restoreSearchPath(sp) for sp in state["searchPaths"])
+      self.tableSearchPaths_ = dict((table, set(restoreSearchPath(sp) for sp in searchPaths))
+                                    for (table, searchPaths) in state["tableSearchPaths"].items())
+      self.fileIgnorePatterns_ = list(state["fileIgnores"])
+      self.dirIgnorePatterns_ = list(state["directoryIgnores"])
 
    def getEditor(self):
       """
@@ -122,6 +220,59 @@ class Configuration(devtools.common.configuration.Configuration):
       """
       return self.locationTableFile_
 
+   def getSandboxDirectory(self):
+      """
+         The directory of the sandbox the location table belongs to,
+         DT_SANDBOX_ROOT/<table>, or None if there is no such directory.
+         @see shellutil/sandbox.sh
+      """
+      if "DT_SANDBOX_ROOT" not in os.environ:
+         return None
+      ret = os.path.join(os.environ["DT_SANDBOX_ROOT"], self.locationTableFile_)
+      return ret if os.path.isdir(ret) else None
+
+   def getTableConfiguration(self, table):
+      """
+         Return a copy of this configuration for the location table named
+         table instead of the current one.
+      """
+      ret = copy.copy(self)
+      ret.locationTableFile_ = table
+      # Either of the two may read the configuration file first, so they
+      # share nothing that reading it or setting it up changes.
+      ret.options_ = copy.deepcopy(self.options_)
+      ret.searchPaths_ = set(self.searchPaths_)
+      ret.tableSearchPaths_ = dict((t, set(searchPaths)) for (t, searchPaths) in self.tableSearchPaths_.items())
+      ret.federatedTables_ = list(self.federatedTables_)
+      ret.fileIgnorePatterns_ = list(self.fileIgnorePatterns_)
+      ret.dirIgnorePatterns_ = list(self.dirIgnorePatterns_)
+      return ret
+
+   def addFederatedTable(self, table):
+      """
+         Search the location table named table along with the current one.
+      """
+      self.federatedTables_.append(str(table))
+
+   def getFederatedTables(self):
+      """
+         The names of the other location tables to search, from the
+         federatedTables option and addFederatedTable, each once.
+      """
+      names = self.getOptionValue("federatedTables").split(",") + self.federatedTables_
+      ret = []
+      for name in (n.strip() for n in names):
+         if name and name != self.locationTableFile_ and name not in ret:
+            ret.append(name)
+      return ret
+
+   def getDaemonSocketFileFullPath(self):
+      """
+         Get the full path to the socket the daemon serving the location
+         table listens on.
+      """
+      return self.getLocationTableFileFullPath() + ".sock"
+
    def getLocationTableSubdirFullPath(self):
       """
          Get the full path to the location table.
@@ -139,30 +290,90 @@ class Configuration(devtools.common.configuration.Configuration):
          self.locationTableSubdir_,
          self.locationTableFile_)
 
-   def addSearchPath(self, searchpath):
-      self.searchPaths_.add(searchpath)
+   def addSearchPath(self, searchpath, table=None):
+      """
+         @param table
+         The name of the location table the search path belongs to, or None
+         for the tables without SearchPaths of their own.
+      """
+      self.conditionallyParseConfigurationFile()
+      if table is None:
+         self.searchPaths_.add(searchpath)
+      else:
+         self.tableSearchPaths_.setdefault(table, set()).add(searchpath)
 
    def getSearchPaths(self):
-      return self.searchPaths_
+      """
+         The SearchPaths of the current location table.
+      """
+      self.conditionallyParseConfigurationFile()
+      return self.tableSearchPaths_.get(self.locationTableFile_, self.searchPaths_)
 
    def addFileIgnore(self, patternString):
-      self.fileIgnores_.append(re.compile(str(patternString)))
+      self.conditionallyParseConfigurationFile()
+      self.fileIgnorePatterns_.append(str(patternString))
+      self.fileIgnores_ = None
 
    def getFileIgnores(self):
+      """
+         The global FileIgnore patterns as IgnoreRules. They are compiled
+         the first time they are asked for, since a lookup never needs them.
+      """
+      self.conditionallyParseConfigurationFile()
+      if self.fileIgnores_ is None:
+         self.fileIgnores_ = IgnoreRules(self.fileIgnorePatterns_)
       return self.fileIgnores_
 
    def addDirectoryIgnore(self, patternString):
-     self.dirIgnores_.append(re.compile(devtools.common.utility.substituteEnvironment(patternString)))
+     self.conditionallyParseConfigurationFile()
+     self.dirIgnorePatterns_.append(devtools.common.utility.substituteEnvironment(patternString))
+     self.dirIgnores_ = None
 
    def getDirectoryIgnores(self):
+      """
+         The global DirectoryIgnore patterns as IgnoreRules.
+         @see getFileIgnores
+      """
+      self.conditionallyParseConfigurationFile()
+      if self.dirIgnores_ is None:
+         self.dirIgnores_ = IgnoreRules(self.dirIgnorePatterns_)
       return self.dirIgnores_
 
+   def getOption(self, key):
+      self.conditionallyParseConfigurationFile()
+      return devtools.common.configuration.Configuration.getOption(self, key)
+
+   def getLocationTableFormat(self):
+      """
+         The value of the locationTableFormat option, "sqlite" or "mapped".
+      """
+      ret = self.getOptionValue("locationTableFormat")
+      if ret not in ("sqlite", "mapped"):
+         raise RuntimeError("The option 'locationTableFormat' must be 'sqlite' or 'mapped', not '" + ret + "'.")
+      return ret
+
    def setDefaultOptions(self):
        """
           searchCurrentWorkingDirectory=False
+          indexTrigrams=True
+          autoStartDaemon=False
+          locationTableFormat=sqlite
+          frecency=True
+          autoResolve=True
+          cacheResults=True
+          incrementalNarrowing=True
+          federatedTables=
        """
        self.clearOptions()
        self.addOption(BooleanOption("searchCurrentWorkingDirectory", False))
+       self.addOption(BooleanOption("indexTrigrams", True))
+       self.addOption(BooleanOption("autoStartDaemon", False))
+       self.addOption(StringOption("locationTableFormat", "sqlite"))
+       self.addOption(BooleanOption("frecency", True))
+       self.addOption(BooleanOption("autoResolve", True))
+       self.addOption(BooleanOption("cacheResults", True))
+       self.addOption(BooleanOption("incrementalNarrowing", True))
+       self.addOption(StringOption("federatedTables", ""))
 
    def conditionallyCreateLocationTableDir(self):
       if self.getConfigurationDirectory() != self.getLocationTableSubdirFullPath():
@@ -188,8 +399,12 @@ class ConfigurationFileParser:
    def reset(self):
       self.state_ = None
       self.currentSearchPath_ = None
+      self.currentTable_ = None
 
    def parse(self, filename):
+      # Imported here since a current snapshot spares parsing the file.
+      import xml.parsers.expat
+
       p = xml.parsers.expat.ParserCreate()
       p.StartElementHandler = self.startElement
       p.EndElementHandler = self.endElement
@@ -208,6 +423,7 @@ class ConfigurationFileParser:
          self.handleStateTransition(self.IN_GLOBAL_IGNORES)
       elif name == "SearchPaths":
          self.handleStateTransition(self.IN_SEARCHPATHS)
+         self.currentTable_ = attrs.get('table') or None
       elif name == "Option":
          self.handleOption(attrs)
       elif name == "FileIgnore":
@@ -226,6 +442,7 @@ class ConfigurationFileParser:
    def endElement(self, name):
       if name == "Options" or name == "GlobalIgnores" or name == "SearchPaths":
          self.state_ = None
+         self.currentTable_ = None
       elif name == "SearchPath":
          self.currentSearchPath_ = None
 
@@ -253,7 +470,7 @@ class ConfigurationFileParser:
          self.configuration_.addFileIgnore(pattern)
 
       elif self.state_ == self.IN_SEARCHPATHS and self.currentSearchPath_:
-         sys.stderr.write("SearchPath file ignores are not implemented.\n")
+         self.currentSearchPath_.addFileIgnore(pattern)
 
       else:
          raise RuntimeError("Misplaced SearchPath element.")
@@ -293,5 +510,9 @@ class ConfigurationFileParser:
          else:
             raise RuntimeError("Expected the attribute 'recursive' of a SearchPath element to have the value 'true' or 'false'.")
 
-      self.currentSearchPath_ = SearchPath(path, recursive)
-      self.configuration_.addSearchPath(self.currentSearchPath_)
+      source = attrs.get('source', "walk")
+      if source not in SOURCES:
+         raise RuntimeError("Expected the attribute 'source' of a SearchPath element to have one of the values: %s." % (", ".join(SOURCES)))
+
+      self.currentSearchPath_ = SearchPath(path, recursive, source)
+      self.configuration_.addSearchPath(self.currentSearchPath_, self.currentTable_)
@@ -0,0 +1,195 @@
+"""
+This files defines the class Crawler.
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+
+from devtools.managededit.ignore import toIgnoreRules
+
+
+def defaultJobs():
+   """
+      The number of worker threads used when none is requested. Listing a
+      directory mostly waits on the file system so we use more threads than
+      there are processors.
+   """
+   return min(32, (os.cpu_count() or 1) + 4)
+
+
+def listDirectory(path):
+   """
+      List a single directory with os.scandir.
+
+      @returns A tuple (dirs, files, links) where dirs and files are lists of
+      names as os.walk would report them and links is the set of the names
+      in dirs that are symbolic links (and so are not descended into).
+      Unreadable directories are reported as empty, which is what os.walk
+      does as well.
+   """
+   dirs = []
+   files = []
+   links = set()
+   try:
+      it = os.scandir(path)
+   except OSError:
+      return (dirs, files, links)
+
+   with it:
+      for entry in it:
+         try:
+            isDir = entry.is_dir()
+         except OSError:
+            isDir = False
+
+         if isDir:
+            dirs.append(entry.name)
+            try:
+               if entry.is_symlink():
+                  links.add(entry.name)
+            except OSError:
+               pass
+         else:
+            files.append(entry.name)
+
+   return (dirs, files, links)
+
+
+class Crawler:
+   """
+      A Crawler enumerates the files beneath a SearchPath. It produces the
+      same records as SearchPath.walk, but lists directories with os.scandir
+      and spreads the listing across a bounded pool of worker threads.
+
+      Records are not produced in the same order as SearchPath.walk.
+   """
+
+   def __init__(self, jobs=None):
+      """
+         @param jobs
+         The maximum number of directories listed at once. None selects
+         defaultJobs(); 1 crawls on the calling thread.
+      """
+      if jobs is None:
+         jobs = defaultJobs()
+      if int(jobs) < 1:
+         raise ValueError("The number of jobs must be at least 1.")
+      self.jobs_ = int(jobs)
+
+   def getJobs(self):
+      return self.jobs_
+
+   def walk(self, searchPath, dirIgnores=[], fileIgnores=[]):
+      """
+         Yield the full path of every file beneath searchPath.
+
+         @see SearchPath.walk
+      """
+      for (directory, status, files) in self.scan(searchPath, dirIgnores, fileIgnores):
+         for f in files:
+            yield f
+
+   def scan(self, searchPath, dirIgnores=[], fileIgnores=[], previous=None):
+      """
+         Yield a tuple (directory, status, files) for each directory visited
+         beneath searchPath. status is the os.stat_result of the directory,
+         taken before it was listed, or None if it could not be examined (in
+         which case files is empty). files is the list of full paths of the
+         accepted files directly in the directory.
+
+         @param previous
+         An optional mapping from a directory path to a tuple
+         (mtime, inode, subdirs) recorded by an earlier scan, where mtime is
+         in nanoseconds and subdirs is a list of full paths. A directory
+         whose mtime and inode are unchanged is not listed again; files is
+         None for it and its recorded subdirs are visited instead.
+      """
+      dirIgnores = searchPath.getDirectoryIgnores(dirIgnores)
+      fileIgnores = toIgnoreRules(fileIgnores)
+
+      # A search path that lists its files from version control has every
+      # directory with files listed afresh.
+      listing = searchPath.listRepository(dirIgnores, fileIgnores)
+      if listing is not None:
+         for (directory, files) in listing:
+            try:
+               status = os.stat(directory)
+            except OSError:
+               continue
+            yield (directory, status, files)
+         return
+
+      def examine(directory):
+         try:
+            status = os.stat(directory)
+         except OSError:
+            return (None, None, [])
+
+         if previous is not None and directory in previous:
+            (mtime, inode, subdirs) = previous[directory]
+            if mtime == status.st_mtime_ns and inode == status.st_ino:
+               return (status, None, subdirs)
+
+         return (status, listDirectory(directory), None)
+
+      def visit(directory, examined):
+         (status, listing, recorded) = examined
+         if status is None:
+            return ([], status, [])
+
+         subdirs = []
+         if listing is None:
+            if searchPath.isRecursive():
+               subdirs = [d for d in recorded
+                          if not searchPath.isDirectoryIgnored(d, dirIgnores)]
+            return (subdirs, status, None)
+
+         (dirs, files, links) = listing
+         if searchPath.isRecursive():
+            for d in dirs:
+               fullDir = os.path.join(directory, d)
+               if d not in links and not searchPath.isDirectoryIgnored(fullDir, dirIgnores):
+                  subdirs.append(fullDir)
+         return (subdirs, status, searchPath.acceptFiles(directory, files, fileIgnores))
+
+      if self.jobs_ == 1:
+         pending = [searchPath.getPath()]
+         while pending:
+            directory = pending.pop()
+            (subdirs, status, files) = visit(directory, examine(directory))
+            pending.extend(reversed(subdirs))
+            yield (directory, status, files)
+         return
+
+      # Imported here since it is slow to import and lookups never crawl.
+      import concurrent.futures
+
+      pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs_)
+      try:
+         top = searchPath.getPath()
+         futures = {pool.submit(examine, top) : top}
+         while futures:
+            (done, notDone) = concurrent.futures.wait(
+               futures, return_when=concurrent.futures.FIRST_COMPLETED)
+            for f in done:
+               directory = futures.pop(f)
+               (subdirs, status, files) = visit(directory, f.result())
+               for d in subdirs:
+                  futures[pool.submit(examine, d)] = d
+               yield (directory, status, files)
+      finally:
+         pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,365 @@
+"""
+This files defines the classes Daemon, DaemonClient and ResidentLocationTable.
+
+A Daemon keeps a Configuration and an in memory copy of the location table
+loaded and answers queries over a Unix domain socket that lives next to the
+location table. me uses it through a DaemonClient when it is running, which
+saves starting up sqlite, parsing the configuration file and reading the
+table from disk on every lookup.
+
+Requests are answered one at a time, so each connection carries a single
+request: one line holding a JSON object, answered by one line holding
+another. Requests have an "op" member:
+
+   {"op": "ping"}
+   {"op": "search", "pattern": p, "cwd": d}
+   {"op": "narrow", "pattern": p, "cwd": d, "criteria": [c, ...]}
+   {"op": "directory", "pattern": p, "cwd": d, "criteria": [c, ...]}
+   {"op": "fuzzy", "pattern": p, "limit": n}
+   {"op": "directories", "pattern": p}
+   {"op": "fuzzyDirectories", "pattern": p, "limit": n}
+   {"op": "complete", "prefix": p, "limit": n}
+   {"op": "stop"}
+
+Responses carry "results", a list of [basename, fullpath] pairs, best
+first for "fuzzy" and "fuzzyDirectories", of directories for
+"directories" and "fuzzyDirectories", and for
+"directory" also "directory", the common directory of the results or
+null. "complete" is answered with "names", a list of basenames.
+Failures are reported as {"error": message}.
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import json
+import socket
+import socketserver
+
+from devtools.managededit.configuration import Configuration
+from devtools.managededit.locationtable import LocationTable, SearchResult, COMPLETION_LIMIT
+from devtools.managededit import fuzzy
+
+# Seconds a client waits for the daemon before falling back to reading the
+# location table itself.
+CONNECT_TIMEOUT=0.5
+REQUEST_TIMEOUT=30
+
+
+def getSocketPath(configuration):
+   """
+      The socket the daemon for the configuration's location table listens
+      on. Each sandbox has its own table and so its own daemon.
+   """
+   return configuration.getDaemonSocketFileFullPath()
+
+
+def isSupported():
+   return hasattr(socket, "AF_UNIX")
+
+
+class ResidentLocationTable(LocationTable):
+   """
+      A LocationTable that answers queries from an in memory copy of the
+      live table. The copy is reloaded whenever a rebuild or refresh
+      changes the table on disk.
+   """
+
+   def __init__(self, configuration):
+      LocationTable.__init__(self, configuration)
+      self.memory_ = None
+      self.identity_ = None
+
+   def _getFileIdentity(self):
+      try:
+         st = os.stat(self.config_.getLocationTableFileFullPath())
+      except OSError:
+         return None
+      return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+   def _opendb(self):
+      identity = self._getFileIdentity()
+      if self.memory_ is None or identity != self.identity_:
+         disk = LocationTable._opendb(self)
+         memory = self._connect(":memory:")
+         try:
+            disk.backup(memory)
+         finally:
+            disk.close()
+         if self.memory_ is not None:
+            self.memory_.close()
+         self.memory_ = memory
+         self.identity_ = identity
+      return self.memory_
+
+   def _closedb(self, conn):
+      if conn is not self.memory_:
+         conn.close()
+
+   def _getResultCache(self):
+      # Searching the copy in memory is about as cheap as reading a cache.
+      return None
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+   def handle(self):
+      line = self.rfile.readline()
+      if not line:
+         return
+      try:
+         response = self.server.daemon_.handle(json.loads(line.decode("utf-8")))
+      except Exception as e:
+         response = {"error": str(e)}
+      self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class _Server(socketserver.UnixStreamServer):
+
+   def __init__(self, path, daemon):
+      socketserver.UnixStreamServer.__init__(self, path, _RequestHandler)
+      self.daemon_ = daemon
+      self.stopping_ = False
+
+
+class Daemon:
+   """
+      Serves lookups in the location table of a configuration over a Unix
+      domain socket until asked to stop.
+   """
+
+   def __init__(self, configurationDirectory=None):
+      self.configurationDirectory_ = configurationDirectory
+      self.config_ = None
+      self.configStamp_ = None
+      self.table_ = None
+      self.server_ = None
+      self._reloadConfiguration()
+
+   def _getConfigurationStamp(self, configuration):
+      try:
+         st = os.stat(configuration.getConfigurationFileFullPath())
+      except OSError:
+         return None
+      return (st.st_mtime_ns, st.st_size)
+
+   def _reloadConfiguration(self):
+      """
+         Load the configuration, again if the file changed since it was last
+         loaded.
+      """
+      if self.config_ is not None and self._getConfigurationStamp(self.config_) == self.configStamp_:
+         return
+      conf = Configuration(self.configurationDirectory_, True)
+      conf.conditionallyParseConfigurationFile()
+      self.config_ = conf
+      self.configStamp_ = self._getConfigurationStamp(conf)
+      self.table_ = ResidentLocationTable(conf)
+
+   def getSocketPath(self):
+      return getSocketPath(self.config_)
+
+   def handle(self, request):
+      """
+         Answer a single request. @see the module documentation.
+      """
+      op = request.get("op")
+      if op == "ping":
+         return {"pid": os.getpid()}
+      if op == "stop":
+         self.server_.stopping_ = True
+         return {}
+
+      self._reloadConfiguration()
+      if op == "fuzzy":
+         res = self.table_.fuzzySearch(str(request["pattern"]), int(request.get("limit", fuzzy.LIMIT)))
+         return {"results": [list(r) for r in res]}
+      if op == "directories":
+         res = self.table_.searchDirectories(str(request["pattern"]))
+         return {"results": [list(r) for r in res]}
+      if op == "fuzzyDirectories":
+         res = self.table_.fuzzySearchDirectories(str(request["pattern"]), int(request.get("limit", fuzzy.LIMIT)))
+         return {"results": [list(r) for r in res]}
+      if op == "complete":
+         return {"names": self.table_.complete(str(request["prefix"]), int(request.get("limit", COMPLETION_LIMIT)))}
+      if op not in ("search", "narrow", "directory"):
+         raise RuntimeError("Unknown request: '" + str(op) + "'")
+
+      res = self.table_.search(str(request["pattern"]), request.get("cwd"))
+      for criteria in request.get("criteria", []):
+         res.narrow(criteria)
+
+      response = {"results": [list(r) for r in res]}
+      if op == "directory":
+         response["directory"] = res.getCommonDirectory()
+      return response
+
+   def serve(self):
+      """
+         Listen on the socket and answer requests until a "stop" request
+         arrives. Raises a RuntimeError if another daemon is already
+         serving the table.
+      """
+      if not isSupported():
+         raise RuntimeError("The managed edit daemon needs Unix domain sockets.")
+
+      path = self.getSocketPath()
+      if os.path.exists(path):
+         if DaemonClient(self.config_).connect():
+            raise RuntimeError("A daemon is already serving '" + self.config_.getLocationTableFileFullPath() + "'.")
+         os.remove(path)
+
+      # Warm up before accepting connections.
+      if os.path.isfile(self.config_.getLocationTableFileFullPath()):
+         self.table_._opendb()
+
+      self.server_ = _Server(path, self)
+      try:
+         os.chmod(path, 0o600)
+         while not self.server_.stopping_:
+            self.server_.handle_request()
+      finally:
+         self.server_.server_close()
+         if os.path.exists(path):
+            os.remove(path)
+
+
+class DaemonClient:
+   """
+      Talks to the Daemon serving a configuration's location table. It
+      offers the search method of LocationTable so that callers can use
+      either.
+   """
+
+   def __init__(self, configuration):
+      self.config_ = configuration
+
+   def connect(self):
+      """
+         @returns True if a daemon answered.
+      """
+      if not isSupported() or not os.path.exists(getSocketPath(self.config_)):
+         return False
+      try:
+         self.request({"op": "ping"}, CONNECT_TIMEOUT)
+      except (OSError, ValueError, RuntimeError):
+         return False
+      return True
+
+   def request(self, request, timeout=REQUEST_TIMEOUT):
+      """
+         Send a request and return the response. Raises an OSError if the
+         daemon cannot be reached and a RuntimeError if it reported an
+         error.
+      """
+      s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+      try:
+         s.settimeout(timeout)
+         s.connect(getSocketPath(self.config_))
+         f = s.makefile("rwb")
+         try:
+            f.write(json.dumps(request).encode("utf-8") + b"\n")
+            f.flush()
+            line = f.readline()
+         finally:
+            f.close()
+      finally:
+         s.close()
+
+      if not line:
+         raise ConnectionError("The managed edit daemon closed the connection.")
+      response = json.loads(line.decode("utf-8"))
+      if "error" in response:
+         raise RuntimeError(response["error"])
+      return response
+
+   def _toSearchResult(self, response):
+      ret = SearchResult()
+      for r in response["results"]:
+         ret.append(tuple(r))
+      return ret
+
+   def search(self, searchPattern, cwd=None):
+      """
+         @see LocationTable.search
+      """
+      if cwd is None:
+         cwd = os.getcwd()
+      return self._toSearchResult(
+         self.request({"op": "search", "pattern": str(searchPattern), "cwd": cwd}))
+
+   def narrow(self, searchPattern, criteria, cwd=None):
+      """
+         Search and then apply each of the criteria with SearchResult.narrow.
+      """
+      if cwd is None:
+         cwd = os.getcwd()
+      return self._toSearchResult(
+         self.request({"op": "narrow", "pattern": str(searchPattern), "cwd": cwd,
+                       "criteria": [str(c) for c in criteria]}))
+
+   def fuzzySearch(self, query, limit=fuzzy.LIMIT):
+      """
+         @see LocationTable.fuzzySearch
+      """
+      return self._toSearchResult(
+         self.request({"op": "fuzzy", "pattern": str(query), "limit": int(limit)}))
+
+   def searchDirectories(self, searchPattern):
+      """
+         @see LocationTable.searchDirectories
+      """
+      return self._toSearchResult(
+         self.request({"op": "directories", "pattern": str(searchPattern)}))
+
+   def fuzzySearchDirectories(self, query, limit=fuzzy.LIMIT):
+      """
+         @see LocationTable.fuzzySearchDirectories
+      """
+      return self._toSearchResult(
+         self.request({"op": "fuzzyDirectories", "pattern": str(query), "limit": int(limit)}))
+
+   def complete(self, prefix, limit=COMPLETION_LIMIT):
+      """
+         @see LocationTable.complete
+      """
+      return self.request({"op": "complete", "prefix": str(prefix), "limit": int(limit)})["names"]
+
+   def stop(self):
+      self.request({"op": "stop"})
+
+
+def startDaemon():
+   """
+      Start a daemon for the default configuration in the background.
+   """
+   import subprocess
+   devnull = open(os.devnull, "r+b")
+   try:
+      subprocess.Popen([sys.executable, "-m", "devtools.managededit.daemon"],
+                       stdin=devnull, stdout=devnull, stderr=devnull,
+                       start_new_session=True)
+   finally:
+      devnull.close()
+
+
+def main():
+   Daemon().serve()
+
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,161 @@
+"""
+This files defines the class FederatedLocationTable.
+
+A FederatedLocationTable searches several location tables at once, such as
+the one of the current sandbox and a shared one holding a large read only
+tree that is indexed once instead of in every sandbox. The tables are
+queried concurrently and their results merged in the order the tables were
+given: a file found in more than one of them is kept once, labelled with
+the first table that has it.
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+
+from devtools.managededit import fuzzy
+from devtools.managededit.locationtable import SearchResult, COMPLETION_LIMIT
+
+
+class FederatedLocationTable:
+   """
+      Offers the search methods of LocationTable over several tables.
+   """
+
+   def __init__(self, tables):
+      """
+         @param tables
+         A list of tuples (label, table) where table is anything with the
+         search methods of LocationTable, the LocationTable itself or a
+         client of the daemon. The records of the first table are not
+         labelled.
+      """
+      if not tables:
+         raise RuntimeError("Expected at least one location table.")
+      self.tables_ = list(tables)
+
+   def getLabels(self):
+      return [label for (label, table) in self.tables_]
+
+   def _queryAll(self, query):
+      """
+         Run query on every table, concurrently if there are several.
+
+         @returns The list of what query returned for each table, in the
+         order of the tables.
+      """
+      if len(self.tables_) == 1:
+         return [query(self.tables_[0][1])]
+
+      # Imported here since most lookups search a single table.
+      from concurrent.futures import ThreadPoolExecutor
+
+      with ThreadPoolExecutor(max_workers=len(self.tables_)) as executor:
+         return list(executor.map(query, [table for (label, table) in self.tables_]))
+
+   def _merge(self, results):
+      """
+         @returns A SearchResult holding the records of each result in
+         turn, each file once, labelled with the table it came from.
+      """
+      ret = SearchResult()
+      seen = set()
+      for ((label, table), res) in zip(self.tables_, results):
+         for r in res:
+            if r[1] in seen:
+               continue
+            seen.add(r[1])
+            ret.append(r)
+            if table is not self.tables_[0][1]:
+               ret.setLabel(r, label)
+      return ret
+
+   def search(self, searchPattern, cwd=None):
+      """
+         @see LocationTable.search
+
+         Each table narrows its matches to an exact match of the basename
+         on its own, so the merged matches are narrowed again the same way.
+      """
+      searchPattern = str(searchPattern)
+      return self._narrowToExact(self._merge(self._queryAll(lambda t: t.search(searchPattern, cwd))),
+                                 searchPattern)
+
+   def searchDirectories(self, searchPattern):
+      """
+         @see LocationTable.searchDirectories and search
+      """
+      searchPattern = str(searchPattern)
+      return self._narrowToExact(self._merge(self._queryAll(lambda t: t.searchDirectories(searchPattern))),
+                                 searchPattern)
+
+   def _narrowToExact(self, res, searchPattern):
+      """
+         @returns The record in res called searchPattern, if there is just
+         one, otherwise res.
+      """
+      exact = [r for r in res if r[0] == searchPattern]
+      if len(exact) != 1 or len(res) == 1:
+         return res
+      label = res.getLabel(exact[0])
+      ret = SearchResult()
+      ret.append(exact[0])
+      if label:
+         ret.setLabel(exact[0], label)
+      return ret
+
+   def fuzzySearch(self, query, limit=fuzzy.LIMIT):
+      """
+         @see LocationTable.fuzzySearch
+
+         The best matches of every table are ranked again together.
+      """
+      merged = self._merge(self._queryAll(lambda t: t.fuzzySearch(query, limit)))
+      ranked = fuzzy.rank(query, [(r[0], os.path.dirname(r[1])) for r in merged], limit)
+
+      ret = SearchResult()
+      for (s, base, directory) in ranked:
+         r = (base, os.path.join(directory, base))
+         ret.append(r)
+         label = merged.getLabel(r)
+         if label:
+            ret.setLabel(r, label)
+      return ret
+
+   def fuzzySearchDirectories(self, query, limit=fuzzy.LIMIT):
+      """
+         @see LocationTable.fuzzySearchDirectories and fuzzySearch
+      """
+      merged = self._merge(self._queryAll(lambda t: t.fuzzySearchDirectories(query, limit)))
+      ranked = fuzzy.rank(query, list(merged), limit)
+
+      ret = SearchResult()
+      for (s, base, path) in ranked:
+         r = (base, path)
+         ret.append(r)
+         label = merged.getLabel(r)
+         if label:
+            ret.setLabel(r, label)
+      return ret
+
+   def complete(self, prefix, limit=COMPLETION_LIMIT):
+      """
+         @see LocationTable.complete
+      """
+      names = set()
+      for res in self._queryAll(lambda t: t.complete(prefix, limit)):
+         names.update(res)
+      return sorted(names)[:limit]
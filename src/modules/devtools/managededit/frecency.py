@@ -0,0 +1,165 @@
+"""
+This files defines the class FrecencyStore.
+
+A FrecencyStore remembers which file was picked for which query, how often
+and how recently, so that me can list the likely choice first and skip
+the narrowing altogether when one file clearly dominates.
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import time
+import sqlite3
+
+SELECTION_TABLE_NAME="Selection"
+
+# Selections made for the query at hand count this many times more than
+# selections of the same file made for other queries.
+QUERY_WEIGHT=4
+
+# A file is picked without asking when it has been picked for the query at
+# least MINIMUM_SELECTIONS times and scores DOMINANCE times as much as the
+# next file.
+MINIMUM_SELECTIONS=2
+DOMINANCE=3
+
+# Selections older than MAXIMUM_AGE seconds are forgotten, and the oldest
+# are dropped beyond MAXIMUM_ENTRIES.
+MAXIMUM_AGE=90 * 24 * 3600
+MAXIMUM_ENTRIES=5000
+
+# Above this many results only the selections for the query are looked at.
+MAXIMUM_PATH_LOOKUPS=500
+
+
+def frecency(count, age):
+   """
+      Weigh how often something was picked by how long ago it last was.
+
+      @param age
+      Seconds since the last time.
+   """
+   if age < 3600:
+      return count * 4.0
+   if age < 24 * 3600:
+      return count * 2.0
+   if age < 7 * 24 * 3600:
+      return count * 0.5
+   return count * 0.25
+
+
+class FrecencyStore:
+   """
+      The selections are kept in a small sqlite file of their own next to
+      the location table, so rebuilding the table does not lose them.
+      Reading a store that does not exist yet costs nothing.
+   """
+
+   def __init__(self, configuration):
+      self.config_ = configuration
+
+   def getFileFullPath(self):
+      return self.config_.getLocationTableFileFullPath() + ".frecency"
+
+   def _opendb(self, create=False):
+      conn = sqlite3.connect(self.getFileFullPath())
+      if not create:
+         return conn
+      c = conn.cursor()
+      c.execute('''PRAGMA synchronous=OFF''')
+      c.execute('''CREATE TABLE IF NOT EXISTS %s (query TEXT NOT NULL, path TEXT NOT NULL, count INTEGER NOT NULL, last INTEGER NOT NULL, PRIMARY KEY (query, path)) WITHOUT ROWID''' % (SELECTION_TABLE_NAME))
+      c.execute('''CREATE INDEX IF NOT EXISTS %sPath ON %s (path)''' % (SELECTION_TABLE_NAME, SELECTION_TABLE_NAME))
+      c.execute('''CREATE INDEX IF NOT EXISTS %sLast ON %s (last)''' % (SELECTION_TABLE_NAME, SELECTION_TABLE_NAME))
+      return conn
+
+   def _closedb(self, conn):
+      conn.close()
+
+   def record(self, query, path, now=None):
+      """
+         Remember that path was picked for query, and forget what is too
+         old or too much.
+      """
+      if now is None:
+         now = int(time.time())
+      conn = self._opendb(True)
+      try:
+         c = conn.cursor()
+         c.execute('''INSERT INTO %s VALUES (?, ?, 1, ?) ON CONFLICT (query, path) DO UPDATE SET count=count+1, last=excluded.last''' % (SELECTION_TABLE_NAME),
+                   (str(query), str(path), now))
+         c.execute('''DELETE FROM %s WHERE last < ?''' % (SELECTION_TABLE_NAME), (now - MAXIMUM_AGE,))
+         c.execute('''SELECT count(*) FROM %s''' % (SELECTION_TABLE_NAME))
+         excess = c.fetchone()[0] - MAXIMUM_ENTRIES
+         if excess > 0:
+            c.execute('''DELETE FROM %s WHERE (query, path) IN (SELECT query, path FROM %s ORDER BY last LIMIT ?)''' % (SELECTION_TABLE_NAME, SELECTION_TABLE_NAME),
+                      (excess,))
+         conn.commit()
+      finally:
+         self._closedb(conn)
+
+   def scores(self, query, paths, now=None):
+      """
+         @returns A dictionary from each of paths that was ever picked to a
+         tuple (score, count) where count is the number of times it was
+         picked for query. The selections for query count QUERY_WEIGHT
+         times, the others once.
+      """
+      if not paths or not os.path.isfile(self.getFileFullPath()):
+         return {}
+      if now is None:
+         now = int(time.time())
+      paths = set(paths)
+
+      ret = {}
+      conn = self._opendb()
+      try:
+         c = conn.cursor()
+         c.execute('''SELECT path, count, last FROM %s WHERE query=?''' % (SELECTION_TABLE_NAME), (str(query),))
+         for (path, count, last) in c.fetchall():
+            if path in paths:
+               ret[path] = (QUERY_WEIGHT * frecency(count, now - last), count)
+
+         if len(paths) <= MAXIMUM_PATH_LOOKUPS:
+            c.execute('''SELECT path, sum(count), max(last) FROM %s WHERE path IN (%s) AND query<>? GROUP BY path''' % (SELECTION_TABLE_NAME, ",".join("?" * len(paths))),
+                      list(paths) + [str(query)])
+            for (path, count, last) in c.fetchall():
+               (score, queryCount) = ret.get(path, (0.0, 0))
+               ret[path] = (score + frecency(count, now - last), queryCount)
+      finally:
+         self._closedb(conn)
+      return ret
+
+   def rank(self, query, results):
+      """
+         Order a SearchResult by how often and how recently its files were
+         picked, most likely first. Files never picked keep their order.
+
+         @returns The record that dominates the others, or None if the
+         choice is not clear. @see MINIMUM_SELECTIONS and DOMINANCE
+      """
+      scores = self.scores(query, [r[1] for r in results])
+      if not scores:
+         return None
+
+      results.sortBy(lambda r: -scores.get(r[1], (0.0, 0))[0])
+      (best, count) = scores.get(results[0][1], (0.0, 0))
+      second = 0.0
+      if len(results) > 1:
+         second = scores.get(results[1][1], (0.0, 0))[0]
+      if count >= MINIMUM_SELECTIONS and best >= DOMINANCE * second:
+         return results[0]
+      return None
@@ -0,0 +1,211 @@
+"""
+This files defines functions that rank files by how well their basenames
+match an abbreviation, so that 'lctbl' finds locationtable.py.
+
+A basename matches if it contains the characters of the query in order,
+ignoring case. Matches score points for each character, more where a
+character starts a word or a camelCase hump or follows the previous match,
+and lose points for the characters skipped between them. Among equal
+scores shorter basenames and then shallower paths come first.
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import heapq
+
+SCORE_MATCH=16
+BONUS_BOUNDARY=8
+BONUS_CAMEL=7
+BONUS_CONSECUTIVE=4
+PENALTY_GAP_START=3
+PENALTY_GAP_EXTENSION=1
+
+# The number of candidates kept by default.
+LIMIT=50
+
+SEPARATORS="_-. /"
+
+
+def _bonus(candidate, i):
+   """
+      The bonus for matching the character at i: it starts a word or a
+      camelCase hump.
+   """
+   if i == 0:
+      return BONUS_BOUNDARY
+   previous = candidate[i-1]
+   current = candidate[i]
+   if previous in SEPARATORS:
+      return BONUS_BOUNDARY
+   if previous.islower() and current.isupper():
+      return BONUS_CAMEL
+   if current.isdigit() and not previous.isdigit():
+      return BONUS_CAMEL
+   return 0
+
+
+def _isSubsequence(query, lowered, start):
+   """
+      True if the characters of query appear in order in lowered from
+      start on.
+   """
+   for ch in query:
+      start = lowered.find(ch, start) + 1
+      if start == 0:
+         return False
+   return True
+
+
+def _tightest(query, lowered):
+   """
+      The positions of the first match of query in order, moved as far
+      right as possible so that they span as few characters as can be.
+      None if there is no match.
+   """
+   end = -1
+   for ch in query:
+      end = lowered.find(ch, end + 1)
+      if end < 0:
+         return None
+
+   positions = []
+   i = end
+   for ch in reversed(query):
+      i = lowered.rfind(ch, 0, i + 1)
+      positions.append(i)
+      i -= 1
+   positions.reverse()
+   return positions
+
+
+def _onBoundaries(query, candidate, lowered):
+   """
+      The positions of a match of query that takes, for each character, the
+      first occurrence that starts a word or a hump where that still lets
+      the rest of the query match.
+   """
+   positions = []
+   i = 0
+   for (j, ch) in enumerate(query):
+      first = lowered.find(ch, i)
+      best = first
+      k = first
+      while k >= 0:
+         if _bonus(candidate, k):
+            if _isSubsequence(query[j+1:], lowered, k + 1):
+               best = k
+            break
+         k = lowered.find(ch, k + 1)
+      positions.append(best)
+      i = best + 1
+   return positions
+
+
+def _scorePositions(candidate, positions):
+   total = 0
+   previous = None
+   for (j, i) in enumerate(positions):
+      bonus = _bonus(candidate, i)
+      if j == 0:
+         bonus *= 2
+      total += SCORE_MATCH + bonus
+      if previous is not None:
+         if i == previous + 1:
+            total += BONUS_CONSECUTIVE
+         else:
+            total -= PENALTY_GAP_START + PENALTY_GAP_EXTENSION * (i - previous - 2)
+      previous = i
+   return total
+
+
+def score(query, candidate):
+   """
+      Score how well candidate matches query. Two ways of matching are
+      tried, the one spanning the fewest characters and the one that
+      prefers the starts of words, and the better score is taken.
+
+      @param query
+      The query in lower case.
+
+      @returns The score, higher is better, or None if the characters of
+      query do not appear in candidate in order.
+   """
+   if not query:
+      return 0
+   lowered = candidate.lower()
+   if len(lowered) != len(candidate):
+      candidate = lowered
+
+   tightest = _tightest(query, lowered)
+   if tightest is None:
+      return None
+   return max(_scorePositions(candidate, tightest),
+              _scorePositions(candidate, _onBoundaries(query, candidate, lowered)))
+
+
+def rank(query, candidates, limit=LIMIT):
+   """
+      Return the best matches for query, best first.
+
+      @param candidates
+      An iterable of tuples (basename, directory).
+
+      @param limit
+      The number of matches to keep. Only that many are held while the
+      candidates are scored.
+
+      @returns A list of tuples (score, basename, directory). Equal scores
+      are ordered shorter basename first and then shallower directory
+      first.
+   """
+   query = query.lower()
+   scores = {}
+
+   def scored():
+      for (base, directory) in candidates:
+         # Names such as Makefile or __init__.py recur all over a tree.
+         if base in scores:
+            s = scores[base]
+         else:
+            s = scores[base] = score(query, base)
+         if s is not None:
+            yield (s, base, directory)
+
+   return heapq.nlargest(limit, scored(),
+                         key=lambda r: (r[0], -len(r[1]), -r[2].count(os.sep)))
+
+
+def likePattern(query):
+   """
+      A pattern for sqlite's LIKE, with '\\' as the escape character, that
+      selects the basenames query can match. LIKE only ignores the case of
+      ASCII letters, so other letters must match their case.
+   """
+   escaped = []
+   for ch in query:
+      if ch in "%_\\":
+         ch = "\\" + ch
+      escaped.append(ch)
+   return "%" + "%".join(escaped) + "%"
+
+
+def isPlain(query):
+   """
+      True if query has no characters with a special meaning in a regular
+      expression, so that it may be retried as a fuzzy query.
+   """
+   return query.isalnum()
@@ -0,0 +1,102 @@
+"""
+This files defines the class IgnoreRules.
+
+IgnoreRules holds the DirectoryIgnore or FileIgnore patterns of one scope,
+the global ones or those of a SearchPath together with the global ones, and
+checks a name against all of them with a single regular expression: the
+patterns joined as alternatives. A pattern that cannot be joined safely,
+because it has groups that it may refer back to or flags that apply to the
+whole expression, is checked on its own.
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import re
+
+_defaultFlags = re.compile("").flags
+
+
+def toIgnoreRules(ignores):
+   """
+      @param ignores
+      IgnoreRules, or a list of patterns as strings or compiled regular
+      expressions.
+   """
+   if isinstance(ignores, IgnoreRules):
+      return ignores
+   return IgnoreRules(ignores)
+
+
+class IgnoreRules:
+
+   def __init__(self, patterns=[]):
+      """
+         @param patterns
+         A list of patterns as strings or compiled regular expressions.
+         Invalid patterns raise re.error.
+      """
+      self.patterns_ = [getattr(p, "pattern", p) for p in patterns]
+
+      joinable = []
+      self.separate_ = []
+      for p in self.patterns_:
+         compiled = re.compile(p)
+         if compiled.groups or compiled.flags != _defaultFlags:
+            self.separate_.append(compiled)
+         else:
+            joinable.append(p)
+
+      self.combined_ = None
+      if joinable:
+         self.combined_ = re.compile("|".join("(?:%s)" % (p) for p in joinable))
+
+   def __len__(self):
+      return len(self.patterns_)
+
+   def getPatterns(self):
+      return list(self.patterns_)
+
+   def extend(self, patterns):
+      """
+         @returns IgnoreRules for these patterns followed by the given ones,
+         or self if there are none.
+      """
+      patterns = [getattr(p, "pattern", p) for p in patterns]
+      if not patterns:
+         return self
+      return IgnoreRules(self.patterns_ + patterns)
+
+   def search(self, name):
+      """
+         True if any of the patterns matches somewhere in name.
+      """
+      if self.combined_ is not None and self.combined_.search(name):
+         return True
+      for i in self.separate_:
+         if i.search(name):
+            return True
+      return False
+
+   def filter(self, names):
+      """
+         @returns The names that none of the patterns match, in order.
+      """
+      if not self.patterns_:
+         return list(names)
+      if not self.separate_:
+         search = self.combined_.search
+         return [n for n in names if not search(n)]
+      return [n for n in names if not self.search(n)]
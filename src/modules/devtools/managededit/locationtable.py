@@ -21,10 +21,134 @@ import os
 import sqlite3
 import sys
 import re
+import functools
 
+from devtools.common import profiler
+from devtools.common.filelock import FileLock
 from devtools.managededit.configuration import Configuration
+from devtools.managededit.crawler import Crawler, listDirectory
+from devtools.managededit.patternanalysis import PatternAnalysis
+from devtools.managededit.resultcache import ResultCache
+from devtools.managededit import fuzzy
 
-TABLE_NAME="Location"
+# The layout of the location table, kept in PRAGMA user_version. Tables
+# without a version were written before the layout was versioned and are
+# migrated when they are first opened.
+#
+# 1: Directory holds every indexed directory once, File holds a basename and
+#    the id of its directory.
+# 2: FileTrigram, an FTS5 trigram index over the basenames in File, when the
+#    sqlite library supports it and the indexTrigrams option is set.
+# 3: Meta holds the generation, a counter bumped whenever the files in the
+#    table change, and the id of the table, random and new whenever the
+#    table is created.
+# 4: Directory holds the basename of each directory, indexed, so that
+#    directories are searched by name rather than through their files. The
+#    generation is bumped when directories come or go as well.
+SCHEMA_VERSION=4
+
+FILE_TABLE_NAME="File"
+TRIGRAM_TABLE_NAME="FileTrigram"
+DIRECTORY_TABLE_NAME="Directory"
+META_TABLE_NAME="Meta"
+LEGACY_TABLE_NAME="Location"
+BATCH_SIZE=50000
+
+# Literals shorter than this cannot be looked up in the trigram index.
+TRIGRAM_LENGTH=3
+
+# The formats writeRecords writes records in, and the number of records
+# formatted before they are written out at once.
+OUTPUT_FORMATS=["repr", "path", "nul", "tsv", "jsonl"]
+WRITE_BATCH_SIZE=4096
+
+# The number of basenames LocationTable.complete returns by default.
+COMPLETION_LIMIT=50
+
+
+def _regexp(pattern, string):
+   """
+      The REGEXP function registered with sqlite. 'X REGEXP Y' calls
+      _regexp(Y, X).
+   """
+   return _compile(pattern).search(string) is not None
+
+
+@functools.lru_cache(maxsize=16)
+def _compile(pattern):
+   return re.compile(pattern)
+
+
+def prefixUpperBound(prefix):
+   """
+      Return the smallest string greater than every string that starts with
+      prefix, or None if there is no such string. Together with prefix
+      this bounds an index range scan.
+   """
+   while prefix:
+      last = ord(prefix[-1])
+      if last < sys.maxunicode:
+         return prefix[:-1] + chr(last + 1)
+      prefix = prefix[:-1]
+   return None
+
+
+def _escapeField(field):
+   return field.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def getRecordFormatter(format):
+   """
+      @param format
+      One of OUTPUT_FORMATS:
+         repr  - the tuple (basename, path) as Python prints it
+         path  - the path, a line each
+         nul   - the path, each followed by a NUL character, for xargs -0
+         tsv   - the basename and the path separated by a tab, with tabs,
+                 newlines and backslashes in them escaped by a backslash
+         jsonl - an object with the keys basename and path, a line each
+
+      @returns A function from a record (basename, path) to its text.
+   """
+   if format == "repr":
+      return lambda record: str(record) + "\n"
+   if format == "path":
+      return lambda record: record[1] + "\n"
+   if format == "nul":
+      return lambda record: record[1] + "\0"
+   if format == "tsv":
+      return lambda record: _escapeField(record[0]) + "\t" + _escapeField(record[1]) + "\n"
+   if format == "jsonl":
+      # Imported here since only this format needs it.
+      import json
+      encode = json.JSONEncoder(ensure_ascii=False).encode
+      return lambda record: encode({"basename": record[0], "path": record[1]}) + "\n"
+   raise RuntimeError("Unknown output format '%s', expected one of %s." % (format, ", ".join(OUTPUT_FORMATS)))
+
+
+def writeRecords(records, fileobject, format="repr"):
+   """
+      Write records to fileobject in format, WRITE_BATCH_SIZE of them at a
+      time, without holding more than that in memory.
+
+      @param records
+      An iterable of records (basename, path).
+
+      @returns The number of records written.
+   """
+   formatter = getRecordFormatter(format)
+   count = 0
+   batch = []
+   for record in records:
+      batch.append(formatter(record))
+      if len(batch) == WRITE_BATCH_SIZE:
+         fileobject.write("".join(batch))
+         count += len(batch)
+         batch = []
+   if batch:
+      fileobject.write("".join(batch))
+      count += len(batch)
+   return count
 
 
 class LocationTable:
@@ -33,86 +157,1074 @@ class LocationTable:
       if not isinstance(configuration, Configuration):
          raise RuntimeError("Expected a Configuration as the first argument.")
       self.config_ = configuration
+      self.checkedSchema_ = False
 
    def __len__(self):
       conn = self._opendb()
       c = conn.cursor()
-      c.execute('''SELECT count(*) FROM %s''' % (TABLE_NAME))
+      c.execute('''SELECT count(*) FROM %s''' % (FILE_TABLE_NAME))
       l = c.fetchone()[0]
       self._closedb(conn)
       return l
 
-   def _opendb(self, rebuild=False):
-      if rebuild:
-         if os.path.isfile(self.config_.getLocationTableFileFullPath()):
-            os.remove(self.config_.getLocationTableFileFullPath())
+   def _opendb(self):
+      """
+         Open the live location table, migrating it first if it was written
+         with an older layout.
+      """
+      with profiler.phase("sqlite.open"):
+         conn = self._connect(self.config_.getLocationTableFileFullPath())
+         if not self.checkedSchema_:
+            version = self._getSchemaVersion(conn)
+            if version is not None and version < SCHEMA_VERSION:
+               self._closedb(conn)
+               self._migrate()
+               conn = self._connect(self.config_.getLocationTableFileFullPath())
+            elif version is not None and version > SCHEMA_VERSION:
+               self._closedb(conn)
+               raise RuntimeError("The location table '" + self.config_.getLocationTableFileFullPath() + "' was written by a newer version. Rebuild it with 'me -r'.")
+            self.checkedSchema_ = True
+      return conn
+
+   def _connect(self, path):
+      conn = sqlite3.connect(path)
+      conn.create_function("REGEXP", 2, _regexp, deterministic=True)
+      return conn
+
+   def _getSchemaVersion(self, conn):
+      """
+         @returns The schema version of the table open on conn, or None if
+         conn holds no table at all.
+      """
+      c = conn.cursor()
+      c.execute('''SELECT count(*) FROM sqlite_master WHERE type=?''', ("table",))
+      if c.fetchone()[0] == 0:
+         return None
+      c.execute('''PRAGMA user_version''')
+      return c.fetchone()[0]
+
+   def _migrate(self):
+      """
+         Reload a table written with an older layout into the current one.
+         Directories whose mtime was not recorded are stored without one, so
+         the next refresh lists them again. A table that only lacks the Meta
+         table or the basenames of the directories gains them in place.
+      """
+      with FileLock(self.getLockFileFullPath()):
          conn = sqlite3.connect(self.config_.getLocationTableFileFullPath())
+         try:
+            version = self._getSchemaVersion(conn)
+            if version is None or version >= SCHEMA_VERSION:
+               return
+
+            c = conn.cursor()
+            if version in (2, 3):
+               if version == 2:
+                  self._createMeta(c, 1)
+               else:
+                  self._setMeta(c, "table", self._newTableId())
+               self._addDirectoryBasenames(c)
+               c.execute('''PRAGMA user_version=%d''' % (SCHEMA_VERSION))
+               conn.commit()
+               return
+
+            c.execute('''SELECT name FROM sqlite_master WHERE type=?''', ("table",))
+            tables = set(row[0] for row in c.fetchall())
+
+            statuses = {}
+            if DIRECTORY_TABLE_NAME in tables:
+               c.execute('''SELECT path, mtime, inode FROM %s''' % (DIRECTORY_TABLE_NAME))
+               for (path, mtime, inode) in c.fetchall():
+                  statuses[path] = RecordedStatus(mtime, inode)
+
+            directories = {}
+            for path in statuses:
+               directories[path] = []
+            if LEGACY_TABLE_NAME in tables:
+               c.execute('''SELECT fullpath FROM %s''' % (LEGACY_TABLE_NAME))
+               for (f,) in c:
+                  directories.setdefault(os.path.dirname(f), []).append(f)
+            if FILE_TABLE_NAME in tables:
+               for (base, directory) in self._select(c):
+                  directories[directory].append(os.path.join(directory, base))
+         finally:
+            self._closedb(conn)
+
+         self._load((d, statuses.get(d), sorted(set(files)))
+                    for (d, files) in sorted(directories.items()))
+
+   def _createdb(self):
+      """
+         Create a new, empty location table in a temporary file next to the
+         live one so that it can be swapped in with _replacedb.
+
+         @returns A tuple (connection, path).
+      """
+      path = self._createTemporaryFile()
+      conn = sqlite3.connect(path)
+      c = conn.cursor()
+      c.execute('''CREATE TABLE %s (id INTEGER PRIMARY KEY, path TEXT NOT NULL, mtime INTEGER, inode INTEGER, basename TEXT)''' % (DIRECTORY_TABLE_NAME))
+      c.execute('''CREATE TABLE %s (basename TEXT NOT NULL, dirid INTEGER NOT NULL)''' % (FILE_TABLE_NAME))
+      self._createMeta(c, self.getGeneration() + 1)
+      root = self.config_.getSandboxDirectory()
+      if root is not None:
+         self._setMeta(c, "root", root)
+      conn.commit()
+      return (conn, path)
+
+   def _createTemporaryFile(self):
+      """
+         @returns The path of a new, empty file next to the live table.
+      """
+      import tempfile
+
+      live = self.config_.getLocationTableFileFullPath()
+      (fd, path) = tempfile.mkstemp(prefix=os.path.basename(live) + ".",
+                                    suffix=".tmp",
+                                    dir=os.path.dirname(live))
+      os.close(fd)
+      return path
+
+   def _createMeta(self, c, generation):
+      c.execute('''CREATE TABLE %s (key TEXT PRIMARY KEY, value) WITHOUT ROWID''' % (META_TABLE_NAME))
+      c.execute('''INSERT INTO %s VALUES (?, ?)''' % (META_TABLE_NAME), ("generation", generation))
+      self._setMeta(c, "table", self._newTableId())
+      c.execute('''PRAGMA user_version=%d''' % (SCHEMA_VERSION))
+
+   def _newTableId(self):
+      """
+         @returns A random id for a table that is being created, so that
+         tables recreated from scratch, whose generation starts over, can
+         be told apart.
+      """
+      return os.urandom(8).hex()
+
+   def _setMeta(self, c, key, value):
+      c.execute('''INSERT OR REPLACE INTO %s VALUES (?, ?)''' % (META_TABLE_NAME), (key, value))
+
+   def _bumpGeneration(self, c):
+      c.execute('''UPDATE %s SET value=value+1 WHERE key=?''' % (META_TABLE_NAME), ("generation",))
+
+   def _getMeta(self, key, default):
+      """
+         Read a value from the Meta table as it is, without migrating the
+         table, so this is safe to call while rewriting it.
+
+         @returns The value, or default if there is none.
+      """
+      return self._getMetaValues({key: default})[key]
+
+   def _getMetaValues(self, defaults):
+      """
+         Read several values at once. @see _getMeta
+
+         @param defaults
+         A dict from the keys to read to the values returned for those
+         there is no value for.
+
+         @returns A dict from the keys to their values.
+      """
+      values = dict(defaults)
+      if not os.path.isfile(self.config_.getLocationTableFileFullPath()):
+         return values
+      conn = self._connect(self.config_.getLocationTableFileFullPath())
+      try:
          c = conn.cursor()
-         c.execute('''CREATE TABLE %s (basename, fullpath)''' % (TABLE_NAME))
-         conn.commit()
-         return conn
-      else:
-         return sqlite3.connect(self.config_.getLocationTableFileFullPath())
+         try:
+            c.execute('''SELECT key, value FROM %s WHERE key IN (%s)''' % (META_TABLE_NAME, ", ".join("?" * len(values))),
+                      list(values))
+         except sqlite3.OperationalError:
+            return values
+         values.update(c.fetchall())
+         return values
+      finally:
+         self._closedb(conn)
+
+   def getGeneration(self):
+      """
+         A number that grows whenever the files in the location table
+         change, 0 if there is no table yet.
+      """
+      return self._getMeta("generation", 0)
+
+   def getTableId(self):
+      """
+         The random id the table was given when it was created, or None.
+      """
+      return self._getMeta("table", None)
+
+   def getRoot(self):
+      """
+         The directory of the sandbox the table was built for, or None.
+         @see Configuration.getSandboxDirectory
+      """
+      return self._getMeta("root", None)
+
+   def _replacedb(self, path):
+      """
+         Atomically make the table in path the live location table. Readers
+         that already have the old table open keep reading it.
+      """
+      os.replace(path, self.config_.getLocationTableFileFullPath())
+
+   def getMappedFileFullPath(self):
+      """
+         The memory mapped copy of the location table. @see MappedLocationTable
+      """
+      return self.config_.getLocationTableFileFullPath() + ".map"
+
+   def isMappedCurrent(self):
+      """
+         True if there is a mapped copy of the table at least as new as the
+         table itself.
+      """
+      try:
+         mapped = os.stat(self.getMappedFileFullPath())
+         table = os.stat(self.config_.getLocationTableFileFullPath())
+      except OSError:
+         return False
+      return mapped.st_mtime_ns >= table.st_mtime_ns
+
+   def _exportMappedTable(self, unchanged=False):
+      """
+         Write the memory mapped copy of the table if the configuration asks
+         for one, or remove a copy left over from when it did. Called by
+         everything that writes the table, with the lock held.
+
+         @param unchanged
+         True if the files in the table did not change and the mapped copy
+         was current before the table was written, in which case the copy
+         is only marked current again rather than rewritten.
+      """
+      path = self.getMappedFileFullPath()
+      if self.config_.getLocationTableFormat() != "mapped":
+         if os.path.exists(path):
+            os.remove(path)
+         return
+      if unchanged:
+         os.utime(path)
+         return
+
+      # Imported here since mappedtable builds on this module.
+      from devtools.managededit import mappedtable
+      conn = self._opendb()
+      try:
+         mappedtable.write(path, self._select(conn.cursor(), '''ORDER BY f.basename, d.path'''))
+      finally:
+         self._closedb(conn)
+
+   def getLockFileFullPath(self):
+      """
+         The file locked by anything that writes the location table.
+      """
+      return self.config_.getLocationTableFileFullPath() + ".lock"
+
+   def _getTableIdentity(self):
+      """
+         Something that changes whenever a new table is swapped in.
+      """
+      try:
+         return os.stat(self.config_.getLocationTableFileFullPath()).st_ino
+      except OSError:
+         return None
+
+   def _createIndexes(self, c):
+      """
+         Create the secondary indexes. This is done once the table is loaded
+         since building an index in one pass is much cheaper than
+         maintaining it through every insert.
+      """
+      c.execute('''CREATE UNIQUE INDEX %sPath ON %s (path)''' % (DIRECTORY_TABLE_NAME, DIRECTORY_TABLE_NAME))
+      self._createDirectoryIndex(c)
+      c.execute('''CREATE INDEX %sBasename ON %s (basename, dirid)''' % (FILE_TABLE_NAME, FILE_TABLE_NAME))
+      c.execute('''CREATE INDEX %sDirectory ON %s (dirid)''' % (FILE_TABLE_NAME, FILE_TABLE_NAME))
+
+      if self.config_.getOptionValue("indexTrigrams"):
+         self._createTrigramIndex(c)
+
+   def _createDirectoryIndex(self, c):
+      c.execute('''CREATE INDEX %sBasename ON %s (basename)''' % (DIRECTORY_TABLE_NAME, DIRECTORY_TABLE_NAME))
+
+   def _addDirectoryBasenames(self, c):
+      """
+         Add the basename column to the directories of a table written
+         before it existed, fill it in and index it.
+      """
+      c.execute('''ALTER TABLE %s ADD COLUMN basename TEXT''' % (DIRECTORY_TABLE_NAME))
+      c.execute('''SELECT id, path FROM %s''' % (DIRECTORY_TABLE_NAME))
+      c.executemany('''UPDATE %s SET basename=? WHERE id=?''' % (DIRECTORY_TABLE_NAME),
+                    [(os.path.basename(path), dirid) for (dirid, path) in c.fetchall()])
+      self._createDirectoryIndex(c)
+
+   def _createTrigramIndex(self, c):
+      """
+         Index every trigram of the basenames in the File table, and keep
+         the index up to date from then on with triggers. Nothing is done
+         if the sqlite library lacks FTS5 or its trigram tokenizer.
+      """
+      try:
+         c.execute('''CREATE VIRTUAL TABLE %s USING fts5(basename, content=%s, content_rowid=rowid, tokenize="trigram case_sensitive 1")''' % (TRIGRAM_TABLE_NAME, FILE_TABLE_NAME))
+      except sqlite3.OperationalError:
+         return
+
+      c.execute('''INSERT INTO %s (%s) VALUES (?)''' % (TRIGRAM_TABLE_NAME, TRIGRAM_TABLE_NAME), ("rebuild",))
+      c.execute('''CREATE TRIGGER %sInsert AFTER INSERT ON %s BEGIN
+                      INSERT INTO %s (rowid, basename) VALUES (new.rowid, new.basename);
+                   END''' % (FILE_TABLE_NAME, FILE_TABLE_NAME, TRIGRAM_TABLE_NAME))
+      c.execute('''CREATE TRIGGER %sDelete AFTER DELETE ON %s BEGIN
+                      INSERT INTO %s (%s, rowid, basename) VALUES ('delete', old.rowid, old.basename);
+                   END''' % (FILE_TABLE_NAME, FILE_TABLE_NAME, TRIGRAM_TABLE_NAME, TRIGRAM_TABLE_NAME))
+
+   def _hasTrigramIndex(self, c):
+      c.execute('''SELECT count(*) FROM sqlite_master WHERE name=?''', (TRIGRAM_TABLE_NAME,))
+      return c.fetchone()[0] == 1
 
    def _closedb(self, conn):
       conn.close()
 
-   def rebuild(self):
+   def _getSearchPaths(self):
+      """
+         The search paths in the order they are crawled. Recursive search
+         paths come first so that a directory reachable from more than one
+         search path is recorded with its whole subtree.
+      """
+      return sorted(self.config_.getSearchPaths(),
+                    key=lambda sp: (not sp.isRecursive(), sp.getPath()))
+
+   def isRefreshable(self):
+      """
+         True if there is a table to refresh.
+      """
+      if not os.path.isfile(self.config_.getLocationTableFileFullPath()):
+         return False
+      conn = self._opendb()
+      try:
+         return self._getSchemaVersion(conn) == SCHEMA_VERSION
+      finally:
+         self._closedb(conn)
+
+   def _insertDirectory(self, c, directory, status):
+      c.execute('''INSERT INTO %s (path, mtime, inode, basename) VALUES (?, ?, ?, ?)''' % (DIRECTORY_TABLE_NAME),
+                (directory, status.st_mtime_ns, status.st_ino, os.path.basename(directory)))
+      return c.lastrowid
+
+   def _select(self, c, where="", parameters=()):
+      """
+         Query the files joined to their directories. The rows produced are
+         tuples (basename, directory).
+
+         @param where
+         The rest of the statement, where the files are 'f' and the
+         directories 'd'.
+      """
+      c.execute('''SELECT f.basename, d.path FROM %s f JOIN %s d ON f.dirid = d.id ''' % (FILE_TABLE_NAME, DIRECTORY_TABLE_NAME) + where,
+                parameters)
+      return c
+
+   def findExact(self, basename):
+      """
+         Return the records for the files called basename, using the
+         basename index.
+      """
+      conn = self._opendb()
+      try:
+         c = self._select(conn.cursor(), '''WHERE f.basename = ?''', (basename,))
+         return [(b, os.path.join(d, b)) for (b, d) in c]
+      finally:
+         self._closedb(conn)
+
+   def findPrefix(self, prefix, limit=-1):
+      """
+         Return the records for the files whose basename starts with prefix
+         ordered by basename, using a range scan over the basename index.
+
+         @param limit
+         The maximum number of records to return, -1 for all of them.
+      """
+      upper = prefixUpperBound(prefix)
+      where = '''WHERE f.basename >= ?'''
+      parameters = [prefix]
+      if upper is not None:
+         where += ''' AND f.basename < ?'''
+         parameters.append(upper)
+      where += ''' ORDER BY f.basename LIMIT ?'''
+      parameters.append(int(limit))
+
+      conn = self._opendb()
+      try:
+         c = self._select(conn.cursor(), where, parameters)
+         return [(b, os.path.join(d, b)) for (b, d) in c]
+      finally:
+         self._closedb(conn)
+
+   def complete(self, prefix, limit=COMPLETION_LIMIT):
+      """
+         Return the first basenames that start with prefix in order, each
+         once, for completing them in a shell. Only the basename index is
+         read, a range of it no longer than the names returned and their
+         duplicates.
+
+         @param limit
+         The maximum number of basenames to return.
+      """
+      upper = prefixUpperBound(prefix)
+      where = '''WHERE basename >= ?'''
+      parameters = [prefix]
+      if upper is not None:
+         where += ''' AND basename < ?'''
+         parameters.append(upper)
+      parameters.append(int(limit))
+
+      conn = self._opendb()
+      try:
+         c = conn.cursor()
+         c.execute('''SELECT DISTINCT basename FROM %s ''' % (FILE_TABLE_NAME) + where + ''' ORDER BY basename LIMIT ?''',
+                   parameters)
+         return [b for (b,) in c]
+      finally:
+         self._closedb(conn)
+
+   def rebuild(self, jobs=None):
       """
          Rebuild the location table by traversing all of the SearchPaths
          associated with the Configuration.
+
+         @param jobs
+         The number of directories to list in parallel. @see Crawler
+      """
+      crawler = Crawler(jobs)
+
+      def scans():
+         seen = set()
+         for sp in self._getSearchPaths():
+            for (directory, status, files) in crawler.scan(sp,
+                                                           self.config_.getDirectoryIgnores(),
+                                                           self.config_.getFileIgnores()):
+               if status is None or directory in seen:
+                  continue
+               seen.add(directory)
+               yield (directory, status, files)
+
+      # If another process is already rebuilding this table wait for it
+      # and take its result instead of crawling a second time.
+      lock = FileLock(self.getLockFileFullPath())
+      identity = self._getTableIdentity()
+      if not lock.acquire(blocking=False):
+         lock.acquire()
+         if self._getTableIdentity() != identity:
+            lock.release()
+            return
+
+      try:
+         self._load(scans())
+      finally:
+         lock.release()
+
+   def load(self, scans):
+      """
+         Replace the contents of the location table. This is the bulk load
+         path used by rebuild: rows are streamed in batches of BATCH_SIZE
+         through executemany with journaling and syncing turned off, and the
+         indexes are built once all of the rows are in. The new table is
+         written to a temporary file and swapped in when it is complete, so
+         readers never see a partial table.
+
+         @param scans
+         An iterable of (directory, status, files) tuples as produced by
+         Crawler.scan. Each directory must appear only once. A status of
+         None records the directory without an mtime.
+
+         @returns The number of files loaded.
+      """
+      with FileLock(self.getLockFileFullPath()):
+         return self._load(scans)
+
+   def _load(self, scans):
+      """
+         @see load, the caller holds the lock.
       """
-      conn = self._opendb(rebuild=True)
+      (conn, path) = self._createdb()
       c = conn.cursor()
+      n = 0
 
       try:
-         for sp in self.config_.getSearchPaths():
-            for f in sp.walk(self.config_.getDirectoryIgnores(),
-                             self.config_.getFileIgnores()):
-               base = os.path.basename(f)
-               command = "INSERT INTO %s VALUES ('%s','%s')" % (TABLE_NAME, base, f)
-               c.execute(command)
+         c.execute('''PRAGMA journal_mode=OFF''')
+         c.execute('''PRAGMA synchronous=OFF''')
+
+         directories = []
+         locations = []
+         for (dirid, (directory, status, files)) in enumerate(scans, 1):
+            name = os.path.basename(directory)
+            if status is None:
+               directories.append((dirid, directory, None, None, name))
+            else:
+               directories.append((dirid, directory, status.st_mtime_ns, status.st_ino, name))
+            locations.extend((os.path.basename(f), dirid) for f in files)
+            if len(locations) >= BATCH_SIZE or len(directories) >= BATCH_SIZE:
+               n += self._loadBatch(c, directories, locations)
+
+         n += self._loadBatch(c, directories, locations)
+         self._createIndexes(c)
+         conn.commit()
+         c.execute('''PRAGMA journal_mode=DELETE''')
+         self._closedb(conn)
+         self._replacedb(path)
+      except:
+         self._closedb(conn)
+         os.remove(path)
+         raise
+
+      self._exportMappedTable()
+      return n
+
+   def _loadBatch(self, c, directories, locations):
+      """
+         Insert and then clear the given lists of rows.
+
+         @returns The number of locations inserted.
+      """
+      n = len(locations)
+      c.executemany('''INSERT INTO %s VALUES (?, ?, ?, ?, ?)''' % (DIRECTORY_TABLE_NAME), directories)
+      c.executemany('''INSERT INTO %s VALUES (?, ?)''' % (FILE_TABLE_NAME), locations)
+      del directories[:]
+      del locations[:]
+      return n
+
+   def refresh(self, jobs=None):
+      """
+         Bring the location table up to date by listing only the directories
+         whose mtime or inode changed since they were recorded, plus any new
+         ones, and applying the difference. Unchanged directories are only
+         stat'ed. Tables that cannot be refreshed are rebuilt.
+
+         Changes to the ignore rules are not picked up by a refresh; rebuild
+         the table after editing them.
+
+         @param jobs
+         The number of directories to examine in parallel. @see Crawler
+
+         @returns A tuple (added, removed) with the number of files inserted
+         and deleted, or None if the table was rebuilt instead.
+      """
+      if not self.isRefreshable():
+         self.rebuild(jobs)
+         return None
+
+      with FileLock(self.getLockFileFullPath()):
+         return self._refresh(Crawler(jobs))
+
+   def _refresh(self, crawler):
+      """
+         @see refresh, the caller holds the lock.
+      """
+      mappedCurrent = self.isMappedCurrent()
+      conn = self._opendb()
+      try:
+         (added, removed, changed) = self._refreshdb(conn, crawler)
       finally:
+         self._closedb(conn)
+
+      self._exportMappedTable(mappedCurrent and not changed)
+      return (added, removed)
+
+   def _refreshdb(self, conn, crawler):
+      """
+         Bring the table open on conn up to date and commit. @see refresh
+
+         @returns A tuple (added, removed, changed), changed being true if
+         any file or directory came or went.
+      """
+      c = conn.cursor()
+      added = 0
+      removed = 0
+      created = 0
+
+      known = {}
+      for (dirid, path, mtime, inode) in c.execute(
+            '''SELECT id, path, mtime, inode FROM %s''' % (DIRECTORY_TABLE_NAME)):
+         known[path] = (dirid, mtime, inode)
+
+      children = {}
+      for path in known:
+         children.setdefault(os.path.dirname(path), []).append(path)
+
+      previous = {}
+      for (path, (dirid, mtime, inode)) in known.items():
+         previous[path] = (mtime, inode, children.get(path, []))
+
+      seen = set()
+      for sp in self._getSearchPaths():
+         for (directory, status, files) in crawler.scan(sp,
+                                                        self.config_.getDirectoryIgnores(),
+                                                        self.config_.getFileIgnores(),
+                                                        previous):
+            if status is None or directory in seen:
+               continue
+            seen.add(directory)
+
+            if files is None:
+               continue
+
+            dirid = None
+            if directory in known:
+               dirid = known[directory][0]
+            else:
+               created += 1
+            (a, r) = self._applyListing(c, dirid, directory, status, files)
+            added += a
+            removed += r
+
+      gone = [dirid for (path, (dirid, mtime, inode)) in known.items() if path not in seen]
+      removed += self._deleteDirectories(c, gone)
+
+      # Directories are searched by name as well, so they count as
+      # changes even without any files.
+      changed = bool(added or removed or created or gone)
+      if changed:
+         self._bumpGeneration(c)
+      conn.commit()
+      return (added, removed, changed)
+
+   def clone(self, source, jobs=None):
+      """
+         Create the location table of a sandbox from the one of a sibling
+         sandbox, source, instead of crawling from scratch. The paths beneath
+         the source sandbox are moved to this one and stored without an
+         mtime, so the refresh that follows lists each of them again and
+         applies only the differences. The indexes, which are the costly part
+         of a rebuild, are kept. The copy is refreshed before it replaces
+         the table, so readers never see the files of source. If source has
+         no table this one is rebuilt.
+
+         @param source
+         The LocationTable of the sibling sandbox.
+
+         @returns What refresh returns.
+      """
+      if not source.isRefreshable():
+         self.rebuild(jobs)
+         return None
+      root = self.config_.getSandboxDirectory()
+      sourceRoot = source.getRoot() or source.config_.getSandboxDirectory()
+      if root is None or sourceRoot is None:
+         raise RuntimeError("Cloning a location table needs the directories of both sandboxes under DT_SANDBOX_ROOT.")
+
+      with FileLock(self.getLockFileFullPath()):
+         path = self._copyTable(source, sourceRoot, root)
+         try:
+            conn = self._connect(path)
+            try:
+               (added, removed, _) = self._refreshdb(conn, Crawler(jobs))
+            finally:
+               self._closedb(conn)
+         except:
+            os.remove(path)
+            raise
+         self._replacedb(path)
+         self.checkedSchema_ = False
+         self._exportMappedTable()
+         return (added, removed)
+
+   def _copyTable(self, source, sourceRoot, root):
+      """
+         Copy the table of source into a temporary file next to the live
+         one, moving the directories beneath sourceRoot to root.
+
+         @returns The path of the copy. @see _replacedb
+      """
+      generation = self.getGeneration() + 1
+      path = self._createTemporaryFile()
+      conn = sqlite3.connect(path)
+      sourceConn = source._opendb()
+      try:
+         sourceConn.backup(conn)
+      finally:
+         source._closedb(sourceConn)
+
+      try:
+         c = conn.cursor()
+         old = os.path.join(sourceRoot, "")
+         c.execute('''UPDATE OR IGNORE %s SET path=? || substr(path, ?), mtime=NULL, inode=NULL
+                      WHERE path >= ? AND path < ?''' % (DIRECTORY_TABLE_NAME),
+                   (os.path.join(root, ""), len(old) + 1, old, prefixUpperBound(old)))
+         c.execute('''UPDATE OR IGNORE %s SET path=?, basename=?, mtime=NULL, inode=NULL WHERE path=?''' % (DIRECTORY_TABLE_NAME),
+                   (root, os.path.basename(root), sourceRoot))
+         self._setMeta(c, "generation", generation)
+         self._setMeta(c, "table", self._newTableId())
+         self._setMeta(c, "root", root)
          conn.commit()
+      finally:
+         self._closedb(conn)
+      return path
+
+   def _applyListing(self, c, dirid, directory, status, files):
+      """
+         Make the records of a directory match a fresh listing of it.
+
+         @param dirid
+         The id of the directory, or None if it is not in the table yet.
+
+         @param files
+         The full paths of the accepted files in the directory.
+
+         @returns A tuple (added, removed).
+      """
+      if dirid is not None:
+         c.execute('''UPDATE %s SET mtime=?, inode=? WHERE id=?''' % (DIRECTORY_TABLE_NAME),
+                   (status.st_mtime_ns, status.st_ino, dirid))
+         c.execute('''SELECT rowid, basename FROM %s WHERE dirid=?''' % (FILE_TABLE_NAME),
+                   (dirid,))
+         stored = dict((b, rowid) for (rowid, b) in c.fetchall())
+      else:
+         dirid = self._insertDirectory(c, directory, status)
+         stored = {}
+
+      current = set(os.path.basename(f) for f in files)
+      gone = [(rowid,) for (b, rowid) in stored.items() if b not in current]
+      new = [(b, dirid) for b in current if b not in stored]
+      c.executemany('''DELETE FROM %s WHERE rowid=?''' % (FILE_TABLE_NAME), gone)
+      c.executemany('''INSERT INTO %s VALUES (?, ?)''' % (FILE_TABLE_NAME), new)
+      return (len(new), len(gone))
+
+   def _deleteDirectories(self, c, dirids):
+      """
+         Delete the given directories and their files.
+
+         @returns The number of files deleted.
+      """
+      removed = 0
+      for dirid in dirids:
+         c.execute('''DELETE FROM %s WHERE dirid=?''' % (FILE_TABLE_NAME), (dirid,))
+         removed += c.rowcount
+      c.executemany('''DELETE FROM %s WHERE id=?''' % (DIRECTORY_TABLE_NAME),
+                    [(dirid,) for dirid in dirids])
+      return removed
+
+   def _selectSubtree(self, c, directory):
+      """
+         @returns A dictionary from the path of every recorded directory
+         beneath directory to its id. directory itself is not included.
+      """
+      root = os.path.join(directory, "")
+      c.execute('''SELECT path, id FROM %s WHERE path >= ? AND path < ?''' % (DIRECTORY_TABLE_NAME),
+                (root, prefixUpperBound(root)))
+      return dict(c.fetchall())
+
+   def getDirectories(self):
+      """
+         Return the paths of all of the directories in the location table.
+      """
+      conn = self._opendb()
+      try:
+         c = conn.cursor()
+         c.execute('''SELECT path FROM %s''' % (DIRECTORY_TABLE_NAME))
+         return [path for (path,) in c]
+      finally:
+         self._closedb(conn)
+
+   def findSearchPath(self, directory):
+      """
+         Return the SearchPath whose walk visits directory, or None if it is
+         not part of any.
+      """
+      for sp in self._getSearchPaths():
+         if sp.contains(directory, sp.getDirectoryIgnores(self.config_.getDirectoryIgnores())):
+            return sp
+      return None
+
+   def refreshDirectories(self, directories, jobs=None):
+      """
+         Bring the records of the given directories up to date without
+         looking at the rest of the table, for callers that know what
+         changed. Each directory is listed again. Directories that are new
+         beneath it are crawled and ones that disappeared are removed with
+         everything beneath them. A directory that no longer exists, or is
+         no longer part of a SearchPath, is removed the same way.
+
+         @param jobs
+         The number of directories to list in parallel when crawling new
+         subtrees. @see Crawler
+
+         @returns A tuple (added, removed) with the number of files inserted
+         and deleted.
+      """
+      with FileLock(self.getLockFileFullPath()):
+         return self._refreshDirectories(directories, Crawler(jobs))
+
+   def _refreshDirectories(self, directories, crawler):
+      """
+         @see refreshDirectories, the caller holds the lock.
+      """
+      mappedCurrent = self.isMappedCurrent()
+      conn = self._opendb()
+      c = conn.cursor()
+      added = 0
+      removed = 0
+      dirIgnores = self.config_.getDirectoryIgnores()
+      fileIgnores = self.config_.getFileIgnores()
+      # The directories created or deleted. @see _refresh
+      changed = []
+
+      def apply(directory, status, files):
+         c.execute('''SELECT id FROM %s WHERE path=?''' % (DIRECTORY_TABLE_NAME), (directory,))
+         row = c.fetchone()
+         if row is None:
+            changed.append(directory)
+         return self._applyListing(c, row[0] if row else None, directory, status, files)
+
+      def delete(directory):
+         c.execute('''SELECT id FROM %s WHERE path=?''' % (DIRECTORY_TABLE_NAME), (directory,))
+         dirids = [dirid for (dirid,) in c.fetchall()]
+         dirids.extend(self._selectSubtree(c, directory).values())
+         changed.extend(dirids)
+         return self._deleteDirectories(c, dirids)
+
+      try:
+         for directory in sorted(set(directories)):
+            sp = self.findSearchPath(directory)
+            status = None
+            if sp is not None:
+               try:
+                  status = os.stat(directory)
+               except OSError:
+                  pass
+            if status is None:
+               removed += delete(directory)
+               continue
+
+            if sp.getSource() != "walk":
+               # Version control lists a whole subtree at once, so the
+               # directory is scanned again with everything beneath it.
+               recorded = self._selectSubtree(c, directory)
+               c.execute('''SELECT id FROM %s WHERE path=?''' % (DIRECTORY_TABLE_NAME), (directory,))
+               for (dirid,) in c.fetchall():
+                  recorded[directory] = dirid
+               for (subdir, status, files) in crawler.scan(sp.getSubPath(directory), dirIgnores, fileIgnores):
+                  if status is not None:
+                     recorded.pop(subdir, None)
+                     (a, r) = apply(subdir, status, files)
+                     added += a
+                     removed += r
+               changed.extend(recorded.values())
+               removed += self._deleteDirectories(c, list(recorded.values()))
+               continue
+
+            (dirs, files, links) = listDirectory(directory)
+            (a, r) = apply(directory, status, sp.acceptFiles(directory, files, fileIgnores))
+            added += a
+            removed += r
+
+            subdirs = set()
+            if sp.isRecursive():
+               spIgnores = sp.getDirectoryIgnores(dirIgnores)
+               for d in dirs:
+                  fullDir = os.path.join(directory, d)
+                  if d not in links and not sp.isDirectoryIgnored(fullDir, spIgnores):
+                     subdirs.add(fullDir)
+
+            parent = os.path.dirname(os.path.join(directory, ""))
+            recorded = set(path for path in self._selectSubtree(c, directory)
+                           if os.path.dirname(path) == parent)
+            for d in sorted(recorded - subdirs):
+               removed += delete(d)
+            for d in sorted(subdirs - recorded):
+               for (subdir, status, files) in crawler.scan(sp.getSubPath(d), dirIgnores, fileIgnores):
+                  if status is not None:
+                     (a, r) = apply(subdir, status, files)
+                     added += a
+                     removed += r
+
+         changed = added or removed or changed
+         if changed:
+            self._bumpGeneration(c)
+         conn.commit()
+      finally:
+         self._closedb(conn)
+
+      self._exportMappedTable(mappedCurrent and not changed)
+      return (added, removed)
+
+   def _matchClause(self, c, analysis, column='''f.basename''', trigrams=True):
+      """
+         Translate a pattern into a WHERE clause selecting exactly the files
+         'f' whose basename it matches, so that sqlite filters the rows. An
+         anchored prefix becomes a range scan over the basename index, a
+         literal of three or more characters a lookup in the trigram index,
+         a plain literal a call to instr and anything else a call to REGEXP.
+
+         @param analysis
+         The PatternAnalysis of the pattern.
+
+         @param column, trigrams
+         The basenames to match, by default those of the files, and
+         whether they are in the trigram index.
+
+         @returns A tuple (where, parameters).
+      """
+      clauses = []
+      parameters = []
+
+      prefix = analysis.getPrefix()
+      if prefix:
+         clauses.append(column + ''' >= ?''')
+         parameters.append(prefix)
+         upper = prefixUpperBound(prefix)
+         if upper is not None:
+            clauses.append(column + ''' < ?''')
+            parameters.append(upper)
+
+      literals = analysis.getRequiredLiterals(TRIGRAM_LENGTH)
+      if trigrams and literals and not analysis.isPrefix() and self._hasTrigramIndex(c):
+         clauses.append('''f.rowid IN (SELECT rowid FROM %s WHERE %s MATCH ?)''' % (TRIGRAM_TABLE_NAME, TRIGRAM_TABLE_NAME))
+         parameters.append(" AND ".join('"' + l.replace('"', '""') + '"' for l in literals))
+
+      literal = analysis.getLiteral()
+      if literal is not None:
+         if literal:
+            clauses.append('''instr(%s, ?) > 0''' % (column))
+            parameters.append(literal)
+      elif not analysis.isPrefix():
+         clauses.append(column + ''' REGEXP ?''')
+         parameters.append(analysis.getPattern())
+
+      if not clauses:
+         return ("", parameters)
+      return ("WHERE " + " AND ".join(clauses), parameters)
+
+   def _query(self, searchPattern):
+      """
+         Look searchPattern up in the table.
+
+         @returns A tuple (matches, exactMatches) of lists of records, the
+         files whose basename searchPattern matches and the files whose
+         basename it is.
+      """
+      matches = []
+      exactMatches = []
+      conn = self._opendb()
+      c = conn.cursor()
+
+      try:
+         (where, parameters) = self._matchClause(c, PatternAnalysis(searchPattern))
+         for (base, directory) in self._select(c, where, parameters):
+            matches.append((base, os.path.join(directory, base)))
+
+         self._select(c, '''WHERE f.basename = ?''', (searchPattern,))
+         for (base, directory) in c:
+            exactMatches.append((base, os.path.join(directory, base)))
+      finally:
+         self._closedb(conn)
+
+      return (matches, exactMatches)
+
+   def _fuzzyCandidates(self, c, query):
+      """
+         Select the records (basename, directory) whose basename query may
+         match fuzzily, leaving out most of the others with LIKE.
+      """
+      return self._select(c, '''WHERE f.basename LIKE ? ESCAPE ?''', (fuzzy.likePattern(query), "\\"))
+
+   def _fuzzyQuery(self, query, limit):
+      """
+         @returns A list of the records that match query best, best first.
+      """
+      conn = self._opendb()
+      try:
+         ranked = fuzzy.rank(query, self._fuzzyCandidates(conn.cursor(), query), limit)
+      finally:
          self._closedb(conn)
+      return [(base, os.path.join(directory, base)) for (score, base, directory) in ranked]
+
+   def _getResultCache(self):
+      """
+         @returns The ResultCache for the table, or None if results are not
+         cached.
+      """
+      if not self.config_.getOptionValue("cacheResults"):
+         return None
+      return ResultCache(self.config_)
+
+   def _cached(self, pattern, mode, query):
+      """
+         Answer a query from the result cache, or run it and cache what it
+         returns.
+
+         @param query
+         A function that looks pattern up in the table and returns a list
+         of lists of records.
+      """
+      cache = self._getResultCache()
+      if cache is None:
+         return self._timedQuery(query)
+      meta = self._getMetaValues({"table": None, "generation": 0})
+      (table, generation) = (meta["table"], meta["generation"])
+      with profiler.phase("cache") as p:
+         ret = cache.get(pattern, mode, table, generation)
+         if ret is not None:
+            p.count(sum(len(records) for records in ret))
+      if ret is None:
+         ret = self._timedQuery(query)
+         cache.put(pattern, mode, table, generation, ret)
+      return ret
+
+   def _timedQuery(self, query):
+      with profiler.phase("query") as p:
+         ret = query()
+         p.count(sum(len(records) for records in ret))
+      return ret
+
+   def fuzzySearch(self, query, limit=fuzzy.LIMIT):
+      """
+         Rank the files whose basename contains the characters of query in
+         order. @see fuzzy.rank
 
-   def search(self, searchPattern):
+         @param limit
+         The number of files to return.
+
+         @returns A SearchResult holding the best matches, best first.
+      """
+      (ranked,) = self._cached(query, "fuzzy:%d" % (limit),
+                               lambda: [self._fuzzyQuery(query, limit)])
+      ret = SearchResult()
+      for r in ranked:
+         ret.append(r)
+      return ret
+
+   def search(self, searchPattern, cwd=None):
       """
          Search the location table for the entries that match searchPattern and
          return them as a list. A list of tuples is returned where the first entry
          in each tuple is the basename of the file and the second entry is the full
          path. The search is done on the base name.
+
+         @param cwd
+         The directory to treat as the current working directory, by default
+         os.getcwd().
       """
+      if cwd is None:
+         cwd = os.getcwd()
+
       ret = SearchResult()
       exp = re.compile(str(searchPattern))
-      exactMatches=[]
       cwdExactMatches = []
 
-      if os.path.isfile(searchPattern):
+      if os.path.isfile(os.path.join(cwd, searchPattern)):
          cwdExactMatches.append(
-            (searchPattern, os.path.join(os.getcwd(), searchPattern)))
+            (searchPattern, os.path.join(cwd, searchPattern)))
       else:
          if self.config_.getOptionValue("searchCurrentWorkingDirectory"):
-            for (root, dirs, files) in os.walk("."):
+            for (root, dirs, files) in os.walk(cwd):
                dirs[:] = []
                for f in files:
                   if exp.search(f):
-                     ret.append(tuple([f, os.path.join(os.getcwd(), f)]))
+                     ret.append(tuple([f, os.path.join(cwd, f)]))
                      if searchPattern == f:
-                        cwdExactMatches.append((f, os.path.join(os.getcwd(), f)))
+                        cwdExactMatches.append((f, os.path.join(cwd, f)))
 
-      conn = self._opendb()
-      c = conn.cursor()
-      c.execute('''SELECT * FROM %s''' % TABLE_NAME)
-
-      try:
-         for item in c:
-            if exp.search(item[0]):
-               ret.append(item)
-            if searchPattern == item[0]:
-              exactMatches.append(item)
-      finally:
-         self._closedb(conn)
+      (matches, exactMatches) = self._cached(searchPattern, "regex",
+                                             lambda: list(self._query(searchPattern)))
+      for m in matches:
+         ret.append(m)
 
       if len(exactMatches) == 1:
         ret = SearchResult()
@@ -126,22 +1238,142 @@ class LocationTable:
 
       return ret
 
-   def dump(self, fileobject):
+   def _directoryQuery(self, searchPattern):
       """
-         Print all of the entries in the database to stdout.
+         Look searchPattern up among the names of the directories.
 
-         @param fileobject
-         A object that supports a write method.
+         @returns A tuple (matches, exactMatches) like _query, of records
+         (basename, path) of directories.
       """
       conn = self._opendb()
       c = conn.cursor()
-      c.execute('''SELECT * FROM %s''' % TABLE_NAME)
+      select = '''SELECT d.basename, d.path FROM %s d ''' % (DIRECTORY_TABLE_NAME)
+
       try:
-         for row in c:
-            print(row)
+         (where, parameters) = self._matchClause(c, PatternAnalysis(searchPattern), '''d.basename''', False)
+         c.execute(select + where, parameters)
+         matches = c.fetchall()
+         c.execute(select + '''WHERE d.basename = ?''', (searchPattern,))
+         exactMatches = c.fetchall()
       finally:
          self._closedb(conn)
 
+      return (matches, exactMatches)
+
+   def searchDirectories(self, searchPattern):
+      """
+         Search the directories in the table by name, the way search does
+         the files: searchPattern is matched against the basename of each
+         directory, using the index over them, and if a single directory is
+         called searchPattern only it is returned. Directories are found
+         whether or not they hold files.
+
+         @returns A SearchResult of records (basename, path) of directories.
+      """
+      searchPattern = str(searchPattern)
+      (matches, exactMatches) = self._cached(searchPattern, "directory",
+                                             lambda: list(self._directoryQuery(searchPattern)))
+      if len(exactMatches) == 1:
+         matches = exactMatches
+
+      ret = SearchResult()
+      for m in matches:
+         ret.append(tuple(m))
+      ret.uniqify()
+      return ret
+
+   def _fuzzyDirectoryQuery(self, query, limit):
+      """
+         @returns A list of the records (basename, path) of the directories
+         that match query best, best first.
+      """
+      conn = self._opendb()
+      try:
+         c = conn.cursor()
+         c.execute('''SELECT d.basename, d.path FROM %s d WHERE d.basename LIKE ? ESCAPE ?''' % (DIRECTORY_TABLE_NAME),
+                   (fuzzy.likePattern(query), "\\"))
+         ranked = fuzzy.rank(query, c, limit)
+      finally:
+         self._closedb(conn)
+      return [(base, path) for (score, base, path) in ranked]
+
+   def fuzzySearchDirectories(self, query, limit=fuzzy.LIMIT):
+      """
+         Rank the directories whose basename contains the characters of
+         query in order, the way fuzzySearch does the files.
+
+         @returns A SearchResult of records (basename, path) of directories,
+         best first.
+      """
+      (ranked,) = self._cached(query, "fuzzydirectory:%d" % (limit),
+                               lambda: [self._fuzzyDirectoryQuery(query, limit)])
+      ret = SearchResult()
+      for r in ranked:
+         ret.append(tuple(r))
+      return ret
+
+   def iterate(self, pattern=None, limit=None):
+      """
+         Generate the records (basename, path) in the table as sqlite
+         produces them, without reading them all into memory.
+
+         @param pattern
+         A regular expression the basenames must match, or None for all
+         of them. It becomes the same WHERE clause as in search, so that
+         sqlite filters the rows.
+
+         @param limit
+         The most records to generate, or None for all of them.
+      """
+      conn = self._opendb()
+      try:
+         c = conn.cursor()
+         where = ""
+         parameters = []
+         if pattern is not None:
+            (where, parameters) = self._matchClause(c, PatternAnalysis(pattern))
+         if limit is not None:
+            where += ''' LIMIT ?'''
+            parameters.append(int(limit))
+         self._select(c, where, parameters)
+         join = os.path.join
+         while True:
+            rows = c.fetchmany(WRITE_BATCH_SIZE)
+            if not rows:
+               break
+            for (base, directory) in rows:
+               yield (base, join(directory, base))
+      finally:
+         self._closedb(conn)
+
+   def dump(self, fileobject, format="repr", pattern=None, limit=None):
+      """
+         Print all of the entries in the database to fileobject.
+
+         @param fileobject
+         A object that supports a write method.
+
+         @param format
+         One of OUTPUT_FORMATS. @see getRecordFormatter
+
+         @param pattern, limit
+         @see iterate
+
+         @returns The number of entries written.
+      """
+      return writeRecords(self.iterate(pattern, limit), fileobject, format)
+
+
+class RecordedStatus:
+   """
+      Stands in for the os.stat_result of a directory when only the
+      values recorded in a location table are known.
+   """
+
+   def __init__(self, mtime, inode):
+      self.st_mtime_ns = mtime
+      self.st_ino = inode
+
 
 class SearchResult:
    """
@@ -150,6 +1382,7 @@ class SearchResult:
 
    def __init__(self):
       self.results_ = []
+      self.labels_ = {}
 
    def __len__(self):
       return len(self.results_)
@@ -166,6 +1399,19 @@ class SearchResult:
       """
       self.results_.append(result)
 
+   def setLabel(self, result, label):
+      """
+         Label a result with where it came from, such as the location
+         table it was found in. @see FederatedLocationTable
+      """
+      self.labels_[result[1]] = label
+
+   def getLabel(self, result):
+      """
+         The label of a result, or None if it has none.
+      """
+      return self.labels_.get(result[1])
+
    def narrow(self, criteria):
       """
          If criteria begins with a number and is < len(self)
@@ -189,6 +1435,12 @@ class SearchResult:
    def uniqify(self):
      self.results_ = sorted(set(self.results_))
 
+   def sortBy(self, key):
+      """
+         Order the results by key, keeping the order of equal ones.
+      """
+      self.results_.sort(key=key)
+
    def _uniqifyGroup(self, i):
       same = []
       same.append(self.results_[i])
@@ -221,9 +1473,13 @@ class SearchResult:
          uniquePathsForGroup = self._uniqifyGroup(i);
          for (j, u) in zip(list(range(i, i+len(uniquePathsForGroup))),uniquePathsForGroup):
             if not u:
-               out = "%d. %s\n" % (i, self.results_[j][0])
+               out = "%d. %s" % (i, self.results_[j][0])
             else:
-               out = "%d. %s - (%s)\n" % (j, self.results_[j][0], u)
+               out = "%d. %s - (%s)" % (j, self.results_[j][0], u)
+            label = self.getLabel(self.results_[j])
+            if label:
+               out += " [%s]" % (label)
+            out += "\n"
             sys.stderr.write(out)
          i += len(uniquePathsForGroup)
 
@@ -0,0 +1,431 @@
+"""
+This files defines the classes MappedIndex and MappedLocationTable.
+
+A mapped table is a read only copy of the location table in a compact
+binary file that is searched in place through mmap, so that a lookup
+neither opens sqlite nor builds a Python object for every row it
+examines. The sqlite table remains the one that is written; the mapped
+copy is exported from it by LocationTable whenever it changes and the
+locationTableFormat option is "mapped".
+
+The file holds, after a fixed header:
+
+   names       the basenames encoded with os.fsencode, each followed by a
+               NUL, sorted bytewise and then by directory
+   nameOffsets an array of the uint32 offsets of each name in names,
+               followed by the length of names
+   fileDirs    an array of the uint32 index of the directory of each name
+   dirs        the sorted directory paths, front coded: each is stored as
+               a uint16 count of leading bytes shared with the previous one
+               and a uint16 length followed by the bytes that follow. The
+               first path of every block of DIRECTORY_BLOCK is stored whole.
+   dirOffsets  an array of the uint32 offsets of each block in dirs
+
+Arrays are stored little endian and aligned to 8 bytes so they can be
+viewed in place.
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import re
+import sys
+import mmap
+import array
+import bisect
+import struct
+
+from devtools.managededit.locationtable import LocationTable, COMPLETION_LIMIT
+from devtools.managededit.patternanalysis import PatternAnalysis
+from devtools.managededit import fuzzy
+
+MAGIC=b"MELT"
+VERSION=1
+DIRECTORY_BLOCK=16
+
+# magic, version, file count, directory count and the offsets of names,
+# nameOffsets, fileDirs, dirs and dirOffsets.
+_header = struct.Struct("<4sIII5Q")
+_dirEntry = struct.Struct("<HH")
+
+_ENCODING = sys.getfilesystemencoding()
+_ERRORS = sys.getfilesystemencodeerrors()
+
+
+def _decode(name):
+   """
+      os.fsdecode for the bytes read from the map, without its checks.
+   """
+   return name.decode(_ENCODING, _ERRORS)
+
+
+def _array(values):
+   a = array.array("I", values)
+   if sys.byteorder != "little":
+      a.byteswap()
+   return a.tobytes()
+
+
+def _align(f):
+   padding = -f.tell() % 8
+   f.write(b"\0" * padding)
+   return f.tell()
+
+
+def write(path, records):
+   """
+      Write a mapped table. The file is written next to path and renamed
+      into place, so readers never see a partial one.
+
+      @param records
+      An iterable of tuples (basename, directory) ordered by basename and
+      then by directory, in the bytewise order of their UTF-8 encodings,
+      which is the order sqlite sorts text in.
+   """
+   names = []
+   nameOffsets = []
+   fileDirs = []
+   directories = {}
+   size = 0
+   for (base, directory) in records:
+      name = os.fsencode(base)
+      names.append(name)
+      nameOffsets.append(size)
+      size += len(name) + 1
+      fileDirs.append(directories.setdefault(directory, len(directories)))
+   nameOffsets.append(size)
+   if size >= 2**32:
+      raise RuntimeError("The location table is too large to be mapped.")
+
+   # Number the directories in sorted order.
+   ordered = sorted(directories, key=os.fsencode)
+   renumber = [0] * len(ordered)
+   for (i, directory) in enumerate(ordered):
+      renumber[directories[directory]] = i
+   fileDirs = [renumber[d] for d in fileDirs]
+
+   import tempfile
+   (fd, temp) = tempfile.mkstemp(prefix=os.path.basename(path) + ".",
+                                 suffix=".tmp",
+                                 dir=os.path.dirname(path))
+   try:
+      with os.fdopen(fd, "wb") as f:
+         f.write(b"\0" * _header.size)
+         offsets = [_align(f)]
+         for name in names:
+            f.write(name)
+            f.write(b"\0")
+         offsets.append(_align(f))
+         f.write(_array(nameOffsets))
+         offsets.append(_align(f))
+         f.write(_array(fileDirs))
+         offsets.append(_align(f))
+
+         dirOffsets = []
+         start = f.tell()
+         previous = b""
+         for (i, directory) in enumerate(ordered):
+            encoded = os.fsencode(directory)
+            shared = 0
+            if i % DIRECTORY_BLOCK == 0:
+               dirOffsets.append(f.tell() - start)
+            else:
+               limit = min(len(previous), len(encoded), 0xffff)
+               while shared < limit and previous[shared] == encoded[shared]:
+                  shared += 1
+            f.write(_dirEntry.pack(shared, len(encoded) - shared))
+            f.write(encoded[shared:])
+            previous = encoded
+         offsets.append(_align(f))
+         f.write(_array(dirOffsets))
+
+         f.seek(0)
+         f.write(_header.pack(MAGIC, VERSION, len(names), len(ordered), *offsets))
+      os.replace(temp, path)
+   except:
+      if os.path.exists(temp):
+         os.remove(temp)
+      raise
+
+
+class MappedIndex:
+   """
+      Read access to a mapped table. Raises a ValueError if the file is not
+      a mapped table this version understands.
+   """
+
+   def __init__(self, path):
+      if sys.byteorder != "little":
+         raise ValueError("Mapped tables are only read on little endian machines.")
+      with open(path, "rb") as f:
+         self.map_ = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      try:
+         (magic, version, files, dirs, names, nameOffsets, fileDirs,
+          dirData, dirOffsets) = _header.unpack_from(self.map_, 0)
+         if magic != MAGIC or version != VERSION:
+            raise ValueError("'" + path + "' is not a mapped location table.")
+      except:
+         self.map_.close()
+         raise
+
+      self.view_ = memoryview(self.map_)
+      view = self.view_
+      self.files_ = files
+      self.dirs_ = dirs
+      self.names_ = names
+      self.nameOffsets_ = view[nameOffsets:nameOffsets + 4 * (files + 1)].cast("I")
+      self.fileDirs_ = view[fileDirs:fileDirs + 4 * files].cast("I")
+      self.dirData_ = dirData
+      blocks = (dirs + DIRECTORY_BLOCK - 1) // DIRECTORY_BLOCK
+      self.dirOffsets_ = view[dirOffsets:dirOffsets + 4 * blocks].cast("I")
+      self.directories_ = {}
+
+   def close(self):
+      self.nameOffsets_.release()
+      self.fileDirs_.release()
+      self.dirOffsets_.release()
+      self.view_.release()
+      self.map_.close()
+
+   def __len__(self):
+      return self.files_
+
+   def _name(self, i):
+      return self.map_[self.names_ + self.nameOffsets_[i]:self.names_ + self.nameOffsets_[i + 1] - 1]
+
+   def _directory(self, d):
+      """
+         Decode directory d. Its whole block is decoded and kept, since the
+         paths in a block are only stored relative to its first.
+      """
+      block = self.directories_.get(d // DIRECTORY_BLOCK)
+      if block is None:
+         block = []
+         i = self.dirData_ + self.dirOffsets_[d // DIRECTORY_BLOCK]
+         end = min(self.dirs_, (d // DIRECTORY_BLOCK + 1) * DIRECTORY_BLOCK)
+         path = b""
+         for j in range(end - d // DIRECTORY_BLOCK * DIRECTORY_BLOCK):
+            (shared, length) = _dirEntry.unpack_from(self.map_, i)
+            i += _dirEntry.size
+            path = path[:shared] + self.map_[i:i + length]
+            i += length
+            block.append(_decode(path))
+         self.directories_[d // DIRECTORY_BLOCK] = block
+      return block[d % DIRECTORY_BLOCK]
+
+   def _record(self, i):
+      """
+         @returns The tuple (basename, directory) of file i.
+      """
+      return (_decode(self._name(i)), self._directory(self.fileDirs_[i]))
+
+   def _lowerBound(self, key):
+      """
+         @returns The index of the first name that is not less than key.
+      """
+      low = 0
+      high = self.files_
+      while low < high:
+         middle = (low + high) // 2
+         if self._name(middle) < key:
+            low = middle + 1
+         else:
+            high = middle
+      return low
+
+   def _range(self, prefix):
+      """
+         @returns The range of the names that start with prefix.
+      """
+      # No UTF-8 encoding contains the byte 0xff.
+      key = os.fsencode(prefix)
+      return (self._lowerBound(key), self._lowerBound(key + b"\xff"))
+
+   def findExact(self, basename):
+      """
+         @returns The records (basename, directory) of the files called
+         basename.
+      """
+      key = os.fsencode(basename)
+      ret = []
+      i = self._lowerBound(key)
+      while i < self.files_ and self._name(i) == key:
+         ret.append(self._record(i))
+         i += 1
+      return ret
+
+   def findPrefix(self, prefix, limit=-1):
+      """
+         @returns The records (basename, directory) of the files whose
+         basename starts with prefix, ordered by basename.
+      """
+      (low, high) = self._range(prefix)
+      if limit >= 0:
+         high = min(high, low + limit)
+      return [self._record(i) for i in range(low, high)]
+
+   def complete(self, prefix, limit):
+      """
+         @returns The first limit distinct basenames that start with
+         prefix. The copies of a name are stepped over with a binary
+         search, since no name holds a NUL byte.
+      """
+      (low, high) = self._range(prefix)
+      ret = []
+      while low < high and len(ret) < limit:
+         name = self._name(low)
+         ret.append(_decode(name))
+         low = self._lowerBound(name + b"\0")
+      return ret
+
+   def _names(self, low, high):
+      """
+         @returns The decoded names of files low to high, in one piece.
+      """
+      if low >= high:
+         return []
+      names = self.map_[self.names_ + self.nameOffsets_[low]:self.names_ + self.nameOffsets_[high] - 1]
+      return _decode(names).split("\0")
+
+   def search(self, searchPattern):
+      """
+         Yield the records (basename, directory) of the files whose
+         basename searchPattern matches. When the pattern requires
+         literals the candidates are found by searching the mapped names
+         for the longest one and only those that contain all of them are
+         decoded.
+      """
+      analysis = PatternAnalysis(searchPattern)
+      (low, high) = self._range(analysis.getPrefix())
+      fileDirs = self.fileDirs_
+      directory = self._directory
+      if analysis.isPrefix():
+         for (i, base) in enumerate(self._names(low, high), low):
+            yield (base, directory(fileDirs[i]))
+         return
+
+      search = re.compile(analysis.getPattern()).search
+      literals = [os.fsencode(l) for l in analysis.getRequiredLiterals()]
+      literals = sorted((l for l in literals if b"\0" not in l), key=len, reverse=True)
+      if not literals:
+         for (i, base) in enumerate(self._names(low, high), low):
+            if search(base):
+               yield (base, directory(fileDirs[i]))
+         return
+
+      # Every match contains the literal, so when the pattern is nothing
+      # but a literal the candidates need no further checks.
+      exact = analysis.getLiteral() is not None
+      (literal, others) = (literals[0], literals[1:])
+      find = self.map_.find
+      names = self.names_
+      offsets = self.nameOffsets_
+      end = names + offsets[high]
+      position = find(literal, names + offsets[low], end)
+      while position >= 0:
+         i = bisect.bisect_right(offsets, position - names) - 1
+         next = names + offsets[i + 1]
+         name = self.map_[names + offsets[i]:next - 1]
+         if exact:
+            yield (_decode(name), directory(fileDirs[i]))
+         elif all(l in name for l in others):
+            base = _decode(name)
+            if search(base):
+               yield (base, directory(fileDirs[i]))
+         position = find(literal, next, end)
+
+
+class MappedLocationTable(LocationTable):
+   """
+      A LocationTable that answers lookups from the mapped copy of the
+      table when there is a current one, and from sqlite otherwise. It is
+      written like any other LocationTable.
+   """
+
+   def _openIndex(self):
+      """
+         @returns A MappedIndex, or None if there is no mapped copy or it is
+         older than the table.
+      """
+      if not self.isMappedCurrent():
+         return None
+      try:
+         return MappedIndex(self.getMappedFileFullPath())
+      except (OSError, ValueError):
+         return None
+
+   def _getResultCache(self):
+      # Reading the cache opens sqlite files, which the mapped copy is there
+      # to avoid, and costs about as much as searching the copy.
+      return None
+
+   def __len__(self):
+      index = self._openIndex()
+      if index is None:
+         return LocationTable.__len__(self)
+      try:
+         return len(index)
+      finally:
+         index.close()
+
+   def findExact(self, basename):
+      index = self._openIndex()
+      if index is None:
+         return LocationTable.findExact(self, basename)
+      try:
+         return [(b, os.path.join(d, b)) for (b, d) in index.findExact(basename)]
+      finally:
+         index.close()
+
+   def findPrefix(self, prefix, limit=-1):
+      index = self._openIndex()
+      if index is None:
+         return LocationTable.findPrefix(self, prefix, limit)
+      try:
+         return [(b, os.path.join(d, b)) for (b, d) in index.findPrefix(prefix, limit)]
+      finally:
+         index.close()
+
+   def complete(self, prefix, limit=COMPLETION_LIMIT):
+      index = self._openIndex()
+      if index is None:
+         return LocationTable.complete(self, prefix, limit)
+      try:
+         return index.complete(prefix, limit)
+      finally:
+         index.close()
+
+   def _query(self, searchPattern):
+      index = self._openIndex()
+      if index is None:
+         return LocationTable._query(self, searchPattern)
+      try:
+         matches = [(b, os.path.join(d, b)) for (b, d) in index.search(searchPattern)]
+         exactMatches = [(b, os.path.join(d, b)) for (b, d) in index.findExact(searchPattern)]
+      finally:
+         index.close()
+      return (matches, exactMatches)
+
+   def _fuzzyQuery(self, query, limit):
+      index = self._openIndex()
+      if index is None:
+         return LocationTable._fuzzyQuery(self, query, limit)
+      try:
+         pattern = "(?i)" + ".*".join(re.escape(ch) for ch in query)
+         ranked = fuzzy.rank(query, index.search(pattern), limit)
+      finally:
+         index.close()
+      return [(base, os.path.join(directory, base)) for (score, base, directory) in ranked]
@@ -0,0 +1,307 @@
+"""
+This files defines the classes Narrower and NarrowingPrompt.
+
+A Narrower filters a list of records as a query is typed, one character at
+a time. The query is a list of words separated by spaces and a record is
+kept if its basename contains every word; a word with a '/' in it is
+looked for in the full path instead. Words in lower case ignore case.
+
+Since typing a character can only narrow the candidates, each character is
+matched against the candidates left by the one before it, and the
+candidates after each character are kept on a stack so that erasing one is
+just a pop. The exception is a word that just gained its first '/' or
+capital letter, which is matched whole against the candidates there were
+before it, since it is now looked for elsewhere.
+
+A NarrowingPrompt reads keys from a terminal, feeds them to a Narrower and
+keeps the top of the candidate list on screen, rewriting only the lines
+that changed.
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import codecs
+
+# The most candidates shown at once.
+MAXIMUM_ROWS=20
+
+KEY_UP=("\x1b[A", "\x1bOA", "\x10")
+KEY_DOWN=("\x1b[B", "\x1bOB", "\x0e")
+KEY_ERASE=("\x7f", "\x08")
+KEY_CLEAR="\x15"
+KEY_ACCEPT=("\r", "\n")
+KEY_CANCEL=("\x1b", "\x03", "\x04", "\x07")
+
+
+def isSupported(stdin=None, out=None):
+   """
+      True if keys can be read one at a time from stdin and the prompt
+      drawn on out, both terminals.
+   """
+   try:
+      import termios
+   except ImportError:
+      return False
+   stdin = stdin or sys.stdin
+   out = out or sys.stderr
+   try:
+      return stdin.isatty() and out.isatty()
+   except (AttributeError, ValueError):
+      return False
+
+
+class Narrower:
+   """
+      Narrows a list of records (basename, fullpath) by a query typed one
+      character at a time.
+   """
+
+   def __init__(self, records):
+      self.records_ = list(records)
+      self.names_ = [r[0] for r in self.records_]
+      self.lowerNames_ = [n.lower() for n in self.names_]
+      self.paths_ = None
+      self.lowerPaths_ = None
+      self.query_ = ""
+      self.stack_ = [list(range(len(self.records_)))]
+
+   def __len__(self):
+      """
+         The number of candidates left.
+      """
+      return len(self.stack_[-1])
+
+   def getTotal(self):
+      return len(self.records_)
+
+   def getQuery(self):
+      return self.query_
+
+   def getCandidates(self, limit=None):
+      """
+         @returns The records left, in their original order, at most limit
+         of them.
+      """
+      indices = self.stack_[-1]
+      if limit is not None:
+         indices = indices[:limit]
+      return [self.records_[i] for i in indices]
+
+   def _getHaystack(self, word):
+      """
+         @returns The list of strings word is looked for in.
+      """
+      ignoreCase = word == word.lower()
+      if "/" in word:
+         if self.paths_ is None:
+            self.paths_ = [r[1] for r in self.records_]
+            self.lowerPaths_ = [p.lower() for p in self.paths_]
+         return self.lowerPaths_ if ignoreCase else self.paths_
+      return self.lowerNames_ if ignoreCase else self.names_
+
+   def type(self, text):
+      """
+         Add text to the end of the query.
+      """
+      for ch in text:
+         self.query_ += ch
+         word = self.query_.split(" ")[-1]
+         if not word:
+            self.stack_.append(self.stack_[-1])
+            continue
+         haystack = self._getHaystack(word)
+         candidates = self.stack_[-1]
+         if len(word) > 1 and haystack is not self._getHaystack(word[:-1]):
+            candidates = self.stack_[len(self.query_) - len(word)]
+         self.stack_.append([i for i in candidates if word in haystack[i]])
+
+   def erase(self):
+      """
+         Remove the last character of the query.
+      """
+      if self.query_:
+         self.query_ = self.query_[:-1]
+         self.stack_.pop()
+
+   def clear(self):
+      self.query_ = ""
+      del self.stack_[1:]
+
+
+class NarrowingPrompt:
+   """
+      Lets the user narrow a Narrower interactively and pick one record.
+      Up and Down (or ^P and ^N) move the selection, Enter picks it,
+      Backspace and ^U edit the query and Escape or ^C give up.
+   """
+
+   def __init__(self, narrower, fd, out, rows=None, columns=None, labels=None):
+      """
+         @param fd
+         The file descriptor keys are read from, in cbreak mode.
+
+         @param out
+         The terminal to draw on.
+
+         @param labels
+         An optional function that returns the label shown after a record,
+         such as the location table it came from, or None.
+      """
+      self.narrower_ = narrower
+      self.labels_ = labels
+      self.fd_ = fd
+      self.out_ = out
+      if rows is None or columns is None:
+         try:
+            size = os.get_terminal_size(out.fileno())
+         except (AttributeError, ValueError, OSError):
+            size = os.terminal_size((80, 24))
+         rows = rows or size.lines
+         columns = columns or size.columns
+      self.rows_ = max(1, min(MAXIMUM_ROWS, rows - 2))
+      self.columns_ = max(10, columns)
+      self.selected_ = 0
+      self.drawn_ = []
+      self.decoder_ = codecs.getincrementaldecoder(sys.getfilesystemencoding())("replace")
+
+   def _render(self):
+      """
+         @returns The lines of the prompt, the query first.
+      """
+      n = self.narrower_
+      lines = ["> %s  (%d/%d)" % (n.getQuery(), len(n), n.getTotal())]
+      for (i, record) in enumerate(n.getCandidates(self.rows_)):
+         marker = ">" if i == self.selected_ else " "
+         line = "%s %s  %s" % (marker, record[0], os.path.dirname(record[1]))
+         label = self.labels_(record) if self.labels_ else None
+         if label:
+            line += "  [%s]" % (label)
+         lines.append(line)
+      while len(lines) <= self.rows_:
+         lines.append("")
+      return [l[:self.columns_ - 1] for l in lines]
+
+   def _draw(self):
+      """
+         Rewrite the lines that changed since the last draw and leave the
+         cursor after the query.
+      """
+      lines = self._render()
+      buf = []
+      if not self.drawn_:
+         # Make room below the prompt, scrolling if need be.
+         buf.append("\n" * self.rows_ + "\x1b[%dA" % (self.rows_))
+      for (k, line) in enumerate(lines):
+         if k == 0 or k >= len(self.drawn_) or self.drawn_[k] != line:
+            if k:
+               buf.append("\x1b[%dB" % (k))
+            buf.append("\r" + line + "\x1b[K")
+            if k:
+               buf.append("\x1b[%dA" % (k))
+      query = "> " + self.narrower_.getQuery()
+      buf.append("\r" + query[:self.columns_ - 1])
+      self.drawn_ = lines
+      self.out_.write("".join(buf))
+      self.out_.flush()
+
+   def _erase(self):
+      self.out_.write("\r\x1b[J")
+      self.out_.flush()
+
+   def _split(self, text):
+      """
+         Split what was read into keys, keeping escape sequences whole.
+      """
+      keys = []
+      i = 0
+      while i < len(text):
+         if text[i] == "\x1b" and text[i+1:i+2] in ("[", "O") and i + 2 < len(text):
+            keys.append(text[i:i+3])
+            i += 3
+         else:
+            keys.append(text[i])
+            i += 1
+      return keys
+
+   def _handle(self, key):
+      """
+         @returns A tuple (done, record).
+      """
+      n = self.narrower_
+      if key in KEY_ACCEPT:
+         if len(n):
+            return (True, n.getCandidates(self.selected_ + 1)[self.selected_])
+         return (False, None)
+      if key in KEY_CANCEL:
+         return (True, None)
+      if key in KEY_UP:
+         self.selected_ = max(0, self.selected_ - 1)
+      elif key in KEY_DOWN:
+         self.selected_ = max(0, min(self.selected_ + 1, len(n) - 1, self.rows_ - 1))
+      elif key in KEY_ERASE:
+         n.erase()
+         self.selected_ = 0
+      elif key == KEY_CLEAR:
+         n.clear()
+         self.selected_ = 0
+      elif key.isprintable() and len(key) == 1:
+         n.type(key)
+         self.selected_ = 0
+      return (False, None)
+
+   def run(self):
+      """
+         @returns The record picked, or None.
+      """
+      try:
+         self._draw()
+         while True:
+            data = os.read(self.fd_, 4096)
+            if not data:
+               return None
+            # Everything read is applied before drawing again, so pasting or
+            # typing ahead costs one draw.
+            for key in self._split(self.decoder_.decode(data)):
+               (done, record) = self._handle(key)
+               if done:
+                  return record
+            self._draw()
+      finally:
+         self._erase()
+
+
+def narrow(records, stdin=None, out=None, labels=None):
+   """
+      Narrow records interactively on the terminal.
+
+      @param labels @see NarrowingPrompt
+
+      @returns The record picked, or None.
+   """
+   import termios
+   import tty
+
+   stdin = stdin or sys.stdin
+   out = out or sys.stderr
+   fd = stdin.fileno()
+   saved = termios.tcgetattr(fd)
+   try:
+      tty.setcbreak(fd)
+      return NarrowingPrompt(Narrower(records), fd, out, labels=labels).run()
+   finally:
+      termios.tcsetattr(fd, termios.TCSADRAIN, saved)
@@ -0,0 +1,282 @@
+"""
+This files defines functions that analyze the regular expressions given to
+LocationTable.search so that they can be answered with the help of an index.
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+The analysis is conservative: whenever a construct is not understood the
+answer is "nothing is known", never a wrong one. Callers always verify
+candidates with the real expression.
+"""
+
+import re
+
+LITERAL="literal"
+QUANTIFIER="quantifier"
+START="start"
+END="end"
+ALTERNATION="alternation"
+FLAGS="flags"
+OTHER="other"
+
+_quantifierExp = re.compile(r"\{(\d*)(,?)(\d*)\}")
+
+# An escape that stands for something other than the character escaped,
+# which may run on for several characters: a character code, a named
+# character, an octal number or a group reference.
+_escapeExp = re.compile(r"\\(x[0-9a-fA-F]{0,2}|u[0-9a-fA-F]{0,4}|U[0-9a-fA-F]{0,8}|N\{[^}]*\}|0[0-7]{0,2}|[0-7]{3}|\d{1,2}|.)", re.S)
+
+
+def _skipClass(pattern, i):
+   """
+      Given the index of a '[' return the index just past the matching ']'.
+   """
+   i += 1
+   if i < len(pattern) and pattern[i] == "^":
+      i += 1
+   if i < len(pattern) and pattern[i] == "]":
+      i += 1
+   while i < len(pattern) and pattern[i] != "]":
+      if pattern[i] == "\\":
+         i += 1
+      i += 1
+   return i + 1
+
+
+def _skipGroup(pattern, i):
+   """
+      Given the index of a '(' return the index just past the matching ')'.
+   """
+   depth = 0
+   while i < len(pattern):
+      ch = pattern[i]
+      if ch == "\\":
+         i += 2
+         continue
+      if ch == "[":
+         i = _skipClass(pattern, i)
+         continue
+      if ch == "(":
+         depth += 1
+      elif ch == ")":
+         depth -= 1
+         if depth == 0:
+            return i + 1
+      i += 1
+   return i
+
+
+def tokenize(pattern):
+   """
+      Split the top level of pattern into a list of tuples (kind, value):
+
+      (LITERAL, ch)           a character matched literally
+      (QUANTIFIER, (m, n))    repeats the previous token m to n times, n is
+                              None when unbounded
+      (START, None)           '^' or '\\A'
+      (END, None)             '$' or '\\Z'
+      (ALTERNATION, None)     a top level '|'
+      (FLAGS, None)           a global inline flag group such as '(?i)'
+      (OTHER, text)           anything else: groups, classes, '.', escapes
+                              such as '\\d', ...
+   """
+   tokens = []
+   i = 0
+   n = len(pattern)
+   while i < n:
+      ch = pattern[i]
+      if ch == "\\":
+         escaped = pattern[i+1:i+2]
+         if escaped == "A":
+            tokens.append((START, None))
+         elif escaped == "Z":
+            tokens.append((END, None))
+         elif escaped and not escaped.isalnum():
+            tokens.append((LITERAL, escaped))
+         elif escaped:
+            # The whole escape is one token, so that none of it is
+            # mistaken for a literal.
+            j = _escapeExp.match(pattern, i).end()
+            tokens.append((OTHER, pattern[i:j]))
+            i = j
+            continue
+         else:
+            tokens.append((OTHER, pattern[i:i+2]))
+         i += 2
+      elif ch == "[":
+         j = _skipClass(pattern, i)
+         tokens.append((OTHER, pattern[i:j]))
+         i = j
+      elif ch == "(":
+         j = _skipGroup(pattern, i)
+         group = pattern[i:j]
+         if re.match(r"\(\?[aiLmsux]+\)$", group):
+            tokens.append((FLAGS, None))
+         else:
+            tokens.append((OTHER, group))
+         i = j
+      elif ch == "|":
+         tokens.append((ALTERNATION, None))
+         i += 1
+      elif ch == "^":
+         tokens.append((START, None))
+         i += 1
+      elif ch == "$":
+         tokens.append((END, None))
+         i += 1
+      elif ch == ".":
+         tokens.append((OTHER, ch))
+         i += 1
+      elif ch in "*+?{":
+         m = None
+         if ch == "*":
+            bounds = (0, None)
+            j = i + 1
+         elif ch == "+":
+            bounds = (1, None)
+            j = i + 1
+         elif ch == "?":
+            bounds = (0, 1)
+            j = i + 1
+         else:
+            m = _quantifierExp.match(pattern, i)
+            if not m or (not m.group(1) and not m.group(2) and not m.group(3)):
+               tokens.append((LITERAL, ch))
+               i += 1
+               continue
+            low = int(m.group(1)) if m.group(1) else 0
+            if m.group(2):
+               high = int(m.group(3)) if m.group(3) else None
+            else:
+               high = low
+            bounds = (low, high)
+            j = m.end()
+         # Lazy and possessive modifiers do not change what can match.
+         if j < n and pattern[j] in "?+":
+            j += 1
+         tokens.append((QUANTIFIER, bounds))
+         i = j
+      else:
+         tokens.append((LITERAL, ch))
+         i += 1
+   return tokens
+
+
+def _runs(tokens):
+   """
+      Split tokens into the runs of literal characters that every match
+      must contain, in order.
+   """
+   runs = []
+   current = []
+   for (kind, value) in tokens:
+      if kind == LITERAL:
+         current.append(value)
+      elif kind == QUANTIFIER:
+         (low, high) = value
+         if current:
+            last = current.pop()
+            if low > 0:
+               current.append(last)
+         runs.append("".join(current))
+         current = []
+      else:
+         runs.append("".join(current))
+         current = []
+   runs.append("".join(current))
+   return [r for r in runs if r]
+
+
+def isAnalyzable(tokens):
+   """
+      False if the pattern uses alternation or global flags at the top
+      level, which defeat the simple analysis done here.
+   """
+   for (kind, value) in tokens:
+      if kind == ALTERNATION or kind == FLAGS:
+         return False
+   return True
+
+
+class PatternAnalysis:
+   """
+      What can be said about the strings a regular expression matches with
+      re.search.
+   """
+
+   def __init__(self, pattern):
+      self.pattern_ = str(pattern)
+      self.tokens_ = tokenize(self.pattern_)
+      self.analyzable_ = isAnalyzable(self.tokens_)
+
+   def getPattern(self):
+      return self.pattern_
+
+   def getLiteral(self):
+      """
+         If the pattern matches exactly the strings that contain some
+         literal string return that string, otherwise None.
+      """
+      if not self.analyzable_:
+         return None
+      if [t for t in self.tokens_ if t[0] != LITERAL]:
+         return None
+      return "".join(t[1] for t in self.tokens_)
+
+   def getPrefix(self):
+      """
+         Return the string every match must start with, "" if there is
+         none.
+      """
+      if not self.analyzable_ or not self.tokens_ or self.tokens_[0][0] != START:
+         return ""
+      prefix = []
+      for (kind, value) in self.tokens_[1:]:
+         if kind == LITERAL:
+            prefix.append(value)
+         else:
+            if kind == QUANTIFIER and prefix and value[0] == 0:
+               prefix.pop()
+            break
+      return "".join(prefix)
+
+   def isPrefix(self):
+      """
+         True if the pattern matches exactly the strings that start with
+         getPrefix().
+      """
+      if not self.analyzable_ or not self.tokens_ or self.tokens_[0][0] != START:
+         return False
+      return not [t for t in self.tokens_[1:] if t[0] != LITERAL]
+
+   def getRequiredLiterals(self, minimumLength=1):
+      """
+         @see requiredLiterals
+      """
+      if not self.analyzable_:
+         return []
+      return [r for r in _runs(self.tokens_) if len(r) >= minimumLength]
+
+
+def requiredLiterals(pattern, minimumLength=1):
+   """
+      Return a list of strings that must all appear, case sensitively, in
+      any string pattern matches. An empty list means nothing is known.
+
+      @param minimumLength
+      Leave out literals shorter than this.
+   """
+   return PatternAnalysis(pattern).getRequiredLiterals(minimumLength)
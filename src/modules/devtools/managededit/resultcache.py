@@ -0,0 +1,163 @@
+"""
+This files defines the class ResultCache.
+
+A ResultCache remembers what recent searches of a location table found, so
+that the shell functions and editor integrations that send the same
+patterns over and over get their answer from one indexed read instead of a
+scan of the table.
+
+Every result is stored with the id and the generation of the table it was
+read from. @see LocationTable.getTableId and LocationTable.getGeneration
+Once a rebuild or refresh changes the table the generation moves on, and
+once the table is created from scratch the id changes, so the old results
+are never read again; they are dropped the next time a result is stored.
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import time
+import marshal
+import sqlite3
+
+RESULT_TABLE_NAME="Result"
+
+# The layout of the cache, kept in PRAGMA user_version. A cache written with
+# another layout is dropped.
+CACHE_VERSION=1
+
+# The cache holds at most MAXIMUM_SIZE bytes of results, dropping the least
+# recently used beyond that. A result larger than MAXIMUM_RESULT_SIZE, say
+# for '.', is cheaper to search again than to keep.
+MAXIMUM_SIZE=16 * 1024 * 1024
+MAXIMUM_RESULT_SIZE=1024 * 1024
+
+# A hit only records that the result was used if it was last marked used
+# more than this many seconds ago, so repeating a search costs no write.
+USE_RESOLUTION=60
+
+# Seconds to wait for a writer before giving up on the cache.
+TIMEOUT=0.5
+
+
+class ResultCache:
+   """
+      The results are kept in a small sqlite file of their own next to the
+      location table. Anything wrong with the file, say it is locked by a
+      writer, makes a lookup miss rather than fail.
+   """
+
+   def __init__(self, configuration):
+      self.config_ = configuration
+
+   def getFileFullPath(self):
+      return self.config_.getLocationTableFileFullPath() + ".cache"
+
+   def _opendb(self, create=False):
+      conn = sqlite3.connect(self.getFileFullPath(), timeout=TIMEOUT)
+      if not create:
+         return conn
+      c = conn.cursor()
+      c.execute('''PRAGMA synchronous=OFF''')
+      c.execute('''PRAGMA user_version''')
+      if c.fetchone()[0] != CACHE_VERSION:
+         c.execute('''DROP TABLE IF EXISTS %s''' % (RESULT_TABLE_NAME))
+         c.execute('''PRAGMA user_version=%d''' % (CACHE_VERSION))
+      c.execute('''CREATE TABLE IF NOT EXISTS %s (pattern TEXT NOT NULL, mode TEXT NOT NULL, tableid TEXT, generation INTEGER NOT NULL, results BLOB NOT NULL, size INTEGER NOT NULL, used INTEGER NOT NULL, PRIMARY KEY (pattern, mode)) WITHOUT ROWID''' % (RESULT_TABLE_NAME))
+      c.execute('''CREATE INDEX IF NOT EXISTS %sUsed ON %s (used)''' % (RESULT_TABLE_NAME, RESULT_TABLE_NAME))
+      return conn
+
+   def _closedb(self, conn):
+      conn.close()
+
+   def get(self, pattern, mode, table, generation, now=None):
+      """
+         @param mode
+         How pattern was matched, say "regex" or "fuzzy:50".
+
+         @param table
+         The id of the table, or None if it has none.
+
+         @returns The lists of records stored for pattern and mode with
+         table and generation, or None if there are none.
+      """
+      if not os.path.isfile(self.getFileFullPath()):
+         return None
+      if now is None:
+         now = int(time.time())
+      try:
+         conn = self._opendb()
+         try:
+            c = conn.cursor()
+            c.execute('''SELECT tableid, generation, results, used FROM %s WHERE pattern=? AND mode=?''' % (RESULT_TABLE_NAME),
+                      (pattern, mode))
+            row = c.fetchone()
+            if row is None or row[0] != table or row[1] != generation:
+               return None
+            if row[3] < now - USE_RESOLUTION:
+               c.execute('''UPDATE %s SET used=? WHERE pattern=? AND mode=?''' % (RESULT_TABLE_NAME),
+                         (now, pattern, mode))
+               conn.commit()
+            results = row[2]
+         finally:
+            self._closedb(conn)
+      except sqlite3.Error:
+         return None
+      try:
+         return marshal.loads(results)
+      except (EOFError, ValueError, TypeError):
+         return None
+
+   def put(self, pattern, mode, table, generation, results, now=None):
+      """
+         Store lists of records for pattern and mode, found in the table
+         with the id table and generation.
+      """
+      encoded = marshal.dumps(results)
+      if len(encoded) > MAXIMUM_RESULT_SIZE:
+         return
+      if now is None:
+         now = int(time.time())
+      try:
+         conn = self._opendb(True)
+         try:
+            c = conn.cursor()
+            c.execute('''DELETE FROM %s WHERE tableid IS NOT ? OR generation <> ?''' % (RESULT_TABLE_NAME), (table, generation))
+            c.execute('''INSERT OR REPLACE INTO %s VALUES (?, ?, ?, ?, ?, ?, ?)''' % (RESULT_TABLE_NAME),
+                      (pattern, mode, table, generation, encoded, len(encoded), now))
+            self._evict(c)
+            conn.commit()
+         finally:
+            self._closedb(conn)
+      except sqlite3.Error:
+         pass
+
+   def _evict(self, c):
+      """
+         Drop the least recently used results beyond MAXIMUM_SIZE.
+      """
+      c.execute('''SELECT total(size) FROM %s''' % (RESULT_TABLE_NAME))
+      excess = c.fetchone()[0] - MAXIMUM_SIZE
+      if excess <= 0:
+         return
+      evicted = []
+      c.execute('''SELECT pattern, mode, size FROM %s ORDER BY used''' % (RESULT_TABLE_NAME))
+      for (pattern, mode, size) in c.fetchall():
+         if excess <= 0:
+            break
+         evicted.append((pattern, mode))
+         excess -= size
+      c.executemany('''DELETE FROM %s WHERE pattern=? AND mode=?''' % (RESULT_TABLE_NAME), evicted)
@@ -19,10 +19,19 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
 import os
-import re
 import sys
+import copy
 
 import devtools.common.utility
+from devtools.managededit.ignore import toIgnoreRules
+
+# Where a SearchPath gets its files from: "walk" lists the directories, "git"
+# asks git for the files of the working tree, tracked or untracked but not
+# ignored, and walks the directories if that fails.
+SOURCES=("walk", "git")
+
+# The mode git records for a submodule.
+GITLINK_MODE="160000"
 
 class SearchPath:
    """
@@ -30,58 +39,245 @@ class SearchPath:
 
       For now one property, whether to do the search recursively exists.
 
-      It is expected that the search path will be able to handle specific ignore
-      directives in the future. For now all ignores must be passed in from the
-      outside (which is quite workable for a strictly global set of ignores)
-
+      The global ignores are passed in from the outside, and a search path
+      may add DirectoryIgnore and FileIgnore patterns of its own. @see
+      IgnoreRules
    """
 
-   def __init__(self, path, recursive):
+   def __init__(self, path, recursive, source="walk"):
       """
          Treat the pat as a template string and use os.eviron as
          the mapping.
+
+         @param source
+         One of SOURCES.
       """
+      if source not in SOURCES:
+         raise RuntimeError("Unknown SearchPath source: '%s'." % (source))
       self.path_ = devtools.common.utility.substituteEnvironment(path)
       self.recursive_ = bool(recursive)
-      self.dirIgnores_ = []
+      self.source_ = source
+      self.dirIgnorePatterns_ = []
+      self.fileIgnorePatterns_ = []
+      self.ignoreCache_ = {}
       if not os.path.exists(self.path_):
          sys.stderr.write("The path: '" + self.path_ + "' does not exist.")
 
    def addDirectoryIgnore(self, patternString):
-      self.dirIgnores_.append(re.compile(devtools.common.utility.substituteEnvironment(patternString)))
+      self.dirIgnorePatterns_.append(devtools.common.utility.substituteEnvironment(patternString))
+      self.ignoreCache_ = {}
+
+   def addFileIgnore(self, patternString):
+      self.fileIgnorePatterns_.append(str(patternString))
+      self.ignoreCache_ = {}
+
+   def getPath(self):
+      return self.path_
+
+   def isRecursive(self):
+      return self.recursive_
+
+   def getSource(self):
+      return self.source_
+
+   def getSubPath(self, directory):
+      """
+         Return a SearchPath for a directory beneath this one that applies
+         the same rules.
+      """
+      ret = copy.copy(self)
+      ret.path_ = directory
+      return ret
+
+   def contains(self, fullDir, dirIgnores):
+      """
+         True if a walk of this search path visits the directory fullDir.
+
+         @param dirIgnores
+         @see getDirectoryIgnores
+      """
+      if fullDir == self.path_:
+         return True
+      root = os.path.join(self.path_, "")
+      if not self.recursive_ or not fullDir.startswith(root):
+         return False
+      current = self.path_
+      for component in fullDir[len(root):].split(os.sep):
+         current = os.path.join(current, component)
+         if self.isDirectoryIgnored(current, dirIgnores):
+            return False
+      return True
+
+   def _extendIgnores(self, kind, ignores, patterns):
+      """
+         Return ignores extended by patterns. The result is kept for as long
+         as the same ignores are passed in, so each scope is compiled once.
+      """
+      ignores = toIgnoreRules(ignores)
+      cached = self.ignoreCache_.get(kind)
+      if cached is None or cached[0] is not ignores:
+         cached = (ignores, ignores.extend(patterns))
+         self.ignoreCache_[kind] = cached
+      return cached[1]
+
+   def getDirectoryIgnores(self, dirIgnores=[]):
+      """
+         Return the given directory ignores extended by the ones that belong
+         to this search path, as IgnoreRules.
+      """
+      return self._extendIgnores("directory", dirIgnores, self.dirIgnorePatterns_)
+
+   def getFileIgnores(self, fileIgnores=[]):
+      """
+         Return the given file ignores extended by the ones that belong to
+         this search path, as IgnoreRules.
+      """
+      return self._extendIgnores("file", fileIgnores, self.fileIgnorePatterns_)
+
+   def isDirectoryIgnored(self, fullDir, dirIgnores):
+      """
+         @param fullDir
+         The full path of a directory found beneath this search path.
+
+         @param dirIgnores
+         @see getDirectoryIgnores
+      """
+      return toIgnoreRules(dirIgnores).search(fullDir)
+
+   def acceptFiles(self, root, files, fileIgnores):
+      """
+         Given the names of the files in the directory root return the full
+         paths of the ones that should be indexed: those that neither the
+         given file ignores nor the ones of this search path match.
+      """
+      return [os.path.join(root, f) for f in self.getFileIgnores(fileIgnores).filter(files)]
+
+   def _listGitFiles(self):
+      """
+         @returns The paths relative to this search path of the files git
+         knows beneath it, or None if it is not in a git working tree.
+         Deleted files and submodules are left out.
+      """
+      # Only needed for search paths that use git.
+      import subprocess
+
+      try:
+         output = subprocess.run(["git", "-C", self.path_, "ls-files", "-z", "-t", "--stage",
+                                  "--cached", "--others", "--deleted", "--exclude-standard"],
+                                 stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                 check=True).stdout
+      except (OSError, subprocess.CalledProcessError):
+         return None
+
+      files = set()
+      deleted = set()
+      for entry in output.split(b"\0"):
+         if not entry:
+            continue
+         entry = os.fsdecode(entry)
+         (tag, rest) = (entry[:1], entry[2:])
+         if tag == "?":
+            files.add(rest)
+            continue
+         (stage, name) = rest.split("\t", 1)
+         if tag == "R":
+            deleted.add(name)
+         elif tag in ("H", "M") and not stage.startswith(GITLINK_MODE):
+            files.add(name)
+      return files - deleted
+
+   def listRepository(self, dirIgnores=[], fileIgnores=[]):
+      """
+         Ask the version control system for the files beneath this search
+         path instead of walking its directories.
+
+         @returns A list of tuples (directory, files) with the full path of
+         each directory a walk would visit, that is the search path and every
+         directory with files somewhere beneath it, and the full paths of the
+         accepted files directly in it, or None if the directories have to be
+         walked.
+      """
+      if self.source_ != "git":
+         return None
+      names = self._listGitFiles()
+      if names is None:
+         return None
+
+      byDirectory = {"": []}
+      for name in names:
+         (head, tail) = os.path.split(name)
+         if head and not self.recursive_:
+            continue
+         byDirectory.setdefault(head, []).append(tail)
+         # The directories above it may hold only directories.
+         parent = os.path.dirname(head)
+         while parent and parent not in byDirectory:
+            byDirectory[parent] = []
+            parent = os.path.dirname(parent)
+
+      dirIgnores = self.getDirectoryIgnores(dirIgnores)
+      fileIgnores = toIgnoreRules(fileIgnores)
+      ret = []
+      for head in sorted(byDirectory):
+         directory = os.path.join(self.path_, head) if head else self.path_
+         if head and not self.contains(directory, dirIgnores):
+            continue
+         ret.append((directory, self.acceptFiles(directory, sorted(byDirectory[head]), fileIgnores)))
+      return ret
+
+   def getState(self):
+      """
+         The search path as plain data. @see restoreSearchPath
+      """
+      return (self.path_, self.recursive_, self.source_,
+              list(self.dirIgnorePatterns_), list(self.fileIgnorePatterns_))
 
    def __str__(self):
+      if self.source_ != "walk":
+         return "[%s recursive=%s source=%s]" % (self.path_, self.recursive_, self.source_)
       return "[%s recursive=%s]" % (self.path_, self.recursive_)
 
    def walk(self, dirIgnores=[], fileIgnores=[]):
       """
          @param dirIgnores
-          This is a list of regular expressions which will be used to test the
-          directories and to remove ones that we do not wish to walk over.
+          This is a list of regular expressions, or IgnoreRules, which will be
+          used to test the directories and to remove ones that we do not wish
+          to walk over.
 
          @param fileIgnores
            If a file matches any of these patterns then do not yield it.
 
       """
-      dirIgnores = dirIgnores[:]
-      dirIgnores.extend(self.dirIgnores_)
+      dirIgnores = self.getDirectoryIgnores(dirIgnores)
+      fileIgnores = toIgnoreRules(fileIgnores)
+
+      listing = self.listRepository(dirIgnores, fileIgnores)
+      if listing is not None:
+         for (directory, files) in listing:
+            for f in files:
+               yield f
+         return
 
       for root, dirs, files in os.walk(self.path_):
 
          if not self.recursive_:
             dirs[:] = []
 
-         dirsCopy = dirs[:]
-         for d in dirsCopy:
-            fullDir = os.path.join(root, d)
-            for i in dirIgnores:
-               if i.search(fullDir):
-                  dirs.remove(d)
-
-         for f in files:
-            if len(fileIgnores) == 0:
-               yield os.path.join(root, f)
-            else:
-               for i in fileIgnores:
-                  if not i.search(f):
-                     yield os.path.join(root, f)
+         dirs[:] = [d for d in dirs
+                    if not self.isDirectoryIgnored(os.path.join(root, d), dirIgnores)]
+
+         for f in self.acceptFiles(root, files, fileIgnores):
+            yield f
+
+
+def restoreSearchPath(state):
+   """
+      Recreate a SearchPath from what SearchPath.getState returned, without
+      looking at the environment or the file system again.
+   """
+   ret = SearchPath.__new__(SearchPath)
+   (ret.path_, ret.recursive_, ret.source_, dirPatterns, filePatterns) = state
+   ret.dirIgnorePatterns_ = list(dirPatterns)
+   ret.fileIgnorePatterns_ = list(filePatterns)
+   ret.ignoreCache_ = {}
+   return ret
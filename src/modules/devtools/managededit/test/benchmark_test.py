@@ -0,0 +1,52 @@
+#!/usr/bin/python
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from devtools.managededit.benchmark import suite
+from devtools.managededit.benchmark.tree import *
+
+
+class BenchmarkTest(unittest.TestCase):
+
+   def setUp(self):
+      self.root_ = tempfile.mkdtemp(prefix="metreetest")
+
+   def tearDown(self):
+      shutil.rmtree(self.root_)
+
+   def listTree(self, root):
+      ret = []
+      for (directory, dirs, files) in os.walk(root):
+         ret.extend(os.path.relpath(os.path.join(directory, f), root) for f in files)
+      return sorted(ret)
+
+   def testTree(self):
+      shape = TreeShape(500, depth=2, fanout=3, filesPerDirectory=20, duplicates=0.2, ignored=0.3, seed=7)
+      stats = makeTree(os.path.join(self.root_, "a"), None, shape=shape)
+      makeTree(os.path.join(self.root_, "b"), None, shape=shape)
+      self.assertEqual(self.listTree(os.path.join(self.root_, "a")),
+                       self.listTree(os.path.join(self.root_, "b")))
+      self.assertEqual(stats["files"], 500)
+      self.assertEqual(stats["directories"], 13)
+      self.assertEqual(len(self.listTree(os.path.join(self.root_, "a"))), 500 + stats["ignoredFiles"])
+
+   def testSuite(self):
+      makeTree(self.root_, None, shape=TreeShape(300, ignored=0.2))
+      results = suite.run(self.root_, 1, 1, 1)
+      self.assertEqual(results["rebuild"]["count"], 300)
+      self.assertEqual(results["search.exact"]["count"], 0)
+      self.assertEqual(results["findDirectory"]["count"], 1)
+      self.assertEqual(results["searchDirectories"]["count"], 1)
+
+      baseline = {"version": suite.FORMAT_VERSION, "results": results}
+      slower = dict((name, dict(r, seconds=r["seconds"] * 2 + 1)) for (name, r) in results.items())
+      current = {"version": suite.FORMAT_VERSION, "results": slower}
+      self.assertEqual(len(suite.compare(baseline, current)), len(results))
+      self.assertEqual(suite.compare(current, baseline), [])
+
+
+if __name__ == "__main__":
+   unittest.main()
@@ -85,7 +85,75 @@ class ConfigurationTest(unittest.TestCase):
    
       os.remove(self.c2_.getConfigurationFileFullPath())
       self.removeConfDir(self.c2_.getConfigurationDirectory())
-      
+
+   def writeConfigurationFile(self, searchPath, age=10):
+      path = self.c1_.getConfigurationFileFullPath()
+      f = open(path, "w")
+      f.write("""<ManagedEditConfiguration>
+   <Options><Option key="indexTrigrams" value="false"/></Options>
+   <GlobalIgnores><FileIgnore pattern="\\.o$"/></GlobalIgnores>
+   <SearchPaths>
+      <SearchPath path="%s" recursive="true"><DirectoryIgnore pattern="build"/><FileIgnore pattern="~$"/></SearchPath>
+   </SearchPaths>
+</ManagedEditConfiguration>
+""" % (searchPath))
+      f.close()
+      # A file changed a moment ago is not snapshotted.
+      t = os.stat(path).st_mtime - age
+      os.utime(path, (t, t))
+
+   def read(self):
+      c = Configuration(self.confDir_, False)
+      return ([sp.getPath() for sp in c.getSearchPaths()],
+              c.getFileIgnores().getPatterns(),
+              c.getOptionValue("indexTrigrams"))
+
+   def testSnapshot(self):
+      os.environ["METESTROOT"] = self.confDir_
+      self.writeConfigurationFile("${METESTROOT}")
+      expected = ([self.confDir_], ["\\.o$"], False)
+      self.assertEqual(self.read(), expected)
+      snapshot = self.c1_.getConfigurationFileFullPath() + ".snapshot"
+      self.assertTrue(os.path.exists(snapshot))
+
+      # The snapshot is read without parsing the file.
+      parse = ConfigurationFileParser.parse
+      def fail(*args):
+         raise AssertionError("The configuration file was parsed.")
+      ConfigurationFileParser.parse = fail
+      try:
+         self.assertEqual(self.read(), expected)
+         c = Configuration(self.confDir_, False)
+         (sp,) = c.getSearchPaths()
+         self.assertTrue(sp.isDirectoryIgnored(os.path.join(self.confDir_, "build"),
+                                               sp.getDirectoryIgnores()))
+         self.assertEqual(sp.getFileIgnores(c.getFileIgnores()).getPatterns(), ["\\.o$", "~$"])
+      finally:
+         ConfigurationFileParser.parse = parse
+
+      # Changing a variable the file refers to, or the file, reparses it.
+      os.environ["METESTROOT"] = os.path.join(self.confDir_, "location_table")
+      self.assertEqual(self.read()[0], [os.path.join(self.confDir_, "location_table")])
+      self.writeConfigurationFile(self.confDir_ + "/", 0)
+      self.assertEqual(self.read()[0], [self.confDir_ + "/"])
+      os.environ.pop("METESTROOT")
+
+   def testTableConfiguration(self):
+      self.writeConfigurationFile(self.confDir_, 0)
+      c = Configuration(self.confDir_, False)
+      t = c.getTableConfiguration("other")
+
+      # The copy reads the file first, and on its own.
+      self.assertEqual(t.getLocationTableFile(), "other")
+      self.assertEqual([sp.getPath() for sp in t.getSearchPaths()], [self.confDir_])
+      self.assertEqual(t.getFileIgnores().getPatterns(), ["\\.o$"])
+      t.setOption("indexTrigrams", "true")
+      t.addFileIgnore("~$")
+
+      self.assertEqual(c.getLocationTableFile(), "location_table")
+      self.assertEqual([sp.getPath() for sp in c.getSearchPaths()], [self.confDir_])
+      self.assertEqual(c.getFileIgnores().getPatterns(), ["\\.o$"])
+      self.assertEqual(c.getOptionValue("indexTrigrams"), False)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,58 @@
+#!/usr/bin/python
+
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from devtools.managededit.crawler import *
+from devtools.managededit.searchpath import SearchPath
+
+
+class CrawlerTest(unittest.TestCase):
+
+   def setUp(self):
+      self.root_ = tempfile.mkdtemp(prefix="crawlertest")
+      for d in ["a", "a/b", "a/b/c", "a/.svn", "d", "d/e"]:
+         os.makedirs(os.path.join(self.root_, d))
+      for f in ["top.txt", "a/one.py", "a/one.pyc", "a/b/two.py",
+                "a/b/c/three.h", "a/.svn/entries", "d/e/four.cpp"]:
+         open(os.path.join(self.root_, f), "w").close()
+      os.symlink(os.path.join(self.root_, "d"), os.path.join(self.root_, "a", "link"))
+
+   def tearDown(self):
+      shutil.rmtree(self.root_)
+
+   def assertSameRecords(self, sp, dirIgnores=[], fileIgnores=[]):
+      expected = sorted(sp.walk(dirIgnores, fileIgnores))
+      for jobs in [1, 4]:
+         actual = sorted(Crawler(jobs).walk(sp, dirIgnores, fileIgnores))
+         self.assertEqual(expected, actual)
+      return expected
+
+   def testRecursive(self):
+      records = self.assertSameRecords(SearchPath(self.root_, True))
+      self.assertEqual(len(records), 7)
+
+   def testNonRecursive(self):
+      records = self.assertSameRecords(SearchPath(self.root_, False))
+      self.assertEqual(records, [os.path.join(self.root_, "top.txt")])
+
+   def testIgnores(self):
+      sp = SearchPath(self.root_, True)
+      sp.addDirectoryIgnore("/c$")
+      records = self.assertSameRecords(sp, [re.compile(r"\.svn")], [re.compile(r"\.pyc$")])
+      self.assertEqual(len(records), 4)
+
+   def testMissingPath(self):
+      sp = SearchPath(os.path.join(self.root_, "missing"), True)
+      self.assertEqual(self.assertSameRecords(sp), [])
+
+   def testJobs(self):
+      self.assertRaises(ValueError, Crawler, 0)
+      self.assertTrue(Crawler().getJobs() >= 1)
+
+
+if __name__ == "__main__":
+   unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/python
+
+import os
+import threading
+import time
+import unittest
+
+from devtools.managededit.daemon import *
+from devtools.managededit.locationtable import LocationTable
+from devtools.managededit.test.fixtures import TableTestCase
+
+
+@unittest.skipUnless(isSupported(), "Unix domain sockets are not available.")
+class DaemonTest(TableTestCase):
+
+   FILES=["one.py", "two.py"]
+
+   def setUp(self):
+      TableTestCase.setUp(self)
+      self.lt_ = LocationTable(self.conf_)
+      self.lt_.rebuild(1)
+
+      self.daemon_ = Daemon(self.confDir_)
+      self.thread_ = threading.Thread(target=self.daemon_.serve)
+      self.thread_.start()
+      self.client_ = DaemonClient(self.conf_)
+      for i in range(100):
+         if self.client_.connect():
+            break
+         time.sleep(0.01)
+
+   def tearDown(self):
+      if self.thread_.is_alive():
+         self.client_.stop()
+      self.thread_.join()
+      TableTestCase.tearDown(self)
+
+   def testSearch(self):
+      self.assertTrue(self.client_.connect())
+      self.assertEqual(list(self.client_.search("o")), list(self.lt_.search("o")))
+      self.assertEqual(list(self.client_.narrow("o", ["two"])),
+                       [("two.py", os.path.join(self.root_, "two.py"))])
+      self.assertRaises(RuntimeError, self.client_.search, "(")
+      self.assertEqual(self.client_.complete("t"), ["two.py"])
+      self.assertEqual(list(self.client_.searchDirectories(os.path.basename(self.root_))),
+                       [(os.path.basename(self.root_), self.root_)])
+      self.assertEqual(list(self.client_.fuzzySearchDirectories(os.path.basename(self.root_))),
+                       list(self.lt_.fuzzySearchDirectories(os.path.basename(self.root_))))
+
+   def testReload(self):
+      self.assertEqual(len(self.client_.search("py")), 2)
+      open(os.path.join(self.root_, "three.py"), "w").close()
+      self.lt_.rebuild(1)
+      self.assertEqual(len(self.client_.search("py")), 3)
+
+   def testStop(self):
+      self.client_.stop()
+      self.thread_.join()
+      self.assertFalse(self.client_.connect())
+      self.assertFalse(os.path.exists(getSocketPath(self.conf_)))
+
+
+if __name__ == "__main__":
+   unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+
+import unittest
+
+from devtools.managededit.api import openLocationTable
+from devtools.managededit.federation import *
+from devtools.managededit.locationtable import LocationTable
+from devtools.managededit.searchpath import SearchPath
+from devtools.managededit.test.fixtures import TableTestCase
+
+
+class FederationTest(TableTestCase):
+
+   DIRECTORIES=["sandbox", "shared"]
+   FILES=["sandbox/main.c", "sandbox/util.h", "shared/util.h", "shared/zlib.h"]
+
+   def setUp(self):
+      TableTestCase.setUp(self)
+      self.conf_.setOption("cacheResults", "false")
+      LocationTable(self.conf_).rebuild()
+      LocationTable(self.conf_.getTableConfiguration("shared")).rebuild()
+
+   def addSearchPaths(self):
+      self.conf_.addSearchPath(SearchPath(self.path("sandbox"), True))
+      self.conf_.addSearchPath(SearchPath(self.path("shared"), True), "shared")
+
+   def testTables(self):
+      self.assertEqual(len(LocationTable(self.conf_)), 2)
+      self.assertEqual(len(LocationTable(self.conf_.getTableConfiguration("shared"))), 2)
+
+      self.assertTrue(isinstance(openLocationTable(self.conf_), LocationTable))
+      self.conf_.setOption("federatedTables", "shared, location_table,missing")
+      self.conf_.addFederatedTable("shared")
+      self.assertEqual(self.conf_.getFederatedTables(), ["shared", "missing"])
+
+   def testSearch(self):
+      self.conf_.addFederatedTable("shared")
+      self.conf_.addFederatedTable("missing")
+      lt = openLocationTable(self.conf_)
+      self.assertEqual(lt.getLabels(), ["location_table", "shared"])
+
+      res = lt.search(r"\.h$", "/")
+      self.assertEqual(sorted(r[1] for r in res),
+                       [self.path("sandbox/util.h"), self.path("shared/util.h"), self.path("shared/zlib.h")])
+      self.assertEqual(res.getLabel(("util.h", self.path("sandbox/util.h"))), None)
+      self.assertEqual(res.getLabel(("zlib.h", self.path("shared/zlib.h"))), "shared")
+
+      # An exact match in one table is the only result.
+      res = lt.search("zlib.h", "/")
+      self.assertEqual([r[1] for r in res], [self.path("shared/zlib.h")])
+      self.assertEqual(res.getLabel(res[0]), "shared")
+      self.assertEqual(len(lt.search("util.h", "/")), 2)
+
+      res = lt.fuzzySearch("zl")
+      self.assertEqual([r[1] for r in res], [self.path("shared/zlib.h")])
+
+      self.assertEqual(lt.complete(""), ["main.c", "util.h", "zlib.h"])
+
+      res = lt.searchDirectories("^s")
+      self.assertEqual([r[1] for r in res], [self.path("sandbox"), self.path("shared")])
+      self.assertEqual(res.getLabel(res[1]), "shared")
+      self.assertEqual([r[1] for r in lt.searchDirectories("shared")], [self.path("shared")])
+      res = lt.fuzzySearchDirectories("shrd")
+      self.assertEqual([r[1] for r in res], [self.path("shared")])
+      self.assertEqual(res.getLabel(res[0]), "shared")
+      self.assertEqual(lt.complete("", 2), ["main.c", "util.h"])
+
+   def testDuplicates(self):
+      table = LocationTable(self.conf_)
+      lt = FederatedLocationTable([("a", table), ("b", table)])
+      res = lt.search(r"\.", "/")
+      self.assertEqual(len(res), 2)
+      self.assertEqual([res.getLabel(r) for r in res], [None, None])
+
+
+if __name__ == "__main__":
+   unittest.main()
@@ -0,0 +1,64 @@
+"""
+The set up the tests of the location table and the modules built on it
+share: a configuration in a directory of its own, and a tree of files to
+index.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from devtools.managededit.configuration import Configuration
+from devtools.managededit.searchpath import SearchPath
+
+
+class ConfigurationTestCase(unittest.TestCase):
+   """
+      Gives each test a Configuration, conf_, in a new directory, confDir_,
+      for the location table named location_table whatever DT_SANDBOX_CURRENT
+      says. The environment is restored after the test.
+   """
+
+   def setUp(self):
+      self.confDir_ = tempfile.mkdtemp(prefix="meconftest")
+      self.sandbox_ = os.environ.pop("DT_SANDBOX_CURRENT", None)
+      self.conf_ = Configuration(self.confDir_, False)
+
+   def tearDown(self):
+      if self.sandbox_ is not None:
+         os.environ["DT_SANDBOX_CURRENT"] = self.sandbox_
+      shutil.rmtree(self.confDir_)
+
+
+class TableTestCase(ConfigurationTestCase):
+   """
+      Also gives each test a tree, root_, holding DIRECTORIES and FILES,
+      which the configuration searches recursively unless addSearchPaths
+      says otherwise.
+   """
+
+   DIRECTORIES=[]
+   FILES=[]
+
+   def setUp(self):
+      ConfigurationTestCase.setUp(self)
+      self.root_ = tempfile.mkdtemp(prefix="metreetest")
+      for d in self.DIRECTORIES:
+         os.makedirs(self.path(d))
+      for f in self.FILES:
+         self.touch(f)
+      self.addSearchPaths()
+
+   def tearDown(self):
+      shutil.rmtree(self.root_)
+      ConfigurationTestCase.tearDown(self)
+
+   def addSearchPaths(self):
+      self.conf_.addSearchPath(SearchPath(self.root_, True))
+
+   def path(self, name):
+      return os.path.join(self.root_, name)
+
+   def touch(self, name):
+      open(self.path(name), "w").close()
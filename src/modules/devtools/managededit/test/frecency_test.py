@@ -0,0 +1,79 @@
+#!/usr/bin/python
+
+import os
+import time
+import unittest
+
+import devtools.managededit.frecency
+from devtools.managededit.frecency import *
+from devtools.managededit.locationtable import SearchResult
+from devtools.managededit.test.fixtures import ConfigurationTestCase
+
+
+class FrecencyTest(ConfigurationTestCase):
+
+   def setUp(self):
+      ConfigurationTestCase.setUp(self)
+      self.store_ = FrecencyStore(self.conf_)
+
+   def results(self, *paths):
+      ret = SearchResult()
+      for p in paths:
+         ret.append((os.path.basename(p), p))
+      return ret
+
+   def testNothingRecorded(self):
+      res = self.results("/a/x.py", "/b/x.py")
+      self.assertEqual(self.store_.rank("x", res), None)
+      self.assertFalse(os.path.exists(self.store_.getFileFullPath()))
+
+   def testRank(self):
+      self.store_.record("x", "/b/x.py", 1000)
+      res = self.results("/a/x.py", "/b/x.py", "/c/x.py")
+      self.assertEqual(self.store_.rank("x", res), None)
+      self.assertEqual([r[1] for r in res], ["/b/x.py", "/a/x.py", "/c/x.py"])
+
+      self.store_.record("x", "/b/x.py")
+      res = self.results("/a/x.py", "/b/x.py", "/c/x.py")
+      self.assertEqual(self.store_.rank("x", res), ("x.py", "/b/x.py"))
+
+      # Another file picked as often for the query is no longer dominated.
+      self.store_.record("x", "/c/x.py")
+      self.store_.record("x", "/c/x.py")
+      res = self.results("/a/x.py", "/b/x.py", "/c/x.py")
+      self.assertEqual(self.store_.rank("x", res), None)
+
+      # Choices made for other queries count for less.
+      res = self.results("/a/x.py", "/c/x.py")
+      self.store_.record("y", "/a/x.py")
+      scores = self.store_.scores("x", ["/a/x.py", "/c/x.py"])
+      self.assertTrue(scores["/c/x.py"][0] > scores["/a/x.py"][0])
+      self.assertEqual(scores["/a/x.py"][1], 0)
+
+   def testQueryWeight(self):
+      now = int(time.time())
+      self.store_.record("x", "/a/x.py", now)
+      self.assertEqual(self.store_.scores("x", ["/a/x.py"], now), {"/a/x.py": (QUERY_WEIGHT * frecency(1, 0), 1)})
+      self.store_.record("y", "/a/x.py", now)
+      self.assertEqual(self.store_.scores("x", ["/a/x.py"], now), {"/a/x.py": ((QUERY_WEIGHT + 1) * frecency(1, 0), 1)})
+
+   def testPrune(self):
+      self.store_.record("x", "/old.py", 1000)
+      self.store_.record("x", "/new.py", 1000 + MAXIMUM_AGE + 1)
+      self.assertEqual(list(self.store_.scores("x", ["/old.py", "/new.py"])), ["/new.py"])
+
+      now = int(time.time())
+      self.store_.record("x", "/new.py", now)
+      maximum = devtools.managededit.frecency.MAXIMUM_ENTRIES
+      devtools.managededit.frecency.MAXIMUM_ENTRIES = 2
+      try:
+         self.store_.record("x", "/a.py", now + 1)
+         self.store_.record("x", "/b.py", now + 2)
+         self.assertEqual(sorted(self.store_.scores("x", ["/new.py", "/a.py", "/b.py"], now)),
+                          ["/a.py", "/b.py"])
+      finally:
+         devtools.managededit.frecency.MAXIMUM_ENTRIES = maximum
+
+
+if __name__ == "__main__":
+   unittest.main()
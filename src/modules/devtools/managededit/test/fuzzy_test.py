@@ -0,0 +1,70 @@
+#!/usr/bin/python
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from devtools.managededit.configuration import Configuration
+from devtools.managededit.fuzzy import *
+from devtools.managededit.locationtable import LocationTable
+from devtools.managededit.searchpath import SearchPath
+
+
+class FuzzyTest(unittest.TestCase):
+
+   def testScore(self):
+      self.assertEqual(score("lctbl", "searchpath.py"), None)
+      self.assertEqual(score("", "anything"), 0)
+      self.assertEqual(score("lctbl", "locationtable.py"), score("lctbl", "locationtable_test.py"))
+      self.assertTrue(score("lt", "LocationTable.java") > score("lt", "sellout.txt"))
+      self.assertTrue(score("lt", "location_table.py") > score("lt", "lost.py"))
+      self.assertTrue(score("abc", "abc.h") > score("abc", "axbxc.h"))
+      self.assertTrue(score("lt", "lost_table.py") > score("lt", "lost.py"))
+
+   def testRank(self):
+      candidates = [("locationtable_test.py", "/src/test"),
+                    ("locationtable.py", "/src/deep/copy"),
+                    ("locationtable.py", "/src"),
+                    ("Makefile", "/src"),
+                    ("lctbl", "/src")]
+      ranked = rank("LCTBL", candidates, 4)
+      self.assertEqual([(b, d) for (s, b, d) in ranked],
+                       [("lctbl", "/src"),
+                        ("locationtable.py", "/src"),
+                        ("locationtable.py", "/src/deep/copy"),
+                        ("locationtable_test.py", "/src/test")])
+      self.assertEqual(rank("zzz", candidates), [])
+
+   def testLikePattern(self):
+      self.assertEqual(likePattern("a_%b"), "%a%\\_%\\%%b%")
+      self.assertTrue(isPlain("lctbl"))
+      self.assertFalse(isPlain("lct.*"))
+
+   def testFuzzySearch(self):
+      confDir = tempfile.mkdtemp(prefix="meconftest")
+      root = tempfile.mkdtemp(prefix="metreetest")
+      try:
+         os.makedirs(os.path.join(root, "test"))
+         for f in ["locationtable.py", "test/locationtable_test.py", "searchpath.py",
+                   "crawler.py", "l_c%t_b.l"]:
+            open(os.path.join(root, f), "w").close()
+         os.environ.pop("DT_SANDBOX_CURRENT", None)
+         conf = Configuration(confDir, False)
+         conf.addSearchPath(SearchPath(root, True))
+         lt = LocationTable(conf)
+         lt.rebuild(1)
+
+         res = lt.fuzzySearch("lctbl")
+         self.assertEqual([r[0] for r in res],
+                          ["l_c%t_b.l", "locationtable.py", "locationtable_test.py"])
+         self.assertEqual(res[1][1], os.path.join(root, "locationtable.py"))
+         self.assertEqual(len(lt.fuzzySearch("lctbl", 1)), 1)
+         self.assertEqual([r[0] for r in lt.fuzzySearch("c%t")], ["l_c%t_b.l"])
+      finally:
+         shutil.rmtree(confDir)
+         shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+   unittest.main()
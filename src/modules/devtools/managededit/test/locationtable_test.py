@@ -0,0 +1,301 @@
+#!/usr/bin/python
+
+import io
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from devtools.common.filelock import FileLock
+from devtools.managededit.locationtable import *
+from devtools.managededit.searchpath import SearchPath
+from devtools.managededit.test.fixtures import TableTestCase
+
+
+# Patterns with escapes that run on for several characters, most of which
+# match the "abc" in abc.py and xabcx.c.
+ESCAPES=[r"\x61bc", r"\u0061bc", r"\U00000061bc", r"\N{LATIN SMALL LETTER A}bc", r"\141bc",
+         r"^\x61bc", r"\0141", r"(a)(b)(c)(.)(.)(.)(.)(.)(.)(.)(.)(.)\12", r"(b)\1?c"]
+
+
+class LocationTableTest(TableTestCase):
+
+   DIRECTORIES=["a", "a/b", "c"]
+   FILES=["top.txt", "a/one.py", "a/b/two.py", "c/three.h"]
+
+   def records(self, lt):
+      return sorted(lt.search("."))
+
+   def testRebuild(self):
+      lt = LocationTable(self.conf_)
+      lt.rebuild(2)
+      self.assertEqual(len(lt), 4)
+      self.assertEqual(list(lt.search("two")),
+                       [("two.py", os.path.join(self.root_, "a", "b", "two.py"))])
+
+   def testQuotedNames(self):
+      self.touch("it's.txt")
+      lt = LocationTable(self.conf_)
+      lt.rebuild(1)
+      self.assertEqual(len(lt.search("it's")), 1)
+
+   def testRefresh(self):
+      lt = LocationTable(self.conf_)
+      self.assertEqual(lt.refresh(1), None)
+      self.assertTrue(lt.isRefreshable())
+      self.assertEqual(lt.refresh(1), (0, 0))
+
+      self.touch("a/four.py")
+      os.remove(os.path.join(self.root_, "a", "b", "two.py"))
+      os.makedirs(os.path.join(self.root_, "a", "d", "e"))
+      self.touch("a/d/e/five.py")
+      shutil.rmtree(os.path.join(self.root_, "c"))
+
+      self.assertEqual(lt.refresh(2), (2, 2))
+      refreshed = self.records(lt)
+
+      lt.rebuild(1)
+      self.assertEqual(refreshed, self.records(lt))
+      self.assertEqual(len(lt), 4)
+
+   def testTrigramSearch(self):
+      self.touch("a/b/twofold.py")
+      lt = LocationTable(self.conf_)
+      lt.rebuild(1)
+      expected = [("two.py", os.path.join(self.root_, "a", "b", "two.py")),
+                  ("twofold.py", os.path.join(self.root_, "a", "b", "twofold.py"))]
+      self.assertEqual(list(lt.search("two")), expected)
+      self.assertEqual(list(lt.search(r"^tw.*\.py$")), expected)
+      self.assertEqual(list(lt.search("wof|hre")),
+                       [("three.h", os.path.join(self.root_, "c", "three.h")), expected[1]])
+      self.assertEqual(list(lt.search("two.py")), [expected[0]])
+
+      os.remove(os.path.join(self.root_, "a", "b", "twofold.py"))
+      self.touch("a/twelve.py")
+      lt.refresh(1)
+      self.assertEqual([r[0] for r in lt.search("tw.*py")], ["twelve.py", "two.py"])
+
+      self.conf_.setOption("indexTrigrams", "false")
+      lt.rebuild(1)
+      self.assertEqual([r[0] for r in lt.search("tw.*py")], ["twelve.py", "two.py"])
+
+   def testPushdown(self):
+      for f in ["a/b/twofold.py", "a/b/$x", "a/b/it's", "a/b/two.pyc", "c/été.txt", "a/abc.py", "c/xabcx.c"]:
+         self.touch(f)
+      patterns = ["two", "^two", r"^two\.py$", "^t", "^tw?o", r"\.py$", "t.o", "^",
+                  "", "wo|hre", "(?i)TWO", "$x", "it's", r"\w+\.h", "été", "^é"] + ESCAPES
+      for indexTrigrams in ["true", "false"]:
+         self.conf_.setOption("indexTrigrams", indexTrigrams)
+         lt = LocationTable(self.conf_)
+         lt.rebuild(1)
+         everything = self.records(lt)
+         for p in patterns:
+            expected = sorted(r for r in everything if re.search(p, r[0]) or p == r[0])
+            exact = [r for r in everything if r[0] == p]
+            if len(exact) == 1:
+               expected = exact
+            self.assertEqual(list(lt.search(p)), expected, p)
+            self.assertEqual(sorted(lt.iterate(p)),
+                             sorted(r for r in everything if re.search(p, r[0])), p)
+
+   def testLookups(self):
+      lt = LocationTable(self.conf_)
+      lt.rebuild(1)
+      self.assertEqual(lt.findExact("one.py"),
+                       [("one.py", os.path.join(self.root_, "a", "one.py"))])
+      self.assertEqual(lt.findExact("one"), [])
+      self.assertEqual([r[0] for r in lt.findPrefix("t")], ["three.h", "top.txt", "two.py"])
+      self.assertEqual([r[0] for r in lt.findPrefix("t", 1)], ["three.h"])
+      self.assertEqual(len(lt.findPrefix("")), 4)
+      self.touch("c/two.py")
+      lt.refresh(1)
+      self.assertEqual(lt.complete("t"), ["three.h", "top.txt", "two.py"])
+      self.assertEqual(lt.complete("t", 2), ["three.h", "top.txt"])
+      self.assertEqual(lt.complete("x"), [])
+      self.assertEqual(prefixUpperBound("ab"), "ac")
+      self.assertEqual(prefixUpperBound(""), None)
+
+   def testDirectories(self):
+      os.makedirs(os.path.join(self.root_, "a", "empty", "deeper"))
+      lt = LocationTable(self.conf_)
+      lt.rebuild(1)
+      self.assertEqual(list(lt.searchDirectories("^e")), [("empty", os.path.join(self.root_, "a", "empty"))])
+      self.assertEqual([r[0] for r in lt.searchDirectories("mpty|eeper")], ["deeper", "empty"])
+      self.assertEqual(list(lt.searchDirectories("empty")), [("empty", os.path.join(self.root_, "a", "empty"))])
+      self.assertEqual(list(lt.searchDirectories("two")), [])
+
+      # Directories are ranked as abbreviations too, whether or not any
+      # file is named like them. The root's random name may match as well.
+      fuzzy = lambda q: [r for r in lt.fuzzySearchDirectories(q) if r[1] != self.root_]
+      self.assertEqual(fuzzy("mty"), [("empty", os.path.join(self.root_, "a", "empty"))])
+      self.assertEqual([r[0] for r in fuzzy("dpr")], ["deeper"])
+      self.assertEqual(fuzzy("xyz"), [])
+
+      os.makedirs(os.path.join(self.root_, "c", "b"))
+      lt.refresh(1)
+      self.assertEqual([r[1] for r in lt.searchDirectories("^b$")],
+                       [os.path.join(self.root_, "a", "b"), os.path.join(self.root_, "c", "b")])
+      shutil.rmtree(os.path.join(self.root_, "a", "empty"))
+      lt.refresh(1)
+      self.assertEqual(list(lt.searchDirectories("mpty|eeper")), [])
+
+   def testDump(self):
+      self.touch("a/tab\there.py")
+      lt = LocationTable(self.conf_)
+      lt.rebuild(1)
+      everything = self.records(lt)
+
+      out = io.StringIO()
+      self.assertEqual(lt.dump(out), 5)
+      self.assertEqual(sorted(out.getvalue().splitlines()), sorted(str(r) for r in everything))
+
+      out = io.StringIO()
+      lt.dump(out, "nul", r"\.py$")
+      self.assertEqual(sorted(out.getvalue().split("\0")),
+                       ["", os.path.join(self.root_, "a", "b", "two.py"),
+                        os.path.join(self.root_, "a", "one.py"),
+                        os.path.join(self.root_, "a", "tab\there.py")])
+
+      out = io.StringIO()
+      lt.dump(out, "tsv", "^tab")
+      self.assertEqual(out.getvalue(), "tab\\there.py\t%s\n" % (os.path.join(self.root_, "a", "tab\\there.py")))
+
+      out = io.StringIO()
+      self.assertEqual(lt.dump(out, "jsonl", limit=2), 2)
+      lines = [json.loads(l) for l in out.getvalue().splitlines()]
+      self.assertTrue(all((l["basename"], l["path"]) in everything for l in lines))
+
+      self.assertRaises(RuntimeError, lt.dump, out, "xml")
+
+   def testMigration(self):
+      legacy = sqlite3.connect(self.conf_.getLocationTableFileFullPath())
+      legacy.execute("CREATE TABLE Location (basename, fullpath)")
+      for f in ["top.txt", "a/one.py", "a/b/two.py", "c/three.h"]:
+         legacy.execute("INSERT INTO Location VALUES (?, ?)",
+                        (os.path.basename(f), os.path.join(self.root_, f)))
+      legacy.commit()
+      legacy.close()
+
+      lt = LocationTable(self.conf_)
+      self.assertEqual(len(lt), 4)
+      self.assertTrue(lt.isRefreshable())
+      migrated = self.records(lt)
+
+      self.assertEqual(lt.refresh(1), (0, 0))
+      self.assertEqual(migrated, self.records(lt))
+
+   def downgrade(self, version):
+      """
+         Turn the table into one written with the given version.
+      """
+      conn = sqlite3.connect(self.conf_.getLocationTableFileFullPath())
+      conn.execute("DROP INDEX DirectoryBasename")
+      conn.execute("ALTER TABLE Directory DROP COLUMN basename")
+      if version < 3:
+         conn.execute("DROP TABLE Meta")
+      conn.execute("PRAGMA user_version=%d" % (version))
+      conn.commit()
+      conn.close()
+
+   def testMigrationInPlace(self):
+      LocationTable(self.conf_).rebuild()
+      self.downgrade(2)
+      inode = os.stat(self.conf_.getLocationTableFileFullPath()).st_ino
+
+      lt = LocationTable(self.conf_)
+      self.assertEqual(len(lt), 4)
+      self.assertEqual(lt.getGeneration(), 1)
+      self.assertEqual(os.stat(self.conf_.getLocationTableFileFullPath()).st_ino, inode)
+
+      self.downgrade(3)
+      lt = LocationTable(self.conf_)
+      self.assertEqual(list(lt.searchDirectories("b")), [("b", os.path.join(self.root_, "a", "b"))])
+      self.assertEqual(os.stat(self.conf_.getLocationTableFileFullPath()).st_ino, inode)
+
+   def testClone(self):
+      sandboxes = tempfile.mkdtemp(prefix="mesandboxtest")
+      os.environ["DT_SANDBOX_ROOT"] = sandboxes
+      try:
+         for sandbox in ["one", "two"]:
+            shutil.copytree(self.root_, os.path.join(sandboxes, sandbox))
+            self.conf_.addSearchPath(SearchPath(os.path.join(sandboxes, sandbox), True), sandbox)
+         os.remove(os.path.join(sandboxes, "two", "c", "three.h"))
+         open(os.path.join(sandboxes, "two", "a", "b", "four.py"), "w").close()
+
+         one = LocationTable(self.conf_.getTableConfiguration("one"))
+         one.rebuild(1)
+         self.assertEqual(one.getRoot(), os.path.join(sandboxes, "one"))
+         two = LocationTable(self.conf_.getTableConfiguration("two"))
+
+         # The copy is only swapped in once it is refreshed, so readers
+         # never see the files of the sibling.
+         live = []
+         refreshdb = two._refreshdb
+         def checked(conn, crawler):
+            live.append(os.path.exists(two.config_.getLocationTableFileFullPath()))
+            return refreshdb(conn, crawler)
+         two._refreshdb = checked
+         self.assertEqual(two.clone(one, 1), (1, 1))
+         self.assertEqual(live, [False])
+         self.assertEqual(two.getRoot(), os.path.join(sandboxes, "two"))
+         self.assertTrue(two.getGeneration() > 0)
+         self.assertEqual([os.path.relpath(r[1], sandboxes) for r in self.records(two)],
+                          ["two/a/b/four.py", "two/a/one.py", "two/top.txt", "two/a/b/two.py"])
+         self.assertEqual(two.refresh(1), (0, 0))
+         self.assertEqual(len(one), 4)
+         self.assertEqual(list(two.searchDirectories("^(one|two)$")), [("two", os.path.join(sandboxes, "two"))])
+
+         # Without a table to clone the table is rebuilt.
+         shutil.copytree(self.root_, os.path.join(sandboxes, "three"))
+         self.conf_.addSearchPath(SearchPath(os.path.join(sandboxes, "three"), True), "three")
+         three = LocationTable(self.conf_.getTableConfiguration("three"))
+         self.assertEqual(three.clone(LocationTable(self.conf_.getTableConfiguration("four")), 1), None)
+         self.assertEqual(len(three), 4)
+      finally:
+         os.environ.pop("DT_SANDBOX_ROOT")
+         shutil.rmtree(sandboxes)
+
+   def testReadersSurviveRebuild(self):
+      lt = LocationTable(self.conf_)
+      lt.rebuild(1)
+      reader = sqlite3.connect(self.conf_.getLocationTableFileFullPath())
+      c = reader.cursor()
+      c.execute("SELECT count(*) FROM File")
+
+      self.touch("a/four.py")
+      lt.rebuild(1)
+      c.execute("SELECT count(*) FROM File")
+      self.assertEqual(c.fetchone()[0], 4)
+      reader.close()
+
+      self.assertEqual(len(lt), 5)
+      leftovers = [f for f in os.listdir(self.conf_.getLocationTableSubdirFullPath())
+                   if f.endswith(".tmp")]
+      self.assertEqual(leftovers, [])
+
+   def testConcurrentRebuild(self):
+      lt = LocationTable(self.conf_)
+      lt.rebuild(1)
+
+      lock = FileLock(lt.getLockFileFullPath())
+      self.assertTrue(lock.acquire(blocking=False))
+      self.assertFalse(FileLock(lt.getLockFileFullPath()).acquire(blocking=False))
+
+      self.touch("a/four.py")
+      t = threading.Thread(target=lt.rebuild, args=(1,))
+      t.start()
+      time.sleep(0.2)
+      self.assertTrue(t.is_alive())
+      self.assertEqual(len(lt), 4)
+      lock.release()
+      t.join()
+      self.assertEqual(len(lt), 5)
+
+
+if __name__ == "__main__":
+   unittest.main()
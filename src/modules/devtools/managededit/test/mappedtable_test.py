@@ -0,0 +1,122 @@
+#!/usr/bin/python
+
+import os
+import re
+import sqlite3
+import unittest
+
+from devtools.managededit.locationtable import LocationTable
+from devtools.managededit.mappedtable import *
+from devtools.managededit.resultcache import ResultCache
+from devtools.managededit.test.fixtures import TableTestCase
+
+
+class MappedTableTest(TableTestCase):
+
+   DIRECTORIES=["a", "a/b", "a/bc", "c"]
+   FILES=["top.txt", "a/one.py", "a/b/two.py", "a/bc/two.py", "c/three.h",
+          "a/b/twofold.py", "a/b/$x", "a/b/it's", "a/b/two.pyc", "c/été.txt"]
+
+   def setUp(self):
+      TableTestCase.setUp(self)
+      self.conf_.setOption("locationTableFormat", "mapped")
+
+   def testEquivalence(self):
+      mapped = MappedLocationTable(self.conf_)
+      mapped.rebuild(1)
+      self.assertTrue(os.path.isfile(mapped.getMappedFileFullPath()))
+      self.assertNotEqual(mapped._openIndex(), None)
+      sqlite = LocationTable(self.conf_)
+
+      patterns = ["two", "^two", r"^two\.py$", "^t", "^tw?o", r"\.py$", "t.o", "^",
+                  "", "wo|hre", "(?i)TWO", "$x", "it's", r"\w+\.h", "été", "^é", "two.py"]
+      for p in patterns:
+         self.assertEqual(list(mapped.search(p)), list(sqlite.search(p)), p)
+      self.assertEqual(len(mapped), len(sqlite))
+      self.assertEqual(mapped.findExact("two.py"), sqlite.findExact("two.py"))
+      for prefix in ["", "t", "tw", "z"]:
+         self.assertEqual(mapped.findPrefix(prefix), sqlite.findPrefix(prefix))
+      self.assertEqual(mapped.findPrefix("t", 2), sqlite.findPrefix("t", 2))
+      for prefix in ["", "t", "two", "z"]:
+         self.assertEqual(mapped.complete(prefix), sqlite.complete(prefix), prefix)
+      self.assertEqual(mapped.complete("t", 2), ["three.h", "top.txt"])
+      for query in ["two", "TWpy", "th", "ét"]:
+         self.assertEqual(list(mapped.fuzzySearch(query)), list(sqlite.fuzzySearch(query)), query)
+
+   def testEscapes(self):
+      for f in ["a/abc.py", "c/xabcx.c"]:
+         self.touch(f)
+      mapped = MappedLocationTable(self.conf_)
+      mapped.rebuild(1)
+      self.assertNotEqual(mapped._openIndex(), None)
+      everything = sorted(LocationTable(self.conf_).search("."))
+
+      for p in [r"\x61bc", r"\u0061bc", r"\U00000061bc", r"\N{LATIN SMALL LETTER A}bc", r"\141bc",
+                r"^\x61bc", r"\0141", r"(a)(b)(c)(.)(.)(.)(.)(.)(.)(.)(.)(.)\12", r"(b)\1?c"]:
+         expected = sorted(r for r in everything if re.search(p, r[0]))
+         self.assertEqual(list(mapped.search(p)), expected, p)
+      self.assertEqual(len(mapped.search(r"\x61bc")), 2)
+
+   def testUpdates(self):
+      mapped = MappedLocationTable(self.conf_)
+      mapped.rebuild(1)
+      self.touch("a/four.py")
+      mapped.refresh(1)
+      self.assertEqual(len(mapped.search("four")), 1)
+      self.assertEqual(len(mapped), 11)
+
+      # Falls back to sqlite when the mapped copy is missing.
+      os.remove(mapped.getMappedFileFullPath())
+      self.assertEqual(len(mapped.search("four")), 1)
+
+      self.conf_.setOption("locationTableFormat", "sqlite")
+      mapped.rebuild(1)
+      self.assertFalse(os.path.exists(mapped.getMappedFileFullPath()))
+
+   def testNoResultCache(self):
+      mapped = MappedLocationTable(self.conf_)
+      mapped.rebuild(1)
+      self.assertTrue(self.conf_.getOptionValue("cacheResults"))
+
+      # Lookups read the mapped copy alone, never the cache or the table.
+      connect = sqlite3.connect
+      def fail(*args, **kwargs):
+         raise AssertionError("A sqlite file was opened.")
+      sqlite3.connect = fail
+      try:
+         self.assertEqual(len(mapped.search("four")), 0)
+         self.assertEqual(len(mapped.search("one")), 1)
+         mapped.fuzzySearch("one")
+      finally:
+         sqlite3.connect = connect
+      self.assertFalse(os.path.exists(ResultCache(self.conf_).getFileFullPath()))
+
+   def testUnchangedRefresh(self):
+      mapped = MappedLocationTable(self.conf_)
+      mapped.rebuild(1)
+      inode = os.stat(mapped.getMappedFileFullPath()).st_ino
+
+      # A refresh that finds nothing new keeps the mapped copy, and it is
+      # still used.
+      mapped.refresh(1)
+      self.assertEqual(os.stat(mapped.getMappedFileFullPath()).st_ino, inode)
+      self.assertIsNotNone(mapped._openIndex())
+
+      self.touch("a/four.py")
+      mapped.refresh(1)
+      self.assertNotEqual(os.stat(mapped.getMappedFileFullPath()).st_ino, inode)
+      self.assertEqual(len(mapped.search("four")), 1)
+
+   def testDirectoryBlocks(self):
+      directories = ["/root/dir%03d" % i for i in range(3 * DIRECTORY_BLOCK + 5)]
+      path = os.path.join(self.confDir_, "blocks")
+      write(path, [("f", d) for d in directories])
+      index = MappedIndex(path)
+      try:
+         self.assertEqual(index.findExact("f"), [("f", d) for d in directories])
+      finally:
+         index.close()
+
+
+if __name__ == "__main__":
+   unittest.main()
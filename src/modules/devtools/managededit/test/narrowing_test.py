@@ -0,0 +1,133 @@
+#!/usr/bin/python
+
+import io
+import os
+import time
+import unittest
+
+from devtools.managededit.narrowing import *
+
+
+def records(*paths):
+   return [(os.path.basename(p), p) for p in paths]
+
+
+class NarrowingTest(unittest.TestCase):
+
+   def setUp(self):
+      self.records_ = records("/src/LocationTable.py", "/src/locationtable_test.py",
+                              "/test/searchpath.py", "/src/api.py")
+
+   def names(self, narrower):
+      return [r[0] for r in narrower.getCandidates()]
+
+   def testNarrow(self):
+      n = Narrower(self.records_)
+      n.type("loc")
+      self.assertEqual(self.names(n), ["LocationTable.py", "locationtable_test.py"])
+      n.type("at")
+      self.assertEqual(len(n), 2)
+
+      # Erasing goes back to the candidates there were.
+      n.erase()
+      n.erase()
+      n.erase()
+      n.erase()
+      self.assertEqual(n.getQuery(), "l")
+      self.assertEqual(len(n), 2)
+      n.clear()
+      self.assertEqual(len(n), 4)
+      n.erase()
+      self.assertEqual(len(n), 4)
+
+   def testWords(self):
+      n = Narrower(self.records_)
+      n.type("py test")
+      self.assertEqual(self.names(n), ["locationtable_test.py"])
+
+      # Words with a capital letter match case, words with a '/' the path.
+      n.clear()
+      n.type("Loc")
+      self.assertEqual(self.names(n), ["LocationTable.py"])
+      n.clear()
+      n.type("py /test")
+      self.assertEqual(self.names(n), ["searchpath.py"])
+
+   def testWordChangesHaystack(self):
+      n = Narrower(records("/x/src/foo.py", "/x/lib/src.py", "/y/bar.py"))
+      n.type("src")
+      self.assertEqual(self.names(n), ["src.py"])
+
+      # Once the word holds a '/' it is looked for in the path of every
+      # candidate there was before it.
+      n.type("/")
+      self.assertEqual(self.names(n), ["foo.py"])
+      n.erase()
+      self.assertEqual(self.names(n), ["src.py"])
+
+      n = Narrower(records("/a/fooBar.py", "/a/foobar.py", "/a/FOOBAR.py"))
+      n.type("foo")
+      self.assertEqual(len(n), 3)
+      n.type("B")
+      self.assertEqual(self.names(n), ["fooBar.py"])
+      n.erase()
+      self.assertEqual(len(n), 3)
+
+   def testLarge(self):
+      many = [("file%d_%d.c" % (i, i % 7), "/d%d/file%d_%d.c" % (i % 100, i, i % 7)) for i in range(100000)]
+      start = time.perf_counter()
+      n = Narrower(many)
+      for ch in "file12_5":
+         n.type(ch)
+      for i in range(4):
+         n.erase()
+      self.assertEqual(len(n), len([r for r in many if "file" in r[0]]))
+      self.assertTrue(time.perf_counter() - start < 2.0)
+
+   def prompt(self, keys, rows=5):
+      (r, w) = os.pipe()
+      try:
+         os.write(w, keys.encode())
+         os.close(w)
+         w = None
+         out = io.StringIO()
+         record = NarrowingPrompt(Narrower(self.records_), r, out, rows, 80).run()
+         return (record, out.getvalue())
+      finally:
+         os.close(r)
+         if w is not None:
+            os.close(w)
+
+   def testPrompt(self):
+      (record, out) = self.prompt("loc\x1b[B\r")
+      self.assertEqual(record, self.records_[1])
+      # The keys arrived at once, so only the full list was drawn.
+      self.assertTrue(">   (4/4)" in out)
+      self.assertTrue(out.endswith("\r\x1b[J"))
+
+      (record, out) = self.prompt("xyz\x7f\x7f\x7fapi\n")
+      self.assertEqual(record, self.records_[3])
+
+      (record, out) = self.prompt("loc\x1b")
+      self.assertEqual(record, None)
+      (record, out) = self.prompt("loc")
+      self.assertEqual(record, None)
+
+   def testRedraw(self):
+      out = io.StringIO()
+      p = NarrowingPrompt(Narrower(self.records_), -1, out, 10, 80)
+      p._draw()
+      first = out.getvalue()
+      self.assertTrue("api.py" in first)
+
+      # Moving the selection rewrites the two lines it touches and the
+      # query.
+      out.truncate(0)
+      out.seek(0)
+      p._handle("\x1b[B")
+      p._draw()
+      self.assertEqual(out.getvalue().count("\x1b[K"), 3)
+
+
+if __name__ == "__main__":
+   unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/python
+
+import unittest
+
+from devtools.managededit.patternanalysis import *
+
+
+class PatternAnalysisTest(unittest.TestCase):
+
+   def testLiterals(self):
+      self.assertEqual(requiredLiterals("locationtable"), ["locationtable"])
+      self.assertEqual(requiredLiterals(r"location\.py$"), ["location.py"])
+      self.assertEqual(requiredLiterals("^foo.*bar"), ["foo", "bar"])
+      self.assertEqual(requiredLiterals("abcd?ef"), ["abc", "ef"])
+      self.assertEqual(requiredLiterals("abc+de"), ["abc", "de"])
+      self.assertEqual(requiredLiterals("ab{0,2}cd"), ["a", "cd"])
+      self.assertEqual(requiredLiterals("ab{2}cd"), ["ab", "cd"])
+      self.assertEqual(requiredLiterals("ab*?cd"), ["a", "cd"])
+      self.assertEqual(requiredLiterals("x{y"), ["x{y"])
+      self.assertEqual(requiredLiterals(r"foo[a-z]+\dbar(baz)?qux"), ["foo", "bar", "qux"])
+      self.assertEqual(requiredLiterals("[]x]abc"), ["abc"])
+
+   def testMinimumLength(self):
+      self.assertEqual(requiredLiterals("ab.cdef", 3), ["cdef"])
+
+   def testNothingKnown(self):
+      self.assertEqual(requiredLiterals("foo|bar"), [])
+      self.assertEqual(requiredLiterals("(?i)foo"), [])
+      self.assertEqual(requiredLiterals(r"\w+"), [])
+
+   def testAnalysis(self):
+      a = PatternAnalysis("tbl")
+      self.assertEqual(a.getLiteral(), "tbl")
+      self.assertEqual(a.getPrefix(), "")
+      self.assertFalse(a.isPrefix())
+
+      a = PatternAnalysis(r"^loc\.")
+      self.assertEqual(a.getLiteral(), None)
+      self.assertEqual(a.getPrefix(), "loc.")
+      self.assertTrue(a.isPrefix())
+
+      a = PatternAnalysis("^locs?tbl")
+      self.assertEqual(a.getPrefix(), "loc")
+      self.assertFalse(a.isPrefix())
+
+      self.assertEqual(PatternAnalysis("^a|b").getPrefix(), "")
+      self.assertEqual(PatternAnalysis("a.c").getLiteral(), None)
+
+   def testTokens(self):
+      self.assertEqual(tokenize("^a$"), [(START, None), (LITERAL, "a"), (END, None)])
+      self.assertEqual(tokenize("(a|b)"), [(OTHER, "(a|b)")])
+
+   def testEscapes(self):
+      for (pattern, escape) in [(r"\x61bc", r"\x61"), (r"\u0061bc", r"\u0061"),
+                                (r"\U00000061bc", r"\U00000061"),
+                                (r"\N{LATIN SMALL LETTER A}bc", r"\N{LATIN SMALL LETTER A}"),
+                                (r"\141bc", r"\141"), (r"\12bc", r"\12")]:
+         self.assertEqual(tokenize(pattern)[0], (OTHER, escape), pattern)
+         self.assertEqual(requiredLiterals(pattern)[-1], "bc", pattern)
+      self.assertEqual(tokenize(r"\0141bc")[0], (OTHER, r"\014"))
+      self.assertEqual(requiredLiterals(r"\0141bc"), ["1bc"])
+
+
+if __name__ == "__main__":
+   unittest.main()
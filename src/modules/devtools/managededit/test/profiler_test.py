@@ -0,0 +1,92 @@
+#!/usr/bin/python
+
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from devtools.common import profiler
+
+
+class Options:
+
+   def __init__(self, profile=False, profileOutput=None, cprofile=None):
+      self.profile = profile
+      self.profileOutput = profileOutput
+      self.cprofile = cprofile
+
+
+class ProfilerTest(unittest.TestCase):
+
+   def tearDown(self):
+      profiler._current = None
+
+   def testDisabled(self):
+      self.assertEqual(None, profiler.enable("me", Options(), {}))
+      self.assertEqual(None, profiler.enable("me", None, {"DT_PROFILE": "0"}))
+      self.assertFalse(profiler.isEnabled())
+      with profiler.phase("search") as p:
+         p.count(3)
+      self.assertTrue(profiler.phase("search") is profiler.phase("narrow"))
+      profiler.disable()
+
+   def testPhases(self):
+      p = profiler.enable("me", Options(profile=True), {})
+      self.assertTrue(profiler.isEnabled())
+      with profiler.phase("open"):
+         with profiler.phase("query") as q:
+            q.count(2)
+            q.count(3)
+      records = [r for r in p.getRecords() if r["phase"] != "startup"]
+      self.assertEqual([("open", 0, None), ("query", 1, 5)],
+                       [(r["phase"], r["depth"], r["rows"]) for r in records])
+      self.assertTrue(records[0]["seconds"] >= records[1]["seconds"])
+
+      out = io.StringIO()
+      p.writeSummary(out)
+      self.assertTrue("  query" in out.getvalue())
+      self.assertTrue("total" in out.getvalue())
+      profiler._current = None
+
+   def testThreads(self):
+      p = profiler.enable("me", Options(profile=True), {})
+      def search():
+         with profiler.phase("search"):
+            with profiler.phase("query"):
+               pass
+      with profiler.phase("federated"):
+         thread = threading.Thread(target=search)
+         thread.start()
+         thread.join()
+         with profiler.phase("merge"):
+            pass
+      depths = dict((r["phase"], r["depth"]) for r in p.getRecords())
+      self.assertEqual([0, 0, 1, 1], [depths[name] for name in ["federated", "search", "query", "merge"]])
+      profiler._current = None
+
+   def testEnvironment(self):
+      (fd, path) = tempfile.mkstemp(prefix="profilertest")
+      os.close(fd)
+      try:
+         p = profiler.enable("cg", None, {"DT_PROFILE": path})
+         self.assertFalse(p.summary_)
+         with profiler.phase("generate"):
+            pass
+         profiler.disable()
+         self.assertFalse(profiler.isEnabled())
+         with open(path) as f:
+            lines = [json.loads(l) for l in f]
+         self.assertTrue("generate" in [l["phase"] for l in lines])
+         self.assertEqual(set(["cg"]), set(l["command"] for l in lines))
+      finally:
+         os.remove(path)
+
+      p = profiler.enable("me", None, {"DT_PROFILE": "1"})
+      self.assertTrue(p.summary_)
+      self.assertEqual(None, p.output_)
+
+
+if __name__ == "__main__":
+   unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/python
+
+import os
+import sqlite3
+import unittest
+
+import devtools.managededit.resultcache
+from devtools.managededit.locationtable import LocationTable
+from devtools.managededit.resultcache import *
+from devtools.managededit.test.fixtures import TableTestCase
+
+
+class ResultCacheTest(TableTestCase):
+
+   DIRECTORIES=["a"]
+   FILES=["one.py", "a/two.py"]
+
+   def setUp(self):
+      TableTestCase.setUp(self)
+      self.cache_ = ResultCache(self.conf_)
+      self.maximumSize_ = devtools.managededit.resultcache.MAXIMUM_SIZE
+
+   def tearDown(self):
+      devtools.managededit.resultcache.MAXIMUM_SIZE = self.maximumSize_
+      TableTestCase.tearDown(self)
+
+   def testGetAndPut(self):
+      self.assertEqual(self.cache_.get("x", "regex", "t", 1), None)
+      results = [[("x.py", "/a/x.py"), ("x.h", "/a/x.h")], []]
+      self.cache_.put("x", "regex", "t", 1, results)
+      self.assertEqual(self.cache_.get("x", "regex", "t", 1), results)
+      self.assertEqual(self.cache_.get("x", "fuzzy:50", "t", 1), None)
+      self.assertEqual(self.cache_.get("x", "regex", "t", 2), None)
+      self.assertEqual(self.cache_.get("x", "regex", "u", 1), None)
+
+      # Storing a result of a newer generation drops the older ones.
+      self.cache_.put("y", "regex", "t", 2, [[]])
+      conn = sqlite3.connect(self.cache_.getFileFullPath())
+      self.assertEqual(conn.execute("SELECT pattern FROM Result").fetchall(), [("y",)])
+      conn.close()
+
+   def testEviction(self):
+      devtools.managededit.resultcache.MAXIMUM_SIZE = 150
+      record = [[("x.py", "/" + "d" * 40 + "/x.py")]]
+      self.cache_.put("a", "regex", "t", 1, record, 1000)
+      self.cache_.put("b", "regex", "t", 1, record, 2000)
+      self.cache_.get("a", "regex", "t", 1, 3000)
+      self.cache_.put("c", "regex", "t", 1, record, 4000)
+      self.assertEqual(self.cache_.get("b", "regex", "t", 1), None)
+      self.assertEqual(self.cache_.get("a", "regex", "t", 1), record)
+      self.assertEqual(self.cache_.get("c", "regex", "t", 1), record)
+
+   def testSearch(self):
+      lt = LocationTable(self.conf_)
+      lt.rebuild()
+      generation = lt.getGeneration()
+      self.assertEqual(len(lt.search(r"\.py$", "/")), 2)
+      self.assertEqual(len(lt.fuzzySearch("tw")), 1)
+
+      # Repeated searches are answered from the cache alone.
+      def fail(*args):
+         raise AssertionError("The table was searched.")
+      lt._query = fail
+      lt._fuzzyQuery = fail
+      self.assertEqual(len(lt.search(r"\.py$", "/")), 2)
+      self.assertEqual(len(lt.fuzzySearch("tw")), 1)
+      del lt._query
+      del lt._fuzzyQuery
+
+      # A refresh that changes nothing keeps the generation, one that finds
+      # a new file moves it on and so do rebuilds.
+      lt.refresh()
+      self.assertEqual(lt.getGeneration(), generation)
+      self.touch("a/three.py")
+      lt.refresh()
+      self.assertEqual(lt.getGeneration(), generation + 1)
+      self.assertEqual(len(lt.search(r"\.py$", "/")), 3)
+      self.assertEqual(len(lt.fuzzySearch("th")), 1)
+      lt.rebuild()
+      self.assertEqual(lt.getGeneration(), generation + 2)
+
+      os.remove(os.path.join(self.root_, "a", "three.py"))
+      lt.refreshDirectories([os.path.join(self.root_, "a")])
+      self.assertEqual(lt.getGeneration(), generation + 3)
+      self.assertEqual(len(lt.search(r"\.py$", "/")), 2)
+
+   def testRecreated(self):
+      lt = LocationTable(self.conf_)
+      lt.rebuild()
+      self.assertEqual(len(lt.search(r"\.py$", "/")), 2)
+
+      # A table created from scratch starts over at the same generation,
+      # but has an id of its own.
+      table = lt.getTableId()
+      os.remove(self.conf_.getLocationTableFileFullPath())
+      self.touch("a/three.py")
+      lt.rebuild()
+      self.assertEqual(lt.getGeneration(), 1)
+      self.assertNotEqual(lt.getTableId(), table)
+      self.assertEqual(len(lt.search(r"\.py$", "/")), 3)
+
+   def testOtherLayout(self):
+      conn = sqlite3.connect(self.cache_.getFileFullPath())
+      conn.execute("CREATE TABLE Result (pattern TEXT, mode TEXT, generation INTEGER, results BLOB, size INTEGER, used INTEGER)")
+      conn.close()
+      self.cache_.put("x", "regex", "t", 1, [[]])
+      self.assertEqual(self.cache_.get("x", "regex", "t", 1), [[]])
+
+   def testDisabled(self):
+      self.conf_.setOption("cacheResults", "false")
+      lt = LocationTable(self.conf_)
+      lt.rebuild()
+      self.assertEqual(len(lt.search(r"\.py$", "/")), 2)
+      self.assertFalse(os.path.exists(self.cache_.getFileFullPath()))
+
+
+if __name__ == "__main__":
+   unittest.main()
@@ -1,17 +1,110 @@
 #!/usr/bin/python
 
+import os
+import re
+import shutil
+import subprocess
+import tempfile
 import unittest
 
-from managededit.searchpath import *
+from devtools.managededit.ignore import IgnoreRules
+from devtools.managededit.searchpath import *
 
 
 class SearchPathTest(unittest.TestCase):
 
    def setUp(self):
-      print("Setup")
+      self.root_ = tempfile.mkdtemp(prefix="searchpathtest")
+      for d in ["src", "src/build", "doc"]:
+         os.makedirs(os.path.join(self.root_, d))
+      for f in ["a.c", "a.o", "a.c~", "src/b.c", "src/b.o", "src/build/c.c", "doc/README"]:
+         open(os.path.join(self.root_, f), "w").close()
 
    def tearDown(self):
-      print("TearDown")
+      shutil.rmtree(self.root_)
+
+   def walk(self, sp, dirIgnores=[], fileIgnores=[]):
+      return sorted(os.path.relpath(f, self.root_) for f in sp.walk(dirIgnores, fileIgnores))
+
+   def testWalk(self):
+      sp = SearchPath(self.root_, True)
+      # A file that several patterns match is still only returned once.
+      self.assertEqual(self.walk(sp, [], [r"\.o$", r"^a\.", r"~$"]),
+                       ["doc/README", "src/b.c", "src/build/c.c"])
+      self.assertEqual(self.walk(sp, [re.compile("/build$")], [r"\.o$"]),
+                       ["a.c", "a.c~", "doc/README", "src/b.c"])
+
+      sp = SearchPath(self.root_, False)
+      self.assertEqual(self.walk(sp, [], [r"\.o$"]), ["a.c", "a.c~"])
+
+   def testSearchPathIgnores(self):
+      sp = SearchPath(self.root_, True)
+      sp.addFileIgnore(r"\.o$")
+      sp.addDirectoryIgnore("/doc$")
+      self.assertEqual(self.walk(sp, [], ["~$"]), ["a.c", "src/b.c", "src/build/c.c"])
+
+      # The global rules are extended once and reused while they are the
+      # same.
+      rules = IgnoreRules(["~$"])
+      self.assertTrue(sp.getFileIgnores(rules) is sp.getFileIgnores(rules))
+      self.assertEqual(sp.getFileIgnores(rules).getPatterns(), ["~$", r"\.o$"])
+
+      copy = restoreSearchPath(sp.getState())
+      self.assertEqual(self.walk(copy, [], ["~$"]), ["a.c", "src/b.c", "src/build/c.c"])
+
+   def git(self, *args):
+      subprocess.run(["git", "-C", self.root_, "-c", "user.name=test", "-c", "user.email=test@test"] + list(args),
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+   def testGitSource(self):
+      # Outside a working tree the directories are walked.
+      sp = SearchPath(self.root_, True, "git")
+      self.assertEqual(sp.listRepository(), None)
+      self.assertEqual(len(self.walk(sp)), 7)
+
+      try:
+         self.git("init", "-q")
+      except OSError:
+         self.skipTest("git is not installed.")
+      with open(os.path.join(self.root_, ".gitignore"), "w") as f:
+         f.write("*.o\nbuild/\n")
+      self.git("add", ".gitignore", "a.c", "src/b.c", "doc/README")
+      self.git("commit", "-q", "-m", "test")
+      os.remove(os.path.join(self.root_, "doc", "README"))
+
+      # Untracked files are listed, ignored and deleted ones are not.
+      self.assertEqual(self.walk(sp, [], ["~$"]), [".gitignore", "a.c", "src/b.c"])
+      self.assertEqual(self.walk(sp, ["/src$"], []), [".gitignore", "a.c", "a.c~"])
+      self.assertEqual(self.walk(SearchPath(self.root_, False, "git")), [".gitignore", "a.c", "a.c~"])
+      self.assertEqual(self.walk(sp.getSubPath(os.path.join(self.root_, "src"))), ["src/b.c"])
+      self.assertRaises(RuntimeError, SearchPath, self.root_, True, "svn")
+
+   def testGitDirectories(self):
+      try:
+         self.git("init", "-q")
+      except OSError:
+         self.skipTest("git is not installed.")
+      os.makedirs(os.path.join(self.root_, "lib", "x", "y"))
+      open(os.path.join(self.root_, "lib", "x", "y", "d.c"), "w").close()
+
+      # Directories that only hold directories are listed too.
+      sp = SearchPath(self.root_, True, "git")
+      listing = [(os.path.relpath(d, self.root_), [os.path.basename(f) for f in files])
+                 for (d, files) in sp.listRepository([], [r"\.o$"])]
+      self.assertEqual(listing, [(".", ["a.c", "a.c~"]), ("doc", ["README"]), ("lib", []),
+                                 ("lib/x", []), ("lib/x/y", ["d.c"]), ("src", ["b.c"]),
+                                 ("src/build", ["c.c"])])
+      self.assertEqual([os.path.relpath(d, self.root_) for (d, files) in sp.listRepository(["/x$"])],
+                       [".", "doc", "lib", "src", "src/build"])
+
+   def testIgnoreRules(self):
+      rules = IgnoreRules([r"\.o$", "(?i)readme", r"(\w)\1$"])
+      self.assertEqual(len(rules), 3)
+      self.assertEqual(rules.filter(["a.o", "README", "b.cc", "b.c"]), ["b.c"])
+      self.assertTrue(rules.search("/doc/ReadMe.txt"))
+      self.assertFalse(rules.search("a.c"))
+      self.assertEqual(IgnoreRules().filter(["a"]), ["a"])
+      self.assertTrue(rules.extend([]) is rules)
 
 
 if __name__ == "__main__":
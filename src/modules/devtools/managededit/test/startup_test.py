@@ -0,0 +1,115 @@
+#!/usr/bin/python
+
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+import devtools
+
+# Milliseconds the imports of a command may take, beyond those of the
+# interpreter itself. Override with DT_IMPORT_BUDGET on slow machines.
+IMPORT_BUDGET=float(os.environ.get("DT_IMPORT_BUDGET", 60))
+
+# Modules that only some commands need and that are slow to import.
+DEFERRED=["concurrent.futures", "tempfile", "socket", "socketserver", "ctypes",
+          "subprocess", "readline", "optparse", "xml.parsers.expat", "json",
+          "pickle", "platform", "shutil", "mmap"]
+
+
+def importTime(args):
+   """
+      Run python with args in a new interpreter, with a home directory of
+      its own.
+
+      @returns A tuple (milliseconds, modules) where milliseconds is the
+      time taken by the imports the interpreter does not do on its own and
+      modules is the set of modules loaded.
+   """
+   home = tempfile.mkdtemp(prefix="startuptest")
+   env = dict(os.environ)
+   env["HOME"] = home
+   env["PYTHONPATH"] = os.path.dirname(os.path.dirname(os.path.abspath(devtools.__file__)))
+   # Let the first run write the byte code the others load.
+   env.pop("PYTHONDONTWRITEBYTECODE", None)
+   try:
+      baseline = readImportTimes(subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"],
+                                                env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True))
+      times = readImportTimes(subprocess.run([sys.executable, "-X", "importtime"] + args,
+                                             env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                             universal_newlines=True, check=True))
+   finally:
+      shutil.rmtree(home)
+
+   total = 0.0
+   modules = set()
+   for (name, depth, milliseconds) in times:
+      modules.add(name)
+      if depth == 0 and name not in baseline:
+         total += milliseconds
+   return (total, modules)
+
+
+def readImportTimes(process):
+   """
+      @returns A list of tuples (module, depth, milliseconds) from what
+      -X importtime wrote, milliseconds including the imports beneath.
+   """
+   ret = []
+   for line in process.stderr.splitlines():
+      if not line.startswith("import time:") or "|" not in line:
+         continue
+      (own, cumulative, name) = line[len("import time:"):].split("|")
+      if not cumulative.strip().isdigit():
+         continue
+      depth = (len(name) - len(name.lstrip()) - 1) // 2
+      ret.append((name.strip(), depth, int(cumulative) / 1000.0))
+   return ret
+
+
+class StartupTest(unittest.TestCase):
+
+   def check(self, args, deferred):
+      runs = [importTime(args) for i in range(3)]
+      (total, modules) = min(runs, key=lambda r: r[0])
+      self.assertEqual(sorted(modules.intersection(deferred)), [])
+      self.assertTrue(total < IMPORT_BUDGET,
+                      "The imports of %s took %.1fms, over the budget of %.1fms." % (" ".join(args), total, IMPORT_BUDGET))
+
+   def testMe(self):
+      # Run the script itself, as the completion does on every key press,
+      # so that what its main line imports counts too.
+      me = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(devtools.__file__)))), "scripts", "me")
+      self.check([me, "--complete", "x"], DEFERRED)
+
+   def testCg(self):
+      self.check(["-c", "import devtools.codegen.api"], DEFERRED + ["datetime", "sqlite3"])
+
+   def testParseLookup(self):
+      from devtools.managededit.api import createParser, parseLookup
+      from devtools.managededit.configuration import Configuration
+
+      home = tempfile.mkdtemp(prefix="startuptest")
+      try:
+         parser = createParser(Configuration(home, False))
+      finally:
+         shutil.rmtree(home)
+      for argv in [["x"], ["-z", "x"], ["-d", "dir"], ["--find-file", "f", "--fuzzy"],
+                   ["--complete", "", "--limit", "5"], ["-t", "one", "--table", "two", "^x"],
+                   ["--ask", "x"]]:
+         (options, args) = parseLookup(argv)
+         (expected, expectedArgs) = parser.parse_args(argv)
+         self.assertEqual(args, expectedArgs)
+         for (name, value) in vars(expected).items():
+            self.assertEqual(getattr(options, name), value, (argv, name))
+
+      # Anything else is left to the full parser.
+      for argv in [[], ["x", "y"], ["-r"], ["-d", "-x"], ["-d"], ["-f", ""], ["--limit", "n", "x"],
+                   ["--complete=x"], ["-m", "x"], ["--profile", "x"], ["-", "x"]]:
+         self.assertEqual(parseLookup(argv), None, argv)
+
+
+if __name__ == "__main__":
+   unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/python
+
+import os
+import shutil
+import time
+import unittest
+
+from devtools.managededit.locationtable import LocationTable
+from devtools.managededit.test.fixtures import TableTestCase
+from devtools.managededit.watcher import *
+
+
+@unittest.skipUnless(isSupported(), "inotify is only available on Linux.")
+class WatcherTest(TableTestCase):
+
+   DIRECTORIES=["a", "a/b", "a/.svn"]
+   FILES=["top.txt", "a/one.py", "a/b/two.py"]
+
+   def setUp(self):
+      TableTestCase.setUp(self)
+      self.conf_.addDirectoryIgnore(r"\.svn")
+      self.conf_.addFileIgnore(r"\.pyc$")
+      self.watcher_ = Watcher(self.conf_, 1)
+      self.watcher_.start()
+
+   def tearDown(self):
+      self.watcher_.close()
+      TableTestCase.tearDown(self)
+
+   def settle(self):
+      """
+         Apply everything that happened so far.
+      """
+      while self.watcher_.processEvents(0.05):
+         pass
+      return self.watcher_.flush()
+
+   def assertCurrent(self):
+      lt = LocationTable(self.conf_)
+      watched = sorted(lt.search("."))
+      lt.rebuild(1)
+      self.assertEqual(watched, sorted(lt.search(".")))
+
+   def testChanges(self):
+      self.assertEqual(self.watcher_.getWatchCount(), 3)
+
+      self.touch("a/three.py")
+      self.touch("a/three.pyc")
+      os.remove(os.path.join(self.root_, "a", "b", "two.py"))
+      os.rename(os.path.join(self.root_, "top.txt"), os.path.join(self.root_, "a", "top.txt"))
+      self.assertEqual(self.settle(), (2, 2))
+      self.assertCurrent()
+
+      os.makedirs(os.path.join(self.root_, "c", "d"))
+      self.touch("c/d/four.py")
+      self.touch("a/.svn/entries")
+      self.settle()
+      self.assertCurrent()
+      self.assertEqual(self.watcher_.getWatchCount(), 5)
+
+      self.touch("c/d/five.py")
+      os.rename(os.path.join(self.root_, "a"), os.path.join(self.root_, "c", "a"))
+      self.settle()
+      self.assertCurrent()
+      self.touch("c/a/b/six.py")
+      self.settle()
+      self.assertCurrent()
+
+      shutil.rmtree(os.path.join(self.root_, "c"))
+      self.settle()
+      self.assertCurrent()
+      self.assertEqual(self.watcher_.getWatchCount(), 1)
+
+   def testOverflow(self):
+      # The events of the new directories are lost, as if the queue had
+      # overflowed.
+      os.makedirs(os.path.join(self.root_, "c", "d"))
+      self.touch("c/d/four.py")
+      self.watcher_.inotify_.read(0.05)
+      self.watcher_.overflowed_ = True
+      self.assertEqual(self.watcher_.flush(), (1, 0))
+      self.assertEqual(self.watcher_.getWatchCount(), 5)
+
+      self.touch("c/d/five.py")
+      self.assertEqual(self.settle(), (1, 0))
+      self.assertCurrent()
+
+   def testDebounce(self):
+      self.assertFalse(self.watcher_.isDue())
+      self.touch("a/three.py")
+      self.watcher_.processEvents(1)
+      self.assertFalse(self.watcher_.isDue())
+      time.sleep(DEBOUNCE_DELAY)
+      self.assertTrue(self.watcher_.isDue())
+      self.assertEqual(self.watcher_.flush(), (1, 0))
+      self.assertFalse(self.watcher_.isDue())
+
+
+if __name__ == "__main__":
+   unittest.main()
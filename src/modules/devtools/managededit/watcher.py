@@ -0,0 +1,353 @@
+"""
+This files defines the classes Inotify and Watcher.
+
+A Watcher keeps a location table up to date while it runs. It asks Linux's
+inotify for the files created, deleted and renamed in every indexed
+directory and, once things have been quiet for a moment, relists just the
+directories that changed with LocationTable.refreshDirectories.
+
+Copyright (C) 2009 Craig W. Wright and 2013 Google. All rights reserved.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from devtools.managededit.crawler import Crawler
+from devtools.managededit.locationtable import LocationTable
+
+IN_MOVED_FROM=0x00000040
+IN_MOVED_TO=0x00000080
+IN_CREATE=0x00000100
+IN_DELETE=0x00000200
+IN_DELETE_SELF=0x00000400
+IN_MOVE_SELF=0x00000800
+IN_Q_OVERFLOW=0x00004000
+IN_IGNORED=0x00008000
+IN_ONLYDIR=0x01000000
+IN_DONT_FOLLOW=0x02000000
+IN_EXCL_UNLINK=0x04000000
+IN_ISDIR=0x40000000
+IN_CLOEXEC=0o2000000
+
+WATCH_MASK=(IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+            IN_DELETE_SELF | IN_MOVE_SELF |
+            IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+
+_eventHeader = struct.Struct("iIII")
+
+# Seconds without events before a batch of changes is applied, and the
+# longest a change waits while events keep arriving.
+DEBOUNCE_DELAY=0.25
+MAXIMUM_DELAY=2.0
+
+# Seconds between full refreshes once directories are left unwatched
+# because the watch limit was reached.
+UNWATCHED_REFRESH_INTERVAL=60.0
+
+
+def isSupported():
+   return sys.platform.startswith("linux")
+
+
+class Inotify:
+   """
+      A thin wrapper over the inotify system calls, reached through ctypes.
+   """
+
+   def __init__(self):
+      libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+      self.addWatch_ = libc.inotify_add_watch
+      self.addWatch_.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+      self.removeWatch_ = libc.inotify_rm_watch
+      self.removeWatch_.argtypes = [ctypes.c_int, ctypes.c_int]
+
+      self.fd_ = libc.inotify_init1(IN_CLOEXEC)
+      if self.fd_ < 0:
+         e = ctypes.get_errno()
+         raise OSError(e, os.strerror(e))
+
+   def fileno(self):
+      return self.fd_
+
+   def addWatch(self, path, mask=WATCH_MASK):
+      """
+         @returns The watch descriptor. Raises an OSError on failure, with
+         errno ENOSPC once the watch limit is reached.
+      """
+      wd = self.addWatch_(self.fd_, os.fsencode(path), mask)
+      if wd < 0:
+         e = ctypes.get_errno()
+         raise OSError(e, os.strerror(e), path)
+      return wd
+
+   def removeWatch(self, wd):
+      self.removeWatch_(self.fd_, wd)
+
+   def read(self, timeout=None):
+      """
+         Wait up to timeout seconds, forever if it is None, for events.
+
+         @returns A list of tuples (wd, mask, cookie, name), empty if the
+         timeout expired.
+      """
+      (readable, writable, exceptional) = select.select([self.fd_], [], [], timeout)
+      if not readable:
+         return []
+
+      events = []
+      buf = os.read(self.fd_, 65536)
+      i = 0
+      while i < len(buf):
+         (wd, mask, cookie, length) = _eventHeader.unpack_from(buf, i)
+         i += _eventHeader.size
+         name = os.fsdecode(buf[i:i+length].rstrip(b"\0"))
+         i += length
+         events.append((wd, mask, cookie, name))
+      return events
+
+   def close(self):
+      if self.fd_ >= 0:
+         os.close(self.fd_)
+         self.fd_ = -1
+
+
+class Watcher:
+   """
+      Keeps the location table of a configuration up to date by watching
+      every directory in it.
+
+      Directories are watched as they are found in the table, so the
+      DirectoryIgnore and FileIgnore rules apply exactly as they do to a
+      rebuild. Edits to the rules are not picked up; restart the watcher
+      after rebuilding.
+
+      If the watch limit (fs.inotify.max_user_watches) is reached the
+      directories left over are not watched and the whole table is
+      refreshed every UNWATCHED_REFRESH_INTERVAL seconds instead.
+   """
+
+   def __init__(self, configuration, jobs=None, out=None):
+      """
+         @param jobs
+         The number of directories to list in parallel. @see Crawler
+
+         @param out
+         An object that supports a write method to report progress to, or
+         None.
+      """
+      self.config_ = configuration
+      self.table_ = LocationTable(configuration)
+      self.jobs_ = jobs
+      self.out_ = out
+      self.inotify_ = None
+      self.paths_ = {}
+      self.watches_ = {}
+      self.dirty_ = set()
+      self.overflowed_ = False
+      self.firstEvent_ = None
+      self.lastEvent_ = None
+      self.unwatched_ = False
+      self.nextRefresh_ = None
+
+   def _report(self, message):
+      if self.out_ is not None:
+         self.out_.write(message + "\n")
+         self.out_.flush()
+
+   def getWatchCount(self):
+      return len(self.watches_)
+
+   def start(self):
+      """
+         Bring the table up to date and watch every directory in it.
+      """
+      self.inotify_ = Inotify()
+      if self.table_.isRefreshable():
+         self._watchTable()
+      self.table_.refresh(self.jobs_)
+      self._watchTable()
+
+   def close(self):
+      if self.inotify_ is not None:
+         self.inotify_.close()
+         self.inotify_ = None
+      self.paths_ = {}
+      self.watches_ = {}
+
+   def _watch(self, path):
+      """
+         @returns False if the watch limit has been reached.
+      """
+      if path in self.watches_:
+         return True
+      try:
+         wd = self.inotify_.addWatch(path)
+      except OSError as e:
+         if e.errno in (errno.ENOSPC, errno.ENOMEM):
+            if not self.unwatched_:
+               self.unwatched_ = True
+               self.nextRefresh_ = time.monotonic() + UNWATCHED_REFRESH_INTERVAL
+               self._report("Ran out of inotify watches after %d directories. Raise fs.inotify.max_user_watches; until then the rest are refreshed every %d seconds." % (len(self.watches_), UNWATCHED_REFRESH_INTERVAL))
+            return False
+         # The directory vanished or cannot be read; the next refresh of
+         # its parent takes care of it.
+         return True
+      self.paths_[wd] = path
+      self.watches_[path] = wd
+      return True
+
+   def _unwatch(self, path):
+      """
+         Stop watching path and everything beneath it.
+      """
+      root = os.path.join(path, "")
+      for p in [p for p in self.watches_ if p == path or p.startswith(root)]:
+         wd = self.watches_.pop(p)
+         del self.paths_[wd]
+         self.inotify_.removeWatch(wd)
+
+   def _watchTable(self):
+      for path in sorted(self.table_.getDirectories()):
+         if not self._watch(path):
+            return
+
+   def _watchTree(self, path):
+      """
+         Watch a directory that appeared and the directories beneath it
+         that are part of its SearchPath.
+      """
+      sp = self.table_.findSearchPath(path)
+      if sp is None:
+         return
+      if not sp.isRecursive():
+         self._watch(path)
+         return
+      for (directory, status, files) in Crawler(1).scan(sp.getSubPath(path),
+                                                        self.config_.getDirectoryIgnores(),
+                                                        self.config_.getFileIgnores()):
+         if status is not None and not self._watch(directory):
+            return
+
+   def _handle(self, wd, mask, name):
+      if mask & IN_Q_OVERFLOW:
+         self.overflowed_ = True
+         return
+      if wd not in self.paths_:
+         return
+      path = self.paths_[wd]
+
+      if mask & IN_IGNORED:
+         del self.watches_[path]
+         del self.paths_[wd]
+         return
+
+      if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+         self.dirty_.add(path)
+         if mask & IN_MOVE_SELF:
+            self._unwatch(path)
+         return
+
+      self.dirty_.add(path)
+      if mask & IN_ISDIR:
+         child = os.path.join(path, name)
+         if mask & IN_MOVED_FROM:
+            self._unwatch(child)
+         elif mask & (IN_CREATE | IN_MOVED_TO):
+            # Watch it right away; the refresh of its parent lists it after
+            # the watch is in place so nothing created meanwhile is missed.
+            self._watchTree(child)
+
+   def processEvents(self, timeout=None):
+      """
+         Wait up to timeout seconds for events and take note of them.
+
+         @returns The number of events read.
+      """
+      events = self.inotify_.read(timeout)
+      if events:
+         now = time.monotonic()
+         if self.firstEvent_ is None:
+            self.firstEvent_ = now
+         self.lastEvent_ = now
+      for (wd, mask, cookie, name) in events:
+         self._handle(wd, mask, name)
+      return len(events)
+
+   def _getDeadline(self):
+      """
+         @returns When flush should next be called, or None if there is
+         nothing to do until more events arrive.
+      """
+      deadlines = []
+      if self.lastEvent_ is not None:
+         deadlines.append(min(self.lastEvent_ + DEBOUNCE_DELAY,
+                              self.firstEvent_ + MAXIMUM_DELAY))
+      if self.unwatched_:
+         deadlines.append(self.nextRefresh_)
+      return min(deadlines) if deadlines else None
+
+   def isDue(self):
+      deadline = self._getDeadline()
+      return deadline is not None and deadline <= time.monotonic()
+
+   def flush(self):
+      """
+         Apply the changes noted so far to the location table.
+
+         @returns A tuple (added, removed).
+      """
+      dirty = self.dirty_
+      overflowed = self.overflowed_
+      self.dirty_ = set()
+      self.overflowed_ = False
+      self.firstEvent_ = None
+      self.lastEvent_ = None
+
+      if overflowed or (self.unwatched_ and self.nextRefresh_ <= time.monotonic()):
+         changes = self.table_.refresh(self.jobs_) or (0, 0)
+         # The refresh may have found directories whose events were lost,
+         # and maybe the limit was raised or other watches were dropped.
+         self.unwatched_ = False
+         self._watchTable()
+         if self.unwatched_:
+            self.nextRefresh_ = time.monotonic() + UNWATCHED_REFRESH_INTERVAL
+         return changes
+
+      if not dirty:
+         return (0, 0)
+      return self.table_.refreshDirectories(dirty, self.jobs_)
+
+   def run(self):
+      """
+         Apply changes as they happen until interrupted.
+      """
+      self._report("Watching %d directories." % (len(self.watches_)))
+      while True:
+         deadline = self._getDeadline()
+         timeout = None
+         if deadline is not None:
+            timeout = max(0, deadline - time.monotonic())
+         self.processEvents(timeout)
+         if self.isDue():
+            (added, removed) = self.flush()
+            if added or removed:
+               self._report("%d added, %d removed." % (added, removed))